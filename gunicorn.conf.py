@@ -0,0 +1,50 @@
+"""
+Gunicorn configuration of the production service.
+
+    gunicorn -c gunicorn.conf.py
+
+Settings can be overridden through the environment variables, like SOLR_HOST:
+
+* PORT: port the service listens to (8080)
+* WEB_CONCURRENCY or GUNICORN_WORKERS: number of worker processes (2 * CPU count + 1)
+* GUNICORN_THREADS: number of request threads per worker process (4). Threads overlap the I/O waits on Solr.
+* GUNICORN_WORKER_CLASS: worker model (gthread). An async worker (e.g. gevent) can be used if it is installed.
+* GUNICORN_TIMEOUT: seconds a silent worker is killed and restarted after (60)
+* GUNICORN_GRACEFUL_TIMEOUT: seconds workers can finish their requests during a restart (30)
+* GUNICORN_KEEPALIVE: seconds client connections are kept alive (5)
+* GUNICORN_MAX_REQUESTS: number of requests a worker is restarted after, 0 disables the restarts (0)
+
+Application is loaded once by the master process before forking the workers, so workers share the code pages and
+the loaded configuration. Sending HUP to the master gracefully replaces the workers.
+"""
+import os
+import multiprocessing
+
+
+def get_int(names, default):
+    """
+    Reads the first set environment variable of the given names as an int.
+    """
+    for name in names:
+        if os.environ.get(name, "").strip():
+            return int(os.environ[name])
+    return default
+
+
+wsgi_app = "bds_api.wsgi:app"
+bind = "0.0.0.0:" + str(get_int(["PORT"], 8080))
+
+workers = get_int(["WEB_CONCURRENCY", "GUNICORN_WORKERS"], multiprocessing.cpu_count() * 2 + 1)
+threads = get_int(["GUNICORN_THREADS"], 4)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+
+preload_app = True
+timeout = get_int(["GUNICORN_TIMEOUT"], 60)
+graceful_timeout = get_int(["GUNICORN_GRACEFUL_TIMEOUT"], 30)
+keepalive = get_int(["GUNICORN_KEEPALIVE"], 5)
+max_requests = get_int(["GUNICORN_MAX_REQUESTS"], 0)
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
@@ -1,9 +1,30 @@
 import json
-
-import requests
+import time
+import logging
+import argparse
+import multiprocessing
 from datetime import datetime
-from bds_queries import IndividualDetailsQuery, ListAllAllenIndividuals, GetOntologyMetadata, ListAllTaxonomies
-from bds_api.utils.taxonomy_config_utils import *
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from bds_api.dumps.bds_queries import IndividualDetailsBatchQuery, ListAllAllenIndividuals, GetOntologyMetadata, \
+    ListAllTaxonomies, set_query_cache, get_ontology_version, set_query_recorder, set_query_replayer
+from bds_api.dumps.neo4j_config import query_cache_config
+from bds_api.dumps.neo4j_driver import close_drivers
+from bds_api.dumps.query_cache import QueryCache
+from bds_api.dumps.query_replay import QueryRecorder, QueryReplayer, parse_latency
+from bds_api.dumps.dump_io import open_writer, get_dump_path, batches, StreamingDocumentStore, JSON_FORMAT, \
+    DUMP_FORMATS
+from bds_api.dumps.dump_delta import write_delta_dump
+from bds_api.dumps.dump_context import DumpContext
+from bds_api.dumps.field_mappings import extract_class_fields, extract_reference_fields, \
+    extract_taxonomy_id_fields, extract_taxonomy_fields, extract_dataset_id_fields, extract_dataset_fields, \
+    parse_axiom_value, tags_blacklist
+from bds_api.dumps.solr_indexer import SolrBulkIndexer
+from bds_api.dumps.dump_metrics import get_metrics, start_run, TRANSFORM_STAGE
+from bds_api.endpoints.search_config import indexer_config
+from bds_api.utils.taxonomy_config_utils import get_species_mapping
+
+log = logging.getLogger(__name__)
 
 ALL_CELLS = "All cells"
 
@@ -15,105 +36,189 @@ DUMP_PATH = '../../../dumps/individuals_metadata_{}.json'.format(today)
 
 SOLR_JSON_PATH = '../../../dumps/individuals_metadata_solr_{}.json'.format(today)
 
-root_nodes = list()
-all_cells = list()
-species_mapping = get_species_mapping()
+
 cell_type_ranks = ['None', 'Cell Type', 'Subclass', 'Class']
 
-PCL_NS = "http://purl.obolibrary.org/obo/PCL_"
-CL_NS = "http://purl.obolibrary.org/obo/CL_"
+# individuals per process pool task of the multiprocess transform
+TRANSFORM_CHUNK_SIZE = 50
 
-OLS_TERM = "https://www.ebi.ac.uk/ols/ontologies/pcl/terms?iri="
+# individuals between two progress log messages
+PROGRESS_INTERVAL = 1000
 
-tags_blacklist = ['Entity', 'Class', 'Individual']
+# dump context of the transform worker processes, see init_transform_worker
+worker_context = None
 
+PCL_NS = "http://purl.obolibrary.org/obo/PCL_"
+CL_NS = "http://purl.obolibrary.org/obo/CL_"
 
-def individuals_metadata_dump():
-    all_metadata = []
-    all_individuals = ListAllAllenIndividuals().execute_query()
+OLS_TERM = "https://www.ebi.ac.uk/ols/ontologies/pcl/terms?iri="
 
-    for individual in all_individuals:
-        result = IndividualDetailsQuery().execute_query({"accession": individual.replace("PCL:", "")})
-        result["node"] = individual
-        all_metadata.append(result)
+def individuals_metadata_dump(workers=1, dump_format=JSON_FORMAT):
+    all_individuals, ont_metadata = execute_queries([ListAllAllenIndividuals(), GetOntologyMetadata()], workers)
 
-    print(len(all_metadata))
+    with open_writer(get_dump_path(DUMP_PATH, dump_format), dump_format,
+                     envelope={"ontology": ont_metadata}, array_key="entities") as writer:
+        for individual, result in IndividualDetailsBatchQuery().execute_in_batches(all_individuals, workers):
+            result["node"] = individual
+            writer.write(result)
+            get_metrics().count_documents()
 
-    ont_metadata = GetOntologyMetadata().execute_query()
 
-    result = dict()
-    result["ontology"] = ont_metadata
-    result["entities"] = all_metadata
+def individuals_metadata_solr_dump(workers=1, dump_format=JSON_FORMAT, processes=1):
+    """
+    Solr is only supporting flat json objects. So unpacking nested objets to a flat representation. Documents are
+    streamed to the dump file as soon as they are finalised.
+    :param workers: number of concurrent Neo4j queries. Output is identical to the serial (workers=1) run.
+    :param dump_format: 'json', 'ndjson' or 'jsonz'
+    :param processes: number of transform processes. Output is identical to the serial (processes=1) run.
+    :return: Solr index representation of the BDS individuals.
+    """
+    all_individuals, all_datasets, ont_metadata = execute_queries(
+        [ListAllAllenIndividuals(), ListAllTaxonomies(), GetOntologyMetadata()], workers)
 
-    dump_to_file(result, DUMP_PATH)
+    with open_writer(get_dump_path(SOLR_JSON_PATH, dump_format), dump_format) as writer:
+        all_data = StreamingDocumentStore(writer)
+        individual_results = IndividualDetailsBatchQuery().execute_in_batches(all_individuals, workers)
+        populate_solr_documents(all_data, individual_results, all_datasets, ont_metadata, processes)
+        all_data.flush()
 
 
-def individuals_metadata_solr_dump():
+def populate_solr_documents(all_data, individual_results, all_datasets, ont_metadata, processes=1,
+                            species_mapping=None):
     """
-    Solr is only supporting flat json objects. So unpacking nested objets to a flat representation.
-    :return: Solr index representation of the BDS individuals.
+    Transforms the individual details query results to Solr documents.
+    :param all_data: StreamingDocumentStore that receives the documents
+    :param individual_results: iterable of (individual curie, individual details) tuples
+    :param all_datasets: ListAllTaxonomies result
+    :param ont_metadata: GetOntologyMetadata result
+    :param processes: number of transform processes
+    :param species_mapping: simple taxonomy id to species label mapping. Defaults to the taxonomy configuration.
     """
-    all_data = dict()
-    all_individuals = ListAllAllenIndividuals().execute_query()
-    all_datasets = ListAllTaxonomies().execute_query()
-
-    extract_dataset_metadata(all_data, all_datasets)
+    if species_mapping is None:
+        species_mapping = get_species_mapping()
+    context = DumpContext(all_datasets, species_mapping)
+    extract_dataset_metadata(all_data, context)
 
     count = 0
-    for individual in all_individuals:
-        print("Processing individual: " + individual)
-        result = IndividualDetailsQuery().execute_query({"accession": individual.replace("PCL:", "")})
-
-        solr_doc = extract_class_metadata(result["class_metadata"][0]["class_metadata"])
-        if solr_doc:
-            solr_doc["tags"] = [tag for tag in result["class_metadata"][0]["tags"] if tag not in tags_blacklist]
+    for individual, solr_doc in transform_individuals(all_data, individual_results, context, processes):
+        if check_root_nodes(solr_doc, context):
+            # root node parents are resolved after all individuals are processed
+            all_data[solr_doc["iri"]] = solr_doc
         else:
-            # some individuals don't have class, extract from individual itself
-            solr_doc = extract_class_metadata(result["indv_metadata"])
-            solr_doc["resolved_iri"] = None
-
-        extract_individual_data(all_data, result, solr_doc)
-        extract_parent_data(all_data, result, solr_doc)
-        extract_marker_data(all_data, result, solr_doc)
-        extract_reference_data(all_data, result, solr_doc)
-        extract_taxonomy_data(all_data, result, solr_doc, all_datasets)
-        extract_brain_region_data(all_data, result, solr_doc, all_datasets)
-        extract_homologous_data(all_data, result, solr_doc)
-        extract_subcluster_data(all_data, result, solr_doc)
-        check_root_nodes(solr_doc)
-
-        solr_doc["individual"] = individual
-
-        all_data[solr_doc["iri"]] = solr_doc
+            all_data.write(solr_doc)
         count += 1
+        if count % PROGRESS_INTERVAL == 0:
+            log.info("Processed {} individuals, {} documents.".format(count, get_metrics().documents))
 
-    print("Found Allen individual count is: " + str(count))
-    manage_root_node_parents()
-    all_data["ontology"] = get_version_metadata(all_data)
+    log.info("Found Allen individual count is: " + str(count))
+    manage_root_node_parents(context)
+    all_data["ontology"] = get_version_metadata(ont_metadata)
 
-    dump_map_to_file(all_data, SOLR_JSON_PATH)
+
+def transform_individuals(all_data, individual_results, context, processes=1):
+    """
+    Transforms the individuals to Solr documents. Shared entity documents (parents, markers and references) are added
+    to all_data. With more than one process, chunks of individuals are transformed by a process pool with at most
+    2 * processes chunks in flight, and the shared entity documents are merged in the order of the individuals.
+    :return: generator of (individual curie, solr document) tuples in the order of the given individuals
+    """
+    if processes <= 1:
+        for individual, result in individual_results:
+            with get_metrics().time_stage(TRANSFORM_STAGE):
+                solr_doc = transform_individual(all_data, individual, result, context)
+            yield individual, solr_doc
+        return
+
+    # workers are spawned, forking would copy the held locks of the fetch threads and of the pooled Neo4j driver
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_transform_worker,
+                             initargs=(context.all_datasets, context.species_mapping)) as executor:
+        in_flight = deque()
+        for chunk in batches(individual_results, TRANSFORM_CHUNK_SIZE):
+            if len(in_flight) >= 2 * processes:
+                yield from merge_transformed_chunk(all_data, in_flight.popleft().result())
+            in_flight.append(executor.submit(transform_chunk, chunk))
+        while in_flight:
+            yield from merge_transformed_chunk(all_data, in_flight.popleft().result())
+
+
+def init_transform_worker(all_datasets, species_mapping):
+    global worker_context
+    worker_context = DumpContext(all_datasets, species_mapping)
+
+
+def transform_chunk(chunk):
+    """
+    Transform worker process task.
+    :return: list of (individual curie, solr document, shared entity documents) tuples and the transform time
+    """
+    start = time.perf_counter()
+    transformed = list()
+    for individual, result in chunk:
+        shared_docs = dict()
+        solr_doc = transform_individual(shared_docs, individual, result, worker_context)
+        transformed.append((individual, solr_doc, shared_docs))
+    return transformed, time.perf_counter() - start
+
+
+def merge_transformed_chunk(all_data, chunk_result):
+    transformed, seconds = chunk_result
+    get_metrics().add_stage_time(TRANSFORM_STAGE, seconds, len(transformed))
+    for individual, solr_doc, shared_docs in transformed:
+        for iri, doc in shared_docs.items():
+            if iri not in all_data:
+                all_data[iri] = doc
+        yield individual, solr_doc
+
+
+def transform_individual(all_data, individual, result, context):
+    log.debug("Processing individual: %s", individual)
+
+    solr_doc = extract_class_metadata(result["class_metadata"][0]["class_metadata"])
+    if solr_doc:
+        solr_doc["tags"] = [tag for tag in result["class_metadata"][0]["tags"] if tag not in tags_blacklist]
+    else:
+        # some individuals don't have class, extract from individual itself
+        solr_doc = extract_class_metadata(result["indv_metadata"])
+        solr_doc["resolved_iri"] = None
+
+    extract_individual_data(all_data, result, solr_doc)
+    extract_parent_data(all_data, result, solr_doc)
+    extract_marker_data(all_data, result, solr_doc)
+    extract_reference_data(all_data, result, solr_doc)
+    extract_taxonomy_data(all_data, result, solr_doc, context)
+    extract_brain_region_data(all_data, result, solr_doc, context)
+    extract_homologous_data(all_data, result, solr_doc)
+    extract_subcluster_data(all_data, result, solr_doc)
+
+    solr_doc["individual"] = individual
+    return solr_doc
 
 
-def manage_root_node_parents():
-    for root_node in root_nodes:
-        root_node_iri = str(root_node["iri"])
-        taxon_beginning = root_node_iri[0:len(root_node_iri) - 3]
+def manage_root_node_parents(context):
+    for root_node in context.root_nodes:
+        all_cell = context.get_all_cells_of(str(root_node["iri"]))
+        if all_cell:
+            root_node["parents"] = [all_cell]
+            root_node["parent_labels"] = [ALL_CELLS]
+            root_node["parent_clusters"] = [all_cell]
+            root_node["parent_cluster_names"] = [ALL_CELLS]
 
-        for all_cell in all_cells:
-            if taxon_beginning in all_cell:
-                root_node["parents"] = [all_cell]
-                root_node["parent_labels"] = [ALL_CELLS]
-                root_node["parent_clusters"] = [all_cell]
-                root_node["parent_cluster_names"] = [ALL_CELLS]
 
-def check_root_nodes(solr_doc):
+def check_root_nodes(solr_doc, context):
+    """
+    Registers 'All cells' and root node documents to the dump context.
+    :return: True if the document is a root node, False otherwise.
+    """
     # identify all cells
     if "prefLabel" in solr_doc and ALL_CELLS in solr_doc["prefLabel"]:
-        all_cells.append(solr_doc["iri"])
+        context.add_all_cells(solr_doc["iri"])
 
     # identify root nodes
     if "rank" in solr_doc and "Class" in solr_doc["rank"]:
-        root_nodes.append(solr_doc)
+        context.add_root_node(solr_doc)
+        return True
+    return False
 
 
 def extract_individual_data(all_data, result, solr_doc):
@@ -133,7 +238,7 @@ def extract_individual_data(all_data, result, solr_doc):
     if "has_exact_synonym" in indv_metadata:
         exact_synonyms = solr_doc["has_exact_synonym"]
         for synonym in indv_metadata["has_exact_synonym"]:
-            synonym = str(synonym).split("\"value\":\"")[1].replace("\"}", "")
+            synonym = parse_axiom_value(synonym)
             if synonym not in exact_synonyms:
                 exact_synonyms.append(synonym)
         solr_doc["has_exact_synonym"] = exact_synonyms
@@ -141,7 +246,7 @@ def extract_individual_data(all_data, result, solr_doc):
     if "has_related_synonym" in indv_metadata:
         related_synonym = list()
         for synonym in indv_metadata["has_related_synonym"]:
-            synonym = str(synonym).split("\"value\":\"")[1].replace("\"}", "")
+            synonym = parse_axiom_value(synonym)
             if synonym not in related_synonym:
                 related_synonym.append(synonym)
         solr_doc["aliases"] = related_synonym
@@ -166,6 +271,7 @@ def extract_marker_data(all_data, result, solr_doc):
     markers = list()
     marker_labels = list()
     marker_names = dict()
+    # relation label -> marker iris. dict keys are used as an ordered set to keep the output deterministic
     relations = dict()
     for marker in result["markers"]:
         if marker["class_metadata"] is not None:
@@ -178,9 +284,9 @@ def extract_marker_data(all_data, result, solr_doc):
                 all_data[marker_iri] = extract_class_metadata(marker["class_metadata"])
             relation = marker["relation"]
             if relation["label"] not in relations.keys():
-                relations[relation["label"]] = {marker_iri}
+                relations[relation["label"]] = {marker_iri: None}
             else:
-                relations[relation["label"]].add(marker_iri)
+                relations[relation["label"]][marker_iri] = None
 
     for relation_type in relations:
         solr_doc[relation_type] = list(relations[relation_type])
@@ -220,7 +326,7 @@ def extract_reference_data(all_data, result, solr_doc):
     solr_doc["references"] = references
 
 
-def extract_taxonomy_data(all_data, result, solr_doc, all_datasets):
+def extract_taxonomy_data(all_data, result, solr_doc, context):
     base_taxonomy = ""
     parent_taxonomies = set()
     for taxon in result["taxonomy"]:
@@ -230,8 +336,7 @@ def extract_taxonomy_data(all_data, result, solr_doc, all_datasets):
             parent_taxonomies.add(taxon["parent_taxon"]["label"])
         else:
             # all null (individual without class)
-            taxonomy_id = [key for key in all_datasets.keys() if key in solr_doc["accession_id"]][0]
-            base_taxonomy = species_mapping[taxonomy_id]
+            base_taxonomy = context.get_species(solr_doc["accession_id"])
 
     if base_taxonomy:
         solr_doc["species"] = base_taxonomy
@@ -243,7 +348,7 @@ def extract_taxonomy_data(all_data, result, solr_doc, all_datasets):
                 solr_doc["species"] = parent_taxon
                 break
 
-    taxonomy_data = [value for key, value in all_datasets.items() if key in solr_doc["accession_id"]][0]
+    taxonomy_data = context.get_taxonomy(solr_doc["accession_id"])
     solr_doc["taxonomy_iri"] = taxonomy_data["taxonomy"]["iri"]
     solr_doc["taxonomy_id"] = taxonomy_data["taxonomy"]["label"]
 
@@ -286,7 +391,7 @@ def extract_subcluster_data(all_data, result, solr_doc):
     solr_doc["parent_cluster_names"] = parent_cluster_names
 
 
-def extract_brain_region_data(all_data, result, solr_doc, all_datasets):
+def extract_brain_region_data(all_data, result, solr_doc, context):
     brain_regions = dict()
     for region in result["region"]:
         if "soma_location" in region and region["soma_location"]:
@@ -294,49 +399,18 @@ def extract_brain_region_data(all_data, result, solr_doc, all_datasets):
         if "parent_soma_location" in region and region["parent_soma_location"]:
             brain_regions[region["parent_soma_location"]["curie"]] = region["parent_soma_location"]["label"]
 
-    taxonomy_name = [key for key in all_datasets.keys() if key in solr_doc["accession_id"]][0]
-    taxon = all_datasets[taxonomy_name]
-    # if "prefLabel" in taxon:
-    #     solr_doc["species"] = next(filter(None, taxon["prefLabel"]))
-    if brain_regions and "has_brain_region" in taxon:
+    taxonomy_regions = context.get_brain_regions(solr_doc["accession_id"])
+    if brain_regions and taxonomy_regions:
         brain_regions_set = set()
-        for taxon_region in taxon["has_brain_region"]:
+        for taxon_region in taxonomy_regions:
             brain_regions_set.add(brain_regions[taxon_region])
         solr_doc["anatomic_region"] = list(brain_regions_set)
 
 
 def extract_class_metadata(node_meta_data):
     if node_meta_data is not None:
-        print("Processing: " + node_meta_data["iri"])
-        solr_doc = dict()
-        solr_doc["id"] = node_meta_data["iri"]
-        solr_doc["iri"] = node_meta_data["iri"]
-        solr_doc["curie"] = node_meta_data["curie"]
-        solr_doc["label"] = node_meta_data["label"]
-        if "short_form" in node_meta_data:
-            solr_doc["short_form"] = node_meta_data["short_form"]
-        if "comment" in node_meta_data:
-            solr_doc["comment"] = node_meta_data["comment"]
-        if "tags" in node_meta_data:
-            solr_doc["tags"] = [tag for tag in node_meta_data["tags"] if tag not in tags_blacklist]
-        if "prefLabel" in node_meta_data:
-            solr_doc["prefLabel"] = node_meta_data["prefLabel"]
-        if "label_rdfs" in node_meta_data:
-            solr_doc["label_rdfs"] = node_meta_data["label_rdfs"]
-        if "has_exact_synonym" in node_meta_data:
-            exact_synonyms = list()
-            for synonym in node_meta_data["has_exact_synonym"]:
-                exact_synonyms.append(str(synonym).split("\"value\":\"")[1].replace("\"}", ""))
-            solr_doc["has_exact_synonym"] = exact_synonyms
-        if "hasOBONamespace" in node_meta_data:
-            solr_doc["hasOBONamespace"] = node_meta_data["hasOBONamespace"]
-        if "definition" in node_meta_data:
-            solr_doc["definition"] = str(node_meta_data["definition"][0]).split("\"value\":\"")[1].replace("\"}", "")
-        if "versionInfo" in node_meta_data:
-            solr_doc["versionInfo"] = node_meta_data["versionInfo"]
-        if "symbol" in node_meta_data:
-            solr_doc["symbol"] = next(filter(None, node_meta_data["symbol"]))
-
+        log.debug("Processing: %s", node_meta_data["iri"])
+        solr_doc = extract_class_fields(node_meta_data)
         if solr_doc["iri"].startswith(PCL_NS) or solr_doc["iri"].startswith(CL_NS):
             solr_doc["resolved_iri"] = OLS_TERM + solr_doc["iri"]
         else:
@@ -347,76 +421,24 @@ def extract_class_metadata(node_meta_data):
 
 
 def extract_reference_class_metadata(node_meta_data):
-    print("Processing: " + node_meta_data["iri"])
-    solr_doc = dict()
-    solr_doc["id"] = node_meta_data["iri"]
-    solr_doc["iri"] = node_meta_data["iri"]
-    solr_doc["curie"] = node_meta_data["curie"]
-    solr_doc["label"] = node_meta_data["label"]
-    if "creator" in node_meta_data:
-        solr_doc["creator"] = node_meta_data["creator"]
-    if "exactMatch" in node_meta_data:
-        solr_doc["exactMatch"] = next(filter(None, node_meta_data["exactMatch"]))
-    if "description" in node_meta_data:
-        solr_doc["description"] = node_meta_data["description"]
-    if "abstract" in node_meta_data:
-        solr_doc["abstract"] = next(filter(None, node_meta_data["abstract"]))
-    if "label_rdfs" in node_meta_data:
-        solr_doc["label_rdfs"] = node_meta_data["label_rdfs"]
-    if "bibliographicCitation" in node_meta_data:
-        solr_doc["bibliographicCitation"] = next(filter(None, node_meta_data["bibliographicCitation"]))
-    if "identifier" in node_meta_data:
-        solr_doc["identifier"] = node_meta_data["identifier"]
-    if "date" in node_meta_data:
-        solr_doc["date"] = next(filter(None, node_meta_data["date"]))
+    log.debug("Processing: %s", node_meta_data["iri"])
+    solr_doc = extract_reference_fields(node_meta_data)
     solr_doc["resolved_iri"] = solr_doc["iri"]
     return solr_doc
 
 
-def extract_dataset_metadata(all_data, all_taxonomies):
+def extract_dataset_metadata(all_data, context):
+    all_taxonomies = context.all_datasets
     for taxonomy in all_taxonomies:
         taxon = all_taxonomies[taxonomy]["taxonomy"]
-        print("Processing taxonomy: " + taxon["iri"])
-        solr_doc = dict()
-        solr_doc["id"] = taxon["iri"]
-        solr_doc["iri"] = taxon["iri"]
-        solr_doc["curie"] = taxon["curie"]
-        solr_doc["accession_id"] = taxon["label"]
-        solr_doc["label"] = taxon["label"]
+        log.debug("Processing taxonomy: %s", taxon["iri"])
+        solr_doc = extract_taxonomy_id_fields(taxon)
         solr_doc["type"] = "taxonomy"
 
         # check this logic for MTG id
         taxonomy_name = solr_doc["accession_id"].replace("CS", "").replace("CCN", "")
-        solr_doc["species_label"] = species_mapping[taxonomy_name]
-
-        if "cell_types_count" in taxon:
-            solr_doc["cell_types_count"] = next(filter(None, taxon["cell_types_count"]))
-        if "cell_subclasses_count" in taxon:
-            solr_doc["cell_subclasses_count"] = next(filter(None, taxon["cell_subclasses_count"]))
-        if "cell_classes_count" in taxon:
-            solr_doc["cell_classes_count"] = next(filter(None, taxon["cell_classes_count"]))
-        if "prefLabel" in taxon:
-            solr_doc["species"] = next(filter(None, taxon["prefLabel"]))
-        if "has_brain_region" in taxon:
-            solr_doc["anatomic_region"] = next(filter(None, taxon["has_brain_region"]))
-        if "has_sex" in taxon:
-            solr_doc["sex"] = next(filter(None, taxon["has_sex"]))
-        if "has_age" in taxon:
-            solr_doc["age"] = next(filter(None, taxon["has_age"]))
-        if "database_cross_reference" in taxon:
-            solr_doc["primary_citation"] = next(filter(None, taxon["database_cross_reference"]))
-        if "title" in taxon:
-            solr_doc["header"] = next(filter(None, taxon["title"]))
-        if "comment" in taxon:
-            solr_doc["mainDescription"] = next(filter(None, taxon["comment"]))
-        if "provenance" in taxon:
-            solr_doc["attribution"] = next(filter(None, taxon["provenance"]))
-        if "description" in taxon:
-            solr_doc["subDescription"] = next(filter(None, taxon["description"]))
-        if "subject" in taxon:
-            solr_doc["anatomy"] = next(filter(None, taxon["subject"]))
-        if "relation" in taxon:
-            solr_doc["anatomy_image"] = next(filter(None, taxon["relation"]))
+        solr_doc["species_label"] = context.species_mapping[taxonomy_name]
+        extract_taxonomy_fields(taxon, solr_doc)
 
         datasets = all_taxonomies[taxonomy]["datasets"]
         dataset_ids = extract_taxonomy_dataset_metadata(all_data, datasets, solr_doc["label"])
@@ -432,41 +454,17 @@ def extract_taxonomy_dataset_metadata(all_data, datasets, taxonomy_name):
     for dataset in datasets:
         dataset_metadata = dataset['dataset_metadata']
         if dataset_metadata:
-            ds_solr_doc = dict()
-            ds_solr_doc["id"] = dataset_metadata["iri"]
-            ds_solr_doc["iri"] = dataset_metadata["iri"]
-            ds_solr_doc["curie"] = dataset_metadata["curie"]
-            ds_solr_doc["label"] = dataset_metadata["label"]
-            ds_solr_doc["comment"] = dataset_metadata["comment"]
+            ds_solr_doc = extract_dataset_id_fields(dataset_metadata)
             ds_solr_doc["taxonomy"] = taxonomy_name
             ds_solr_doc["type"] = "dataset"
-            if "nuclei_count" in dataset_metadata:
-                ds_solr_doc["nuclei_count"] = next(filter(None, dataset_metadata["nuclei_count"]))
-            if "cell_count" in dataset_metadata:
-                ds_solr_doc["cell_count"] = next(filter(None, dataset_metadata["cell_count"]))
-            if "archivedAt" in dataset_metadata:
-                ds_solr_doc["download_link"] = next(filter(None, dataset_metadata["archivedAt"]))
-            if "discussionUrl" in dataset_metadata:
-                ds_solr_doc["explore_link"] = next(filter(None, dataset_metadata["discussionUrl"]))
-            if "symbol" in dataset_metadata:
-                ds_solr_doc["symbol"] = next(filter(None, dataset_metadata["symbol"]))
-            if "prefLabel" in dataset_metadata:
-                ds_solr_doc["dataset"] = next(filter(None, dataset_metadata["prefLabel"]))
-            if "assesses" in dataset_metadata:
-                ds_solr_doc["species"] = next(filter(None, dataset_metadata["assesses"]))
-            if "position" in dataset_metadata:
-                ds_solr_doc["region"] = next(filter(None, dataset_metadata["position"]))
-            if "headline" in dataset_metadata:
-                ds_solr_doc["dataset_number"] = next(filter(None, dataset_metadata["headline"]))
+            extract_dataset_fields(dataset_metadata, ds_solr_doc)
 
             all_data[ds_solr_doc["iri"]] = ds_solr_doc
             dataset_ids.append(dataset_metadata["iri"])
     return dataset_ids
 
 
-def get_version_metadata(all_data):
-    ont_metadata = GetOntologyMetadata().execute_query()
-
+def get_version_metadata(ont_metadata):
     solr_doc = dict()
     solr_doc["id"] = "ontology"
     solr_doc["iri"] = "ontology"
@@ -476,29 +474,152 @@ def get_version_metadata(all_data):
     return solr_doc
 
 
-def dump_to_file(data, path):
-    print("Writing data to file. Object count is : " + str(len(data)))
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+def execute_queries(queries, workers=1):
+    """
+    Executes the given parameterless queries, concurrently if more than one worker is allowed.
+    :return: list of query results in the order of the given queries
+    """
+    if workers <= 1:
+        return [query.execute_query() for query in queries]
+    with ThreadPoolExecutor(max_workers=min(workers, len(queries))) as executor:
+        return list(executor.map(lambda query: query.execute_query(), queries))
+
+
+def update_solr(dump_path=SOLR_JSON_PATH):
+    """
+    Indexes the Solr dump in batches. Solr host, collection and indexing settings are read from search_config.ini.
+    """
+    with SolrBulkIndexer.from_config(indexer_config) as indexer:
+        count = indexer.index_dump(dump_path)
+    log.info("Indexed document count is : " + str(count))
+
+
+def update_solr_delta(delta_path):
+    """
+    Pushes a delta dump to Solr: added documents and atomic updates of the changed documents, then deletes the removed
+    documents by id.
+    """
+    with open(delta_path, encoding='utf-8') as f:
+        delta = json.load(f)
+
+    with SolrBulkIndexer.from_config(indexer_config) as indexer:
+        count = indexer.index_documents(delta["added"] + delta["updated"], commit=False)
+        if delta["deleted"]:
+            indexer.delete(delta["deleted"])
+        if not indexer.commit_within:
+            indexer.commit()
+    log.info("Indexed document count is : {}, deleted document count is : {}".format(count, len(delta["deleted"])))
+
+
+def publish_solr_dump(solr_dump_path, delta=False, index=False):
+    """
+    Writes the delta of the Solr dump and indexes the dump, or only its delta, to Solr. When there is no previous dump
+    to compute the delta of, the whole dump is indexed.
+    """
+    metrics = get_metrics()
+    if delta:
+        with metrics.stage_block("delta"):
+            delta_path = write_delta_dump(solr_dump_path)
+        if delta_path and index:
+            with metrics.stage_block("solr_index"):
+                update_solr_delta(delta_path)
+            return
+        if index:
+            log.info("No delta to index, indexing the whole dump: " + solr_dump_path)
+    if index:
+        with metrics.stage_block("solr_index"):
+            update_solr(solr_dump_path)
+
+
+def configure_query_cache(cache=False, no_cache=False, clear_cache=False):
+    """
+    Enables the query result cache if it is requested or enabled in neo4j_config.ini, and not bypassed.
+    """
+    if clear_cache:
+        QueryCache.from_config(query_cache_config).clear()
+    if not no_cache and (cache or query_cache_config.getboolean("enabled", fallback=False)):
+        set_query_cache(QueryCache.from_config(query_cache_config, version_provider=get_ontology_version))
 
 
-def dump_map_to_file(map_data, path):
-    print("Writing data to file. Object count is : " + str(len(map_data.values())))
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(list(map_data.values()), f, ensure_ascii=False, indent=4)
+def configure_query_replay(record_path=None, replay_path=None, replay_latency=None):
+    """
+    Enables recording or replay of the query responses.
+    :return: QueryRecorder to be saved at the end of the run, or None if not recording
+    """
+    if replay_path:
+        set_query_replayer(QueryReplayer(replay_path, parse_latency(replay_latency)))
+    if record_path:
+        recorder = QueryRecorder(record_path)
+        set_query_recorder(recorder)
+        return recorder
+    return None
 
 
-def update_solr():
-    url = "http://ec2-3-143-113-50.us-east-2.compute.amazonaws.com:8993/solr/bdsdump/update"
-    # url = "http://localhost:8993/solr/bdsdump/update"
-    headers = {"Content-type": "application/json"}
-    params = {"commit": "true"}
-    payload = open(SOLR_JSON_PATH, "rb").read()
-    r = requests.post(url, data=payload, params=params, headers=headers)
-    print("got back: %s" % r.text)
+def create_argument_parser(description):
+    """
+    Creates the command line parser with the query, transform, cache, metrics and replay arguments shared by the dump
+    scripts (bds_dumps.py and dump_pipeline.py).
+    :param description: description of the script
+    :return: ArgumentParser
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of concurrent Neo4j queries. Should not exceed max_connection_pool_size.")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="Number of processes that transform the individuals to Solr documents.")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--cache", action="store_true",
+                             help="Cache the query results on disk, keyed by the ontology version. Only use it if "
+                                  "the ontology version changes whenever Neo4j is reloaded.")
+    cache_group.add_argument("--no-cache", action="store_true",
+                             help="Bypass the query result cache even if it is enabled in neo4j_config.ini.")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Remove all entries of the query result cache before the run.")
+    parser.add_argument("-m", "--metrics-output", help="Write the JSON run metrics summary to the given path.")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Take tracemalloc snapshots of each stage. Slows down the run.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log each processed node.")
+    replay_group = parser.add_mutually_exclusive_group()
+    replay_group.add_argument("--record", help="Record the query responses to the given fixture file.")
+    replay_group.add_argument("--replay", help="Replay the query responses of the given fixture file instead of "
+                                               "querying Neo4j.")
+    parser.add_argument("--replay-latency",
+                        help="Simulated latency of the replayed queries: seconds or 'recorded'.")
+    return parser
+
+
+def main():
+    parser = create_argument_parser("Generates the Brain Data Standards dumps.")
+    parser.add_argument("-f", "--format", dest="dump_format", choices=DUMP_FORMATS, default=JSON_FORMAT,
+                        help="Dump file format. 'ndjson' writes one document per line, 'jsonz' writes "
+                             "compressed records with a lookup index.")
+    parser.add_argument("-n", "--nested", action="store_true",
+                        help="Also write the nested individuals metadata dump.")
+    parser.add_argument("-d", "--delta", action="store_true",
+                        help="Also write the delta of the Solr dump against the previous dump in the dumps folder.")
+    parser.add_argument("-i", "--index", action="store_true",
+                        help="Index the Solr dump (or only its delta if --delta is given) to Solr.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    metrics = start_run(args.trace_memory)
+    recorder = configure_query_replay(args.record, args.replay, args.replay_latency)
+    if not args.replay:
+        configure_query_cache(args.cache, args.no_cache, args.clear_cache)
+    try:
+        if args.nested:
+            with metrics.stage_block("nested_dump"):
+                individuals_metadata_dump(args.workers, args.dump_format)
+        with metrics.stage_block("solr_dump"):
+            individuals_metadata_solr_dump(args.workers, args.dump_format, args.processes)
+        publish_solr_dump(get_dump_path(SOLR_JSON_PATH, args.dump_format), args.delta, args.index)
+    finally:
+        close_drivers()
+        if recorder is not None:
+            recorder.save()
+        metrics.log_summary(args.metrics_output)
 
 
 if __name__ == "__main__":
-    # individuals_metadata_dump()
-    individuals_metadata_solr_dump()
-    # update_solr()
+    main()
@@ -1,44 +1,164 @@
+import time
 import logging
-from neo4j import GraphDatabase
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from bds_api.dumps.neo4j_config import neo4j_config
+from bds_api.dumps.neo4j_driver import get_driver
+from bds_api.dumps.dump_metrics import get_metrics, FETCH_STAGE
 
 
 log = logging.getLogger(__name__)
 
+DEFAULT_BATCH_SIZE = 100
+
+# optional persistent query result cache, see set_query_cache
+query_cache = None
+
+# optional query response recorder and replayer, see set_query_recorder and set_query_replayer
+query_recorder = None
+query_replayer = None
+
+
+def set_query_cache(cache):
+    """
+    Enables (or disables if None) the persistent query result cache for all cacheable queries.
+    :param cache: QueryCache instance
+    """
+    global query_cache
+    query_cache = cache
+
+
+def set_query_recorder(recorder):
+    """
+    Enables (or disables if None) recording of all query responses.
+    :param recorder: QueryRecorder instance
+    """
+    global query_recorder
+    query_recorder = recorder
+
+
+def set_query_replayer(replayer):
+    """
+    Enables (or disables if None) replay of the recorded query responses. Replayed queries never connect to the
+    database.
+    :param replayer: QueryReplayer instance
+    """
+    global query_replayer
+    query_replayer = replayer
+
+
+def get_ontology_version():
+    """
+    Version of the loaded ontology, always read from the database.
+    """
+    return GetOntologyMetadata().execute_query()["version"]
+
+
+def chunks(items, size):
+    """
+    Splits the given list into consecutive chunks of the given size.
+    """
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
 
 class BDSQuery(ABC):
     """
     Abstract base class for Bran Data Standards queries.
     """
 
-    def __init__(self):
-        try:
-            self.driver = GraphDatabase.driver(neo4j_config["bolt_url"],
-                                               auth=(neo4j_config["user"], neo4j_config["password"]))
-        except Exception:
-            log.exception("Failed to create the Neo4j driver.")
+    # results are cached by the query cache if enabled
+    cacheable = True
+
+    @property
+    def driver(self):
+        """
+        Shared Neo4j driver of the process. Looked up on each use, so queries reused after
+        neo4j_driver.close_drivers get a new driver instead of the closed one.
+        """
+        return get_driver()
 
     def close(self):
-        if self.driver is not None:
-            self.driver.close()
+        """
+        Driver is shared by all queries of the process, so it is not closed here. See neo4j_driver.close_drivers.
+        """
 
     def execute_query(self, parameters=None, **kwparameters):
+        if query_replayer is not None:
+            return query_replayer.replay(self, parameters)
+
+        start = time.perf_counter()
+        result = self.execute_cached_query(parameters, **kwparameters)
+        if query_recorder is not None:
+            query_recorder.record(self, parameters, result, time.perf_counter() - start)
+        return result
+
+    def execute_cached_query(self, parameters=None, **kwparameters):
+        cache = query_cache
+        if cache is None or not self.cacheable or kwparameters:
+            return self.run_query(parameters, **kwparameters)
+
+        items = self.split_parameters(parameters)
+        if len(items) == 1 and items[0] == parameters:
+            key = cache.get_key(self, parameters)
+            result = cache.get(key)
+            if result is None:
+                result = self.run_query(parameters)
+                cache.put(key, result)
+            return result
+
+        # batch results are cached per item, so cache entries don't depend on the batch composition
+        result = dict()
+        missing = list()
+        for item_parameters in items:
+            item_result = cache.get(cache.get_key(self, item_parameters))
+            if item_result is None:
+                missing.append(item_parameters)
+            else:
+                result.update(item_result)
+        if missing:
+            missing_parameters = self.merge_parameters(missing)
+            for item_parameters, item_result in self.split_result(missing_parameters,
+                                                                  self.run_query(missing_parameters)):
+                cache.put(cache.get_key(self, item_parameters), item_result)
+                result.update(item_result)
+        return result
+
+    def split_parameters(self, parameters):
+        """
+        Splits the parameters of a batch query into the parameters of its items. Used by the query replay.
+        """
+        return [parameters]
+
+    def split_result(self, parameters, result):
+        """
+        Splits the result of a batch query into (item parameters, item result) pairs. Used by the query recorder.
+        """
+        return [(parameters, result)]
+
+    def merge_parameters(self, items):
+        """
+        Merges the parameters of the items into the parameters of a single query. Reverse of the split_parameters.
+        """
+        return items[0]
+
+    def run_query(self, parameters=None, **kwparameters):
         session = None
         response = None
         try:
             session = self.driver.session(database="neo4j")
             log.info("Executing query...")
+            start = time.perf_counter()
             response = list(session.run(query=self.get_query(), parameters=parameters, kwparameters=kwparameters))
+            get_metrics().record_query(type(self).__name__, time.perf_counter() - start)
         except Exception:
             log.exception("Query failed execution failed.")
         finally:
             if session is not None:
                 session.close()
 
-        result = self.parse_response(response)
-        self.close()
-        return result
+        return self.parse_response(response)
 
     @abstractmethod
     def get_query(self):
@@ -49,6 +169,69 @@ class BDSQuery(ABC):
         pass
 
 
+# Each aspect of the individual is collected in its own subquery. Chaining the OPTIONAL MATCH clauses instead creates a
+# cartesian product of all aspects (parents x markers x references x ...) before the collect(distinct ...) calls.
+# Aspects of individuals with several exemplar classes are merged with apoc.coll.toSet, so entries shared by the classes
+# are listed once like in the collect(distinct ...) of the chained query.
+INDIVIDUAL_DETAILS_QUERY_BODY = """
+        CALL {
+            WITH i
+            OPTIONAL MATCH (i)-[:subcluster_of*]->(parent_cluster)
+            WHERE NOT('None' IN parent_cluster.cell_type_rank)
+            OPTIONAL MATCH (parent_cluster)-[:exemplar_data_of]->(parent_cluster_class)
+            RETURN collect(distinct { indv_metadata: properties(parent_cluster), class_metadata: properties(parent_cluster_class)}) AS parent_clusters
+        }
+        OPTIONAL MATCH (i)-[:exemplar_data_of]->(c:Class)
+        CALL {
+            WITH c
+            OPTIONAL MATCH (c)-[scr:SUBCLASSOF]->(parent)
+            RETURN collect(distinct { relation: properties(scr), class_metadata: properties(parent)}) AS parents
+        }
+        CALL {
+            WITH c
+            OPTIONAL MATCH (c)-[er:expresses]->(marker)
+            RETURN collect(distinct { relation: properties(er), class_metadata: properties(marker)}) AS markers
+        }
+        CALL {
+            WITH c
+            OPTIONAL MATCH (c)-[:SUBCLASSOF*]->()-[erp:expresses]->(parent_marker)
+            RETURN collect(distinct { relation: properties(erp), class_metadata: properties(parent_marker)}) AS parent_markers
+        }
+        CALL {
+            WITH c
+            OPTIONAL MATCH (c)-[src:source]->(reference)
+            RETURN collect(distinct { relation: properties(src), class_metadata: properties(reference)}) AS references
+        }
+        CALL {
+            WITH c
+            OPTIONAL MATCH (c)-[:in_taxon]->(in_taxon)
+            OPTIONAL MATCH (c)-[:SUBCLASSOF*]->()-[:in_taxon]->(in_taxon_parent)
+            RETURN collect(distinct { taxon: properties(in_taxon), parent_taxon: properties(in_taxon_parent)}) AS taxonomy
+        }
+        CALL {
+            WITH c
+            OPTIONAL MATCH (c)-[:has_soma_location]->(soma_location)
+            OPTIONAL MATCH (c)-[:SUBCLASSOF*]->()-[:has_soma_location]->(parent_soma_location)
+            RETURN collect(distinct { soma_location: properties(soma_location), parent_soma_location: properties(parent_soma_location)}) AS region
+        }
+        CALL {
+            WITH c
+            OPTIONAL MATCH (c)-[:in_historical_homology_relationship_with]->(homologous_to)
+            RETURN collect(distinct { class_metadata: properties(homologous_to)}) AS homologous_to
+        }
+        RETURN i.curie AS curie, apoc.map.mergeList([properties(i), {tags: labels(i)}]) AS indv_metadata,
+        collect(distinct { tags: labels(c), class_metadata: properties(c)}) AS class_metadata,
+        apoc.coll.toSet(apoc.coll.flatten(collect(parents))) AS parents,
+        apoc.coll.toSet(apoc.coll.flatten(collect(markers))) AS markers,
+        apoc.coll.toSet(apoc.coll.flatten(collect(parent_markers))) AS parent_markers,
+        apoc.coll.toSet(apoc.coll.flatten(collect(references))) AS references,
+        apoc.coll.toSet(apoc.coll.flatten(collect(taxonomy))) AS taxonomy,
+        apoc.coll.toSet(apoc.coll.flatten(collect(region))) AS region,
+        apoc.coll.toSet(apoc.coll.flatten(collect(homologous_to))) AS homologous_to,
+        parent_clusters
+        """
+
+
 class IndividualDetailsQuery(BDSQuery):
 
     def get_query(self):
@@ -56,43 +239,98 @@ class IndividualDetailsQuery(BDSQuery):
         return """
         MATCH (i:Individual) 
         WHERE i.curie = 'PCL:' + $accession  
-        OPTIONAL MATCH (i:Individual)-[:exemplar_data_of]->(c:Class)
-        OPTIONAL MATCH (c)-[scr:SUBCLASSOF]->(parent) 
-        OPTIONAL MATCH (c)-[er:expresses]->(marker)
-        OPTIONAL MATCH (c)-[:SUBCLASSOF*]->()-[erp:expresses]->(parent_marker)
-        OPTIONAL MATCH (c)-[src:source]->(reference) 
-        OPTIONAL MATCH (c)-[:in_taxon]->(in_taxon) 
-        OPTIONAL MATCH (c)-[:SUBCLASSOF*]->()-[:in_taxon]->(in_taxon_parent)
-        OPTIONAL MATCH (c)-[:has_soma_location]->(soma_location) 
-        OPTIONAL MATCH (c)-[:SUBCLASSOF*]->()-[:has_soma_location]->(parent_soma_location)
-        OPTIONAL MATCH (c)-[:in_historical_homology_relationship_with]->(homologous_to)
-        OPTIONAL MATCH (i)-[:subcluster_of*]->(parent_cluster)
-        WHERE NOT('None' IN parent_cluster.cell_type_rank)
-        OPTIONAL MATCH (parent_cluster)-[:exemplar_data_of]->(parent_cluster_class)
-        RETURN apoc.map.mergeList([properties(i), {tags: labels(i)}]) AS indv_metadata,
-        collect(distinct { tags: labels(c), class_metadata: properties(c)}) AS class_metadata,
-        collect(distinct { relation: properties(scr), class_metadata: properties(parent)}) AS parents, 
-        collect(distinct { relation: properties(er), class_metadata: properties(marker)}) AS markers,
-        collect(distinct { relation: properties(erp), class_metadata: properties(parent_marker)}) AS parent_markers,
-        collect(distinct { relation: properties(src), class_metadata: properties(reference)}) AS references,
-        collect(distinct { taxon: properties(in_taxon), parent_taxon: properties(in_taxon_parent)}) AS taxonomy, 
-        collect(distinct { soma_location: properties(soma_location), parent_soma_location: properties(parent_soma_location)}) AS region,
-        collect(distinct { class_metadata: properties(homologous_to)}) AS homologous_to,
-        collect(distinct { indv_metadata: properties(parent_cluster), class_metadata: properties(parent_cluster_class)}) AS parent_clusters
-        """
+        """ + INDIVIDUAL_DETAILS_QUERY_BODY
 
     def parse_response(self, response):
         node = {}
         for record in response:
-            node = {"class_metadata": record["class_metadata"], "indv_metadata": record["indv_metadata"],
-                    "parents": record["parents"], "markers": record["markers"],
-                    "parent_markers": record["parent_markers"], "references": record["references"],
-                    "taxonomy": record["taxonomy"], "region": record["region"],
-                    "homologous_to": record["homologous_to"], "parent_clusters": record["parent_clusters"]
-                    }
+            node = self.parse_record(record)
 
         return node
 
+    @staticmethod
+    def parse_record(record):
+        return {"class_metadata": record["class_metadata"], "indv_metadata": record["indv_metadata"],
+                "parents": record["parents"], "markers": record["markers"],
+                "parent_markers": record["parent_markers"], "references": record["references"],
+                "taxonomy": record["taxonomy"], "region": record["region"],
+                "homologous_to": record["homologous_to"], "parent_clusters": record["parent_clusters"]
+                }
+
+
+class IndividualDetailsBatchQuery(IndividualDetailsQuery):
+    """
+    Batched variant of the IndividualDetailsQuery. Fetches the details of many individuals in a single round-trip and
+    returns the results keyed by the individual curie.
+    """
+
+    def __init__(self, batch_size=None):
+        super().__init__()
+        if batch_size is None:
+            batch_size = neo4j_config.getint("batch_size", fallback=DEFAULT_BATCH_SIZE)
+        self.batch_size = batch_size
+
+    def get_query(self):
+        log.info("Executing: IndividualDetailsBatchQuery")
+        return """
+        UNWIND $accessions AS accession
+        MATCH (i:Individual) 
+        WHERE i.curie = 'PCL:' + accession  
+        """ + INDIVIDUAL_DETAILS_QUERY_BODY
+
+    def parse_response(self, response):
+        nodes = dict()
+        for record in response:
+            nodes[record["curie"]] = self.parse_record(record)
+
+        return nodes
+
+    def split_parameters(self, parameters):
+        return [{"accessions": [accession]} for accession in parameters["accessions"]]
+
+    def merge_parameters(self, items):
+        return {"accessions": [accession for item in items for accession in item["accessions"]]}
+
+    def split_result(self, parameters, result):
+        items = list()
+        for accession in parameters["accessions"]:
+            curie = "PCL:" + accession
+            items.append(({"accessions": [accession]}, {curie: result[curie]} if curie in result else {}))
+        return items
+
+    def execute_in_batches(self, individuals, workers=1):
+        """
+        Fetches the details of the given individuals batch by batch. When more than one worker is given, batches are
+        fetched concurrently by a thread pool with at most 2 * workers batches in flight.
+        :param individuals: list of individual curies (such as 'PCL:0011628')
+        :param workers: number of concurrent batch queries
+        :return: generator of (individual curie, individual details) tuples in the order of the given individuals
+        """
+        if workers <= 1:
+            for batch in chunks(individuals, self.batch_size):
+                yield from self.get_batch_results(batch, self.execute_batch(batch))
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            in_flight = deque()
+            for batch in chunks(individuals, self.batch_size):
+                if len(in_flight) >= 2 * workers:
+                    done_batch, future = in_flight.popleft()
+                    yield from self.get_batch_results(done_batch, future.result())
+                in_flight.append((batch, executor.submit(self.execute_batch, batch)))
+            while in_flight:
+                done_batch, future = in_flight.popleft()
+                yield from self.get_batch_results(done_batch, future.result())
+
+    def execute_batch(self, batch):
+        with get_metrics().time_stage(FETCH_STAGE, len(batch)):
+            return self.execute_query({"accessions": [individual.replace("PCL:", "") for individual in batch]})
+
+    @staticmethod
+    def get_batch_results(batch, results):
+        for individual in batch:
+            yield individual, results.get(individual, {})
+
 
 class ListAllAllenIndividuals(BDSQuery):
 
@@ -121,7 +359,7 @@ class ListAllTaxonomies(BDSQuery):
         WHERE c.curie = 'PCL:0010002' 
         OPTIONAL MATCH (d)-[r:includedInDataCatalog]->(i)
         OPTIONAL MATCH (i)-[src:source]->(reference) 
-        RETURN i as taxonomy, collect(distinct { dataset_metadata: properties(d)}) AS datasets, 
+        RETURN properties(i) as taxonomy, collect(distinct { dataset_metadata: properties(d)}) AS datasets, 
             collect(distinct { class_metadata: properties(reference)}) AS references 
         """
 
@@ -138,6 +376,9 @@ class ListAllTaxonomies(BDSQuery):
 
 class GetOntologyMetadata(BDSQuery):
 
+    # version is the query cache key, so it should always be fresh
+    cacheable = False
+
     def get_query(self):
         log.info("Executing: GetOntologyMetadata")
         return """
@@ -0,0 +1,149 @@
+"""
+Scaling benchmark of the Solr dump. Runs the dump transform over synthetic data (see synthetic_data.py) at increasing
+scales and reports the time, throughput and peak memory of each scale. Each scale runs in its own process so that the
+peak RSS of a scale is not inflated by the previous ones, and a failing (for example out of memory) scale doesn't stop
+the benchmark:
+
+    python dump_benchmark.py --scales 1 10 100 --output ../../../dumps/dump_benchmark.json
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from bds_api.dumps.bds_dumps import populate_solr_documents
+from bds_api.dumps.dump_io import open_writer, get_dump_path, StreamingDocumentStore, JSON_FORMAT, DUMP_FORMATS
+from bds_api.dumps.dump_metrics import start_run
+from bds_api.dumps.synthetic_data import SyntheticDataConfig, SyntheticDataGenerator, GENERATE_STAGE
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SCALES = [1, 10, 100]
+
+# lines of the failed scale's stderr kept in the report
+ERROR_TAIL_LINES = 20
+
+
+def get_base_config(args):
+    return SyntheticDataConfig(taxonomies=args.taxonomies, individuals_per_taxonomy=args.individuals,
+                               markers_per_class=args.markers, hierarchy_depth=args.depth,
+                               homology_links=args.homology_links, seed=args.seed)
+
+
+def run_scale(config, output_dir, dump_format=JSON_FORMAT, processes=1):
+    """
+    Runs the Solr dump transform over the synthetic data of the given configuration.
+    :return: result dictionary of the run
+    """
+    generator = SyntheticDataGenerator(config)
+    metrics = start_run()
+    dump_path = get_dump_path(os.path.join(output_dir, "individuals_metadata_solr_synthetic.json"), dump_format)
+    with metrics.stage_block("solr_dump"):
+        with open_writer(dump_path, dump_format) as writer:
+            all_data = StreamingDocumentStore(writer)
+            populate_solr_documents(all_data, generator.iter_individual_results(), generator.list_all_taxonomies(),
+                                    generator.get_ontology_metadata(), processes, generator.get_species_mapping())
+            all_data.flush()
+
+    summary = metrics.get_summary()
+    seconds = summary["blocks"]["solr_dump"]["seconds"]
+    # synthetic data is generated lazily in the dump loop, so it overlaps with the transform of the worker processes.
+    # Its time is reported separately rather than subtracted.
+    generate = summary["stages"].get(GENERATE_STAGE, {}).get("seconds", 0)
+    return {"individuals": config.taxonomies * config.individuals_per_taxonomy,
+            "documents": summary["documents"],
+            "seconds": round(seconds, 3),
+            "generate_seconds": round(generate, 3),
+            "docs_per_sec": round(summary["documents"] / seconds, 2) if seconds else None,
+            "peak_rss_mb": summary["blocks"]["solr_dump"]["peak_rss_mb"],
+            "dump_size_mb": round(os.path.getsize(dump_path) / (1024 * 1024), 2),
+            "stages": summary["stages"]}
+
+
+def run_scale_process(scale, args, output_dir):
+    """
+    Runs a single scale of the benchmark in a new Python process.
+    :return: result dictionary of the scale
+    """
+    command = [sys.executable, "-m", "bds_api.dumps.dump_benchmark", "--run-scale", str(scale),
+               "--dump-dir", output_dir, "--format", args.format, "--processes", str(args.processes),
+               "--taxonomies", str(args.taxonomies), "--individuals", str(args.individuals),
+               "--markers", str(args.markers), "--depth", str(args.depth),
+               "--homology-links", str(args.homology_links), "--seed", str(args.seed)]
+    env = dict(os.environ)
+    src_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src_dir, env.get("PYTHONPATH")]))
+    log.info("Running the dump benchmark at {}x scale".format(scale))
+    completed = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    if completed.returncode != 0:
+        error = "\n".join(completed.stderr.strip().splitlines()[-ERROR_TAIL_LINES:])
+        log.error("Dump benchmark failed at {}x scale:\n{}".format(scale, error))
+        return {"scale": scale, "failed": True, "returncode": completed.returncode, "error": error}
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["scale"] = scale
+    return result
+
+
+def log_results(results):
+    log.info("{:>6} {:>12} {:>12} {:>10} {:>12} {:>12}".format("scale", "individuals", "documents", "seconds",
+                                                               "docs/sec", "peak RSS MB"))
+    for result in results:
+        if result.get("failed"):
+            log.info("{:>5}x failed with exit code {}".format(result["scale"], result["returncode"]))
+        else:
+            log.info("{:>5}x {:>12} {:>12} {:>10} {:>12} {:>12}".format(
+                result["scale"], result["individuals"], result["documents"], result["seconds"],
+                result["docs_per_sec"], result["peak_rss_mb"]["self"] if result["peak_rss_mb"] else None))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the Solr dump over synthetic data at increasing scales.")
+    parser.add_argument("-s", "--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="Scale factors of the individuals per taxonomy. Defaults to 1 10 100.")
+    parser.add_argument("-o", "--output", help="Write the JSON benchmark report to the given path.")
+    parser.add_argument("-f", "--format", choices=DUMP_FORMATS, default=JSON_FORMAT, help="Dump file format.")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="Number of processes that transform the individuals to Solr documents.")
+    parser.add_argument("--taxonomies", type=int, default=4, help="Number of taxonomies.")
+    parser.add_argument("--individuals", type=int, default=200, help="Individuals per taxonomy at 1x scale.")
+    parser.add_argument("--markers", type=int, default=4, help="Marker genes per class.")
+    parser.add_argument("--depth", type=int, default=4, help="Depth of the taxonomy dendrograms.")
+    parser.add_argument("--homology-links", type=int, default=1, help="Homologous classes of each cell type.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed of the synthetic data.")
+    parser.add_argument("--keep-dumps", help="Keep the dump files of the scales in the given directory.")
+    parser.add_argument("--run-scale", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--dump-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+                        stream=sys.stderr)
+    if args.run_scale is not None:
+        # single scale run of a benchmark process, result is the last line of stdout
+        result = run_scale(get_base_config(args).scale(args.run_scale), args.dump_dir, args.format, args.processes)
+        sys.stdout.write(json.dumps(result) + "\n")
+        return
+
+    results = list()
+    for scale in args.scales:
+        dump_dir = os.path.join(args.keep_dumps, "{}x".format(scale)) if args.keep_dumps else tempfile.mkdtemp()
+        os.makedirs(dump_dir, exist_ok=True)
+        try:
+            results.append(run_scale_process(scale, args, dump_dir))
+        finally:
+            if not args.keep_dumps:
+                shutil.rmtree(dump_dir, ignore_errors=True)
+
+    log_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(get_base_config(args)), "processes": args.processes, "format": args.format,
+                       "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# prefix of the individual accession ids, followed by the simple taxonomy id
+ACCESSION_PREFIX = "CS"
+
+
+class DumpContext(object):
+    """
+    Lookup indexes of a single Solr dump run. Built once per run from the ListAllTaxonomies result and the species
+    mapping, and collects the root nodes and 'All cells' nodes found while processing the individuals.
+    """
+
+    def __init__(self, all_datasets, species_mapping):
+        """
+        :param all_datasets: ListAllTaxonomies result (simple taxonomy id to taxonomy data)
+        :param species_mapping: simple taxonomy id to species label mapping
+        """
+        self.all_datasets = all_datasets
+        self.species_mapping = species_mapping
+        # accession prefix (such as 'CS202002013') to simple taxonomy id
+        self.taxonomy_ids = {ACCESSION_PREFIX + taxonomy_id: taxonomy_id for taxonomy_id in all_datasets}
+        # simple taxonomy id to the brain region curies of the taxonomy
+        self.brain_regions = {taxonomy_id: taxonomy["has_brain_region"]
+                              for taxonomy_id, taxonomy in all_datasets.items() if "has_brain_region" in taxonomy}
+        self.root_nodes = list()
+        # 'All cells' iri without its last 3 characters to the 'All cells' iri
+        self.all_cells = dict()
+
+    def get_taxonomy_id(self, accession_id):
+        """
+        Resolves the simple taxonomy id (such as '202002013') of the given accession id (such as 'CS202002013_189').
+        """
+        taxonomy_id = self.taxonomy_ids.get(accession_id.rsplit("_", 1)[0])
+        if taxonomy_id is None:
+            raise KeyError("Taxonomy of the accession id couldn't be resolved: " + accession_id)
+        return taxonomy_id
+
+    def get_taxonomy(self, accession_id):
+        return self.all_datasets[self.get_taxonomy_id(accession_id)]
+
+    def get_species(self, accession_id):
+        return self.species_mapping[self.get_taxonomy_id(accession_id)]
+
+    def get_brain_regions(self, accession_id):
+        """
+        :return: brain region curies of the taxonomy of the given accession id
+        """
+        return self.brain_regions.get(self.get_taxonomy_id(accession_id), [])
+
+    def add_all_cells(self, iri):
+        self.all_cells[iri[0:len(iri) - 3]] = iri
+
+    def add_root_node(self, solr_doc):
+        self.root_nodes.append(solr_doc)
+
+    def get_all_cells_of(self, root_node_iri):
+        """
+        Finds the 'All cells' node of the taxonomy of the given root node. Nodes of the same taxonomy share the same
+        iri prefix.
+        :return: 'All cells' iri or None
+        """
+        taxon_beginning = root_node_iri[0:len(root_node_iri) - 3]
+        all_cell = self.all_cells.get(taxon_beginning)
+        if all_cell is None:
+            # iris of different lengths, fallback to substring search
+            for all_cell_iri in self.all_cells.values():
+                if taxon_beginning in all_cell_iri:
+                    all_cell = all_cell_iri
+        return all_cell
@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import hashlib
+import logging
+from bds_api.dumps.dump_io import iter_dump_documents
+
+log = logging.getLogger(__name__)
+
+SOLR_DUMP_PATTERN = re.compile(r"individuals_metadata_solr_(\d{8})\.(json|ndjson|jsonz)$")
+
+
+def fingerprint(doc):
+    """
+    Content hash of a Solr document. Order of the multi-valued fields is ignored, since Neo4j collect() order is not
+    stable between database loads.
+    """
+    canonical = dict()
+    for field, value in doc.items():
+        if isinstance(value, list):
+            value = sorted(value, key=lambda item: json.dumps(item, sort_keys=True))
+        canonical[field] = value
+    serialized = json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+
+def find_previous_dump(current_path):
+    """
+    Finds the most recent Solr dump in the folder of the given dump that is dated before the given dump.
+    :return: path of the previous dump or None if there is no previous dump.
+    """
+    dump_dir = os.path.dirname(os.path.abspath(current_path))
+    current_name = os.path.basename(current_path)
+    current_match = SOLR_DUMP_PATTERN.match(current_name)
+    candidates = list()
+    for file_name in os.listdir(dump_dir):
+        match = SOLR_DUMP_PATTERN.match(file_name)
+        if not match or file_name == current_name:
+            continue
+        if current_match is None or match.group(1) < current_match.group(1):
+            candidates.append((match.group(1), file_name))
+    if not candidates:
+        return None
+    return os.path.join(dump_dir, max(candidates)[1])
+
+
+def index_dump(path):
+    """
+    Reads the fingerprint and field names of all documents of the dump.
+    :return: dict of document id to (fingerprint, field names) tuple
+    """
+    index = dict()
+    for doc in iter_dump_documents(path):
+        index[doc["id"]] = (fingerprint(doc), frozenset(doc.keys()))
+    return index
+
+
+def to_atomic_update(doc, previous_fields):
+    """
+    Creates a Solr atomic update document that sets all fields of the new document and removes the fields that no
+    longer exist. Atomic updates require all fields of the collection to be stored (or docValues).
+    """
+    update = {"id": doc["id"]}
+    for field, value in doc.items():
+        if field != "id":
+            update[field] = {"set": value}
+    for field in previous_fields:
+        if field not in doc:
+            update[field] = {"set": None}
+    return update
+
+
+def compute_delta(previous_path, current_path):
+    """
+    Compares two Solr dumps document by document.
+    :return: delta dict with 'added' (full documents), 'updated' (atomic updates) and 'deleted' (document ids) lists.
+    """
+    previous_index = index_dump(previous_path)
+    added = list()
+    updated = list()
+    seen = set()
+    for doc in iter_dump_documents(current_path):
+        doc_id = doc["id"]
+        seen.add(doc_id)
+        if doc_id not in previous_index:
+            added.append(doc)
+        else:
+            previous_fingerprint, previous_fields = previous_index[doc_id]
+            if previous_fingerprint != fingerprint(doc):
+                updated.append(to_atomic_update(doc, previous_fields))
+    deleted = [doc_id for doc_id in previous_index if doc_id not in seen]
+
+    return {"previous": os.path.basename(previous_path), "current": os.path.basename(current_path),
+            "added": added, "updated": updated, "deleted": deleted}
+
+
+def get_delta_path(current_path):
+    base = os.path.splitext(current_path)[0]
+    return base.replace("individuals_metadata_solr_", "individuals_metadata_solr_delta_") + ".json"
+
+
+def write_delta_dump(current_path, previous_path=None):
+    """
+    Writes the delta between the given dump and the previous dump (latest dump in the same folder if not given).
+    :return: path of the delta file or None if there is no previous dump.
+    """
+    if previous_path is None:
+        previous_path = find_previous_dump(current_path)
+    if previous_path is None:
+        log.info("No previous dump found to compute the delta of: " + current_path)
+        return None
+
+    delta = compute_delta(previous_path, current_path)
+    delta_path = get_delta_path(current_path)
+    with open(delta_path, 'w', encoding='utf-8') as f:
+        json.dump(delta, f, ensure_ascii=False, indent=4)
+    log.info("Delta of {} against {}: {} added, {} updated, {} deleted.".format(
+        delta["current"], delta["previous"], len(delta["added"]), len(delta["updated"]), len(delta["deleted"])))
+    return delta_path
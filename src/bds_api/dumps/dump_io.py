@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import logging
+from bds_api.dumps.dump_metrics import get_metrics, SERIALISATION_STAGE
+from bds_api.dumps.indexed_dump import IndexedDumpWriter, IndexedDumpReader, INDEXED_FORMAT
+
+log = logging.getLogger(__name__)
+
+JSON_FORMAT = "json"
+NDJSON_FORMAT = "ndjson"
+DUMP_FORMATS = [JSON_FORMAT, NDJSON_FORMAT, INDEXED_FORMAT]
+
+INDENT = 4
+
+# suffix of the dump files being written, see DumpFileWriter
+TMP_SUFFIX = ".tmp"
+
+
+def get_dump_path(path, dump_format):
+    """
+    Replaces the extension of the given dump path based on the dump format.
+    """
+    if dump_format == JSON_FORMAT or not path.endswith(".json"):
+        return path
+    return path[:-len(".json")] + "." + dump_format
+
+
+def open_writer(path, dump_format=JSON_FORMAT, envelope=None, array_key=None):
+    """
+    Opens a streaming dump writer.
+    :param path: output file path
+    :param dump_format: 'json' (a pretty-printed JSON array), 'ndjson' (one document per line) or 'jsonz' (compressed
+    records with a sidecar index, see indexed_dump.py)
+    :param envelope: optional dict of fields to be written before the documents. Documents are then written to the
+    'array_key' field of the envelope object.
+    :param array_key: field name of the documents array if an envelope is given
+    """
+    if dump_format == JSON_FORMAT:
+        return JsonArrayWriter(path, envelope, array_key)
+    elif dump_format == NDJSON_FORMAT:
+        return NdjsonWriter(path, envelope)
+    elif dump_format == INDEXED_FORMAT:
+        return IndexedDumpWriter(path, envelope)
+    raise ValueError("Unsupported dump format: " + str(dump_format))
+
+
+def indent_json(data, level):
+    text = json.dumps(data, ensure_ascii=False, indent=INDENT)
+    if level == 0:
+        return text
+    return text.replace("\n", "\n" + " " * (INDENT * level))
+
+
+class DumpFileWriter(object):
+    """
+    Base class of the text dump writers. Documents are written to a temporary file that replaces the dump file only
+    when the writer is closed without an error, so a failed run never leaves a truncated dump behind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.file = open(path + TMP_SUFFIX, 'w', encoding='utf-8')
+
+    def write_end(self):
+        """
+        Writes the end of the dump before the file is closed.
+        """
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.write_end()
+        self.file.close()
+        os.replace(self.path + TMP_SUFFIX, self.path)
+        log.info("Writing data to file. Object count is : " + str(self.count))
+
+    def abort(self):
+        """
+        Discards the documents written so far, the dump file is left untouched.
+        """
+        if self.file.closed:
+            return
+        self.file.close()
+        os.remove(self.path + TMP_SUFFIX)
+        log.warning("Dump aborted, discarded {} documents of {}".format(self.count, self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class JsonArrayWriter(DumpFileWriter):
+    """
+    Writes documents to a JSON array one by one. Output is identical to json.dump(data, f, indent=4) of the whole
+    array (or the whole envelope object), without keeping the documents in memory.
+    """
+
+    def __init__(self, path, envelope=None, array_key=None):
+        super().__init__(path)
+        self.level = 1
+        if envelope is not None:
+            self.level = 2
+            self.file.write("{")
+            for key, value in envelope.items():
+                self.file.write("\n" + " " * INDENT + json.dumps(key) + ": " + indent_json(value, 1) + ",")
+            self.file.write("\n" + " " * INDENT + json.dumps(array_key) + ": ")
+        self.file.write("[")
+
+    def write(self, doc):
+        start = time.perf_counter()
+        if self.count:
+            self.file.write(",")
+        self.file.write("\n" + " " * (INDENT * self.level) + indent_json(doc, self.level))
+        self.count += 1
+        get_metrics().add_stage_time(SERIALISATION_STAGE, time.perf_counter() - start)
+
+    def write_end(self):
+        if self.count:
+            self.file.write("\n" + " " * (INDENT * (self.level - 1)))
+        self.file.write("]")
+        if self.level == 2:
+            self.file.write("\n}")
+
+
+class NdjsonWriter(DumpFileWriter):
+    """
+    Writes documents as newline delimited JSON. If an envelope is given it is written as the first line.
+    """
+
+    def __init__(self, path, envelope=None):
+        super().__init__(path)
+        if envelope is not None:
+            self.file.write(json.dumps(envelope, ensure_ascii=False) + "\n")
+
+    def write(self, doc):
+        start = time.perf_counter()
+        self.file.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        self.count += 1
+        get_metrics().add_stage_time(SERIALISATION_STAGE, time.perf_counter() - start)
+
+
+class StreamingDocumentStore(object):
+    """
+    Dict-like document collection that streams the finalised documents to a writer. Only the documents that may still
+    be replaced or updated (shared entities such as parents, markers and references, root nodes and the ontology
+    version document) are kept in memory until flush.
+
+    * write(doc): document is final and written immediately. Replaces a pending document with the same iri.
+    * store[iri] = doc: document is deferred and written on flush, unless a final document with the same iri is written
+    before.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.written = set()
+        self.pending = dict()
+
+    def write(self, doc):
+        iri = doc["iri"]
+        if iri in self.written:
+            log.warning("Document already written, skipping duplicate: " + str(iri))
+            return
+        self.pending.pop(iri, None)
+        self.written.add(iri)
+        self.writer.write(doc)
+        get_metrics().count_documents()
+
+    def __setitem__(self, iri, doc):
+        if iri not in self.written:
+            self.pending[iri] = doc
+
+    def __getitem__(self, iri):
+        return self.pending[iri]
+
+    def __contains__(self, iri):
+        return iri in self.written or iri in self.pending
+
+    def __len__(self):
+        return len(self.written) + len(self.pending)
+
+    def flush(self):
+        """
+        Writes all deferred documents in insertion order.
+        """
+        for doc in self.pending.values():
+            self.written.add(doc["iri"])
+            self.writer.write(doc)
+        get_metrics().count_documents(len(self.pending))
+        self.pending.clear()
+
+
+def batches(documents, size):
+    """
+    Groups the given documents iterable into lists of the given size.
+    """
+    batch = list()
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= size:
+            yield batch
+            batch = list()
+    if batch:
+        yield batch
+
+
+def iter_dump_documents(path, chunk_size=1 << 16):
+    """
+    Streams the documents of a JSON array, NDJSON or indexed dump file without loading the whole file.
+    """
+    if path.endswith("." + INDEXED_FORMAT):
+        with IndexedDumpReader(path) as reader:
+            yield from reader
+        return
+
+    with open(path, encoding='utf-8') as f:
+        if path.endswith("." + NDJSON_FORMAT):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        decoder = json.JSONDecoder()
+        buffer = ""
+        position = 0
+        started = False
+        eof = False
+        while True:
+            # skip whitespace and array delimiters
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] in "[,]"):
+                if buffer[position] == "[":
+                    started = True
+                position += 1
+            if position < len(buffer):
+                if not started:
+                    raise ValueError("Dump file is not a JSON array: " + path)
+                try:
+                    doc, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    yield doc
+                    position = end
+                    continue
+            elif eof:
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
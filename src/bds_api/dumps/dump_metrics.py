@@ -0,0 +1,219 @@
+"""
+Instrumentation of the dump runs: accumulated stage timers, query latency histograms, document throughput, peak RSS
+and optional tracemalloc snapshots. Summary of a run is logged and can be written as JSON to compare runs across
+releases.
+"""
+
+import sys
+import json
+import time
+import bisect
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+log = logging.getLogger(__name__)
+
+# upper bounds of the query latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+FETCH_STAGE = "fetch"
+TRANSFORM_STAGE = "transform"
+SERIALISATION_STAGE = "serialisation"
+SOLR_UPLOAD_STAGE = "solr_upload"
+
+TRACEMALLOC_TOP_STATS = 10
+
+
+class StageTimer(object):
+    """
+    Accumulated time and processed item count of a stage. Stages of concurrent workers accumulate the time of all
+    workers.
+    """
+
+    __slots__ = ("seconds", "items", "calls")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.items = 0
+        self.calls = 0
+
+    def to_dict(self):
+        return {"seconds": round(self.seconds, 6), "items": self.items, "calls": self.calls,
+                "items_per_sec": round(self.items / self.seconds, 2) if self.seconds else None}
+
+
+class LatencyHistogram(object):
+
+    def __init__(self):
+        self.latencies = list()
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, seconds):
+        self.latencies.append(seconds)
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+
+    @staticmethod
+    def get_percentile(percentile, ordered):
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index] * 1000
+
+    def to_dict(self):
+        ordered = sorted(self.latencies)
+        buckets = dict()
+        for index, count in enumerate(self.counts):
+            label = "<=" + str(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) \
+                else ">" + str(LATENCY_BUCKETS_MS[-1])
+            buckets[label] = count
+        return {"count": len(ordered),
+                "total_ms": round(sum(ordered) * 1000, 3),
+                "mean_ms": round(sum(ordered) * 1000 / len(ordered), 3),
+                "p50_ms": round(self.get_percentile(50, ordered), 3),
+                "p95_ms": round(self.get_percentile(95, ordered), 3),
+                "p99_ms": round(self.get_percentile(99, ordered), 3),
+                "max_ms": round(ordered[-1] * 1000, 3),
+                "buckets_ms": buckets}
+
+
+def get_peak_rss_mb():
+    """
+    Peak resident set size of this process and of its terminated child processes (such as the transform workers).
+    """
+    if resource is None:
+        return None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return {"self": round(self_rss, 2), "children": round(children_rss, 2)}
+
+
+class DumpMetrics(object):
+
+    def __init__(self, trace_memory=False):
+        """
+        :param trace_memory: if True, tracemalloc snapshots are taken at the start and end of each stage block.
+        Tracing slows down the run significantly.
+        """
+        self.trace_memory = trace_memory
+        self.start_time = time.perf_counter()
+        self.lock = threading.Lock()
+        self.stages = dict()
+        self.stage_blocks = dict()
+        self.queries = dict()
+        self.documents = 0
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def add_stage_time(self, stage, seconds, items=1):
+        with self.lock:
+            timer = self.stages.get(stage)
+            if timer is None:
+                timer = self.stages[stage] = StageTimer()
+            timer.seconds += seconds
+            timer.items += items
+            timer.calls += 1
+
+    @contextmanager
+    def time_stage(self, stage, items=1):
+        """
+        Adds the time of the block to the accumulated stage timer.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(stage, time.perf_counter() - start, items)
+
+    @contextmanager
+    def stage_block(self, name):
+        """
+        Times a top level block of the run, such as the whole Solr dump, and logs its memory usage. Without
+        tracemalloc.reset_peak (Python < 3.9) the traced peak is the peak of the run so far.
+        """
+        log.info("Starting: " + name)
+        start = time.perf_counter()
+        snapshot = tracemalloc.take_snapshot() if self.trace_memory else None
+        if self.trace_memory and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            block = {"seconds": round(time.perf_counter() - start, 6), "peak_rss_mb": get_peak_rss_mb()}
+            if snapshot is not None:
+                block["tracemalloc"] = self.get_memory_stats(snapshot)
+            self.stage_blocks[name] = block
+            log.info("Finished: {} in {:.2f}s".format(name, block["seconds"]))
+
+    @staticmethod
+    def get_memory_stats(start_snapshot):
+        current, peak = tracemalloc.get_traced_memory()
+        top_stats = tracemalloc.take_snapshot().compare_to(start_snapshot, "lineno")[:TRACEMALLOC_TOP_STATS]
+        return {"current_mb": round(current / (1024 * 1024), 2),
+                "peak_mb": round(peak / (1024 * 1024), 2),
+                "top_allocations": [str(stat) for stat in top_stats]}
+
+    def record_query(self, query_name, seconds):
+        with self.lock:
+            histogram = self.queries.get(query_name)
+            if histogram is None:
+                histogram = self.queries[query_name] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def count_documents(self, count=1):
+        with self.lock:
+            self.documents += count
+
+    def get_summary(self):
+        elapsed = time.perf_counter() - self.start_time
+        with self.lock:
+            return {"elapsed_seconds": round(elapsed, 6),
+                    "documents": self.documents,
+                    "docs_per_sec": round(self.documents / elapsed, 2) if elapsed else None,
+                    "peak_rss_mb": get_peak_rss_mb(),
+                    "stages": {stage: timer.to_dict() for stage, timer in self.stages.items()},
+                    "blocks": dict(self.stage_blocks),
+                    "queries": {query: histogram.to_dict() for query, histogram in self.queries.items()}}
+
+    def log_summary(self, output_path=None):
+        """
+        Logs the run summary and writes it as JSON to the given path if any.
+        :return: summary dictionary
+        """
+        summary = self.get_summary()
+        for stage, timer in summary["stages"].items():
+            log.info("Stage {}: {}s, {} items, {} items/sec".format(stage, timer["seconds"], timer["items"],
+                                                                   timer["items_per_sec"]))
+        for query, histogram in summary["queries"].items():
+            log.info("Query {}: {} calls, p50 {}ms, p95 {}ms, max {}ms".format(
+                query, histogram["count"], histogram["p50_ms"], histogram["p95_ms"], histogram["max_ms"]))
+        log.info("Documents: {} in {}s, {} docs/sec, peak RSS {} MB".format(
+            summary["documents"], summary["elapsed_seconds"], summary["docs_per_sec"], summary["peak_rss_mb"]))
+        log.info("Dump metrics: " + json.dumps(summary))
+        if output_path:
+            with open(output_path, "w") as f:
+                json.dump(summary, f, indent=4)
+        return summary
+
+
+# metrics of the current run, see start_run
+metrics = DumpMetrics()
+
+
+def start_run(trace_memory=False):
+    """
+    Resets the metrics for a new run.
+    """
+    global metrics
+    metrics = DumpMetrics(trace_memory)
+    return metrics
+
+
+def get_metrics():
+    return metrics
@@ -0,0 +1,302 @@
+"""
+Dump pipeline that runs fetching, transforming and indexing concurrently. Stages run in their own threads and are
+connected by bounded queues, so a slow stage blocks (back-pressures) the stages feeding it instead of buffering the
+whole dump in memory:
+
+    fetch (Neo4j) -> transform (Solr documents) -> sinks (file, ndjson, jsonz, solr, stdout)
+
+Examples:
+
+    python dump_pipeline.py --sink file --sink solr --workers 4
+    python dump_pipeline.py --nested --sink file
+    python dump_pipeline.py --from-dump ../../../dumps/individuals_metadata_solr_20220302.json --sink solr
+"""
+
+import sys
+import json
+import queue
+import logging
+import threading
+from bds_api.dumps.bds_queries import IndividualDetailsBatchQuery, ListAllAllenIndividuals, ListAllTaxonomies, \
+    GetOntologyMetadata
+from bds_api.dumps.bds_dumps import populate_solr_documents, execute_queries, configure_query_cache, \
+    configure_query_replay, create_argument_parser, DUMP_PATH, SOLR_JSON_PATH
+from bds_api.dumps.dump_io import open_writer, get_dump_path, iter_dump_documents, StreamingDocumentStore, \
+    JSON_FORMAT, NDJSON_FORMAT, INDEXED_FORMAT
+from bds_api.dumps.neo4j_driver import close_drivers
+from bds_api.dumps.solr_indexer import SolrBulkIndexer
+from bds_api.dumps.dump_metrics import get_metrics, start_run
+from bds_api.endpoints.search_config import indexer_config
+
+log = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 1000
+
+# polling interval of the blocked queue operations to notice a failed stage, in seconds
+POLL_INTERVAL = 0.1
+
+SINKS = ["file", "ndjson", "jsonz", "solr", "stdout"]
+
+# end of stream marker
+END = object()
+
+
+class PipelineAborted(Exception):
+    """
+    Raised in a stage when another stage of the pipeline failed.
+    """
+
+
+class StageQueue(object):
+    """
+    Bounded queue between two stages. Blocked puts and gets are interrupted when the pipeline is aborted.
+    """
+
+    def __init__(self, abort_event, maxsize=DEFAULT_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize)
+        self.abort_event = abort_event
+
+    def put(self, item):
+        if self.abort_event.is_set():
+            raise PipelineAborted()
+        while True:
+            try:
+                self.queue.put(item, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                if self.abort_event.is_set():
+                    raise PipelineAborted()
+
+    def __iter__(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if self.abort_event.is_set():
+                    raise PipelineAborted()
+                continue
+            if item is END:
+                return
+            yield item
+
+
+class QueueWriter(object):
+    """
+    Dump writer that broadcasts the documents to the queues of all sinks.
+    """
+
+    def __init__(self, queues):
+        self.queues = queues
+
+    def write(self, doc):
+        for stage_queue in self.queues:
+            stage_queue.put(doc)
+
+    def close(self):
+        self.write(END)
+
+
+class FileSink(object):
+
+    def __init__(self, path, dump_format=JSON_FORMAT):
+        self.path = get_dump_path(path, dump_format)
+        self.dump_format = dump_format
+
+    def consume(self, documents, envelope=None):
+        with open_writer(self.path, self.dump_format, envelope, "entities" if envelope else None) as writer:
+            for doc in documents:
+                writer.write(doc)
+
+
+class SolrSink(object):
+
+    def __init__(self, config=indexer_config):
+        self.config = config
+
+    def consume(self, documents, envelope=None):
+        with SolrBulkIndexer.from_config(self.config) as indexer:
+            indexer.index_documents(documents)
+
+
+class StdoutSink(object):
+
+    def consume(self, documents, envelope=None):
+        for doc in documents:
+            sys.stdout.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+
+def create_sink(name, nested=False, dump_path=None):
+    """
+    :param name: one of the SINKS
+    :param nested: if True, sink receives the nested individuals metadata instead of Solr documents
+    :param dump_path: dump file path of the file sinks. Defaults to the dump paths of bds_dumps.
+    """
+    if dump_path is None:
+        dump_path = DUMP_PATH if nested else SOLR_JSON_PATH
+    if name == "file":
+        return FileSink(dump_path, JSON_FORMAT)
+    elif name == "ndjson":
+        return FileSink(dump_path, NDJSON_FORMAT)
+    elif name == "jsonz":
+        return FileSink(dump_path, INDEXED_FORMAT)
+    elif name == "solr":
+        return SolrSink()
+    elif name == "stdout":
+        return StdoutSink()
+    raise ValueError("Unsupported sink: " + str(name))
+
+
+class DumpPipeline(object):
+    """
+    Runs the fetch, transform and sink stages concurrently.
+    """
+
+    def __init__(self, sinks, workers=1, queue_size=DEFAULT_QUEUE_SIZE, processes=1):
+        """
+        :param sinks: list of sinks. Each sink consumes all documents.
+        :param workers: number of concurrent Neo4j queries of the fetch stage
+        :param processes: number of processes of the transform stage
+        :param queue_size: max number of items waiting between two stages
+        """
+        self.sinks = sinks
+        self.workers = workers
+        self.queue_size = queue_size
+        self.processes = processes
+        self.abort_event = threading.Event()
+        self.errors = list()
+
+    def new_queue(self):
+        return StageQueue(self.abort_event, self.queue_size)
+
+    def run_solr_dump(self):
+        """
+        Fetches the individuals from Neo4j and sends their Solr documents to the sinks.
+        """
+        all_individuals, all_datasets, ont_metadata = execute_queries(
+            [ListAllAllenIndividuals(), ListAllTaxonomies(), GetOntologyMetadata()], self.workers)
+
+        fetch_queue = self.new_queue()
+        sink_queues = [self.new_queue() for _ in self.sinks]
+        self.run_stages([(self.fetch, (all_individuals, fetch_queue)),
+                         (self.transform, (fetch_queue, sink_queues, all_datasets, ont_metadata))] +
+                        self.get_sink_stages(sink_queues))
+
+    def run_nested_dump(self):
+        """
+        Fetches the individuals from Neo4j and sends their nested metadata to the sinks.
+        """
+        all_individuals, ont_metadata = execute_queries([ListAllAllenIndividuals(), GetOntologyMetadata()],
+                                                        self.workers)
+
+        fetch_queue = self.new_queue()
+        sink_queues = [self.new_queue() for _ in self.sinks]
+        self.run_stages([(self.fetch, (all_individuals, fetch_queue)),
+                         (self.nest, (fetch_queue, sink_queues))] +
+                        self.get_sink_stages(sink_queues, {"ontology": ont_metadata}))
+
+    def run_from_dump(self, dump_path):
+        """
+        Sends the documents of an existing JSON, NDJSON or indexed dump to the sinks.
+        """
+        sink_queues = [self.new_queue() for _ in self.sinks]
+        self.run_stages([(self.read_dump, (dump_path, sink_queues))] + self.get_sink_stages(sink_queues))
+
+    def get_sink_stages(self, sink_queues, envelope=None):
+        return [(sink.consume, (sink_queue, envelope)) for sink, sink_queue in zip(self.sinks, sink_queues)]
+
+    def fetch(self, all_individuals, fetch_queue):
+        for item in IndividualDetailsBatchQuery().execute_in_batches(all_individuals, self.workers):
+            fetch_queue.put(item)
+        fetch_queue.put(END)
+
+    def transform(self, fetch_queue, sink_queues, all_datasets, ont_metadata):
+        writer = QueueWriter(sink_queues)
+        all_data = StreamingDocumentStore(writer)
+        populate_solr_documents(all_data, fetch_queue, all_datasets, ont_metadata, self.processes)
+        all_data.flush()
+        writer.close()
+
+    @staticmethod
+    def nest(fetch_queue, sink_queues):
+        writer = QueueWriter(sink_queues)
+        for individual, result in fetch_queue:
+            result["node"] = individual
+            writer.write(result)
+            get_metrics().count_documents()
+        writer.close()
+
+    @staticmethod
+    def read_dump(dump_path, sink_queues):
+        writer = QueueWriter(sink_queues)
+        for doc in iter_dump_documents(dump_path):
+            writer.write(doc)
+            get_metrics().count_documents()
+        writer.close()
+
+    def run_stages(self, stages):
+        """
+        Runs each (function, arguments) stage in its own thread and waits for all of them. If a stage fails, the other
+        stages are aborted and the first error is raised.
+        """
+        threads = [threading.Thread(target=self.run_stage, args=(function, arguments),
+                                    name=getattr(function, "__name__", "stage"))
+                   for function, arguments in stages]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def run_stage(self, function, arguments):
+        try:
+            function(*arguments)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            log.exception("Dump pipeline stage failed: " + threading.current_thread().name)
+            self.errors.append(e)
+            self.abort_event.set()
+
+
+def main():
+    parser = create_argument_parser("Runs the Brain Data Standards dump pipeline.")
+    parser.add_argument("-s", "--sink", dest="sinks", action="append", choices=SINKS,
+                        help="Sink of the documents, can be repeated. Defaults to 'file'.")
+    parser.add_argument("-n", "--nested", action="store_true",
+                        help="Skip the Solr transform stage and dump the nested individuals metadata.")
+    parser.add_argument("--from-dump", help="Skip the fetch and transform stages and send the documents of an "
+                                            "existing dump file to the sinks.")
+    parser.add_argument("-o", "--output", help="Dump file path of the file sinks.")
+    parser.add_argument("-q", "--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Max number of items waiting between two stages.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    metrics = start_run(args.trace_memory)
+    sinks = [create_sink(name, args.nested, args.output) for name in (args.sinks or ["file"])]
+    pipeline = DumpPipeline(sinks, args.workers, args.queue_size, args.processes)
+    recorder = configure_query_replay(args.record, args.replay, args.replay_latency)
+    if not args.replay and not args.from_dump:
+        configure_query_cache(args.cache, args.no_cache, args.clear_cache)
+    try:
+        if args.from_dump:
+            with metrics.stage_block("from_dump"):
+                pipeline.run_from_dump(args.from_dump)
+        elif args.nested:
+            with metrics.stage_block("nested_dump"):
+                pipeline.run_nested_dump()
+        else:
+            with metrics.stage_block("solr_dump"):
+                pipeline.run_solr_dump()
+    finally:
+        close_drivers()
+        if recorder is not None:
+            recorder.save()
+        metrics.log_summary(args.metrics_output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Declarative mappings of Neo4j node properties to Solr document fields. Each mapping table is compiled once into an
+extractor function that copies and transforms the mapped properties of a node into a Solr document.
+"""
+
+import json
+
+tags_blacklist = ['Entity', 'Class', 'Individual']
+
+
+def first_non_null(values):
+    return next(filter(None, values), None)
+
+
+def parse_axiom_value(axiom):
+    """
+    Reads the value of an axiom annotated property such as '{"annotations":{},"value":"L4 IT VISp Rspo1"}'. Values
+    without annotations are returned as is.
+    """
+    if isinstance(axiom, dict):
+        return axiom.get("value")
+    try:
+        return json.loads(axiom)["value"]
+    except (ValueError, TypeError, KeyError):
+        return str(axiom)
+
+
+def axiom_values(axioms):
+    return [parse_axiom_value(axiom) for axiom in axioms]
+
+
+def first_axiom_value(axioms):
+    return parse_axiom_value(axioms[0])
+
+
+def filter_tags(tags):
+    return [tag for tag in tags if tag not in tags_blacklist]
+
+
+class FieldMapping(object):
+    """
+    Maps a node property to a Solr document field.
+    """
+
+    __slots__ = ("source", "target", "transform", "required")
+
+    def __init__(self, source, target=None, transform=None, required=False):
+        """
+        :param source: node property name
+        :param target: document field name. Defaults to the source name.
+        :param transform: function applied to the property value. Value is copied as is if None.
+        :param required: if True, extraction fails with KeyError when the node doesn't have the property. Otherwise,
+        missing properties are skipped.
+        """
+        self.source = source
+        self.target = target or source
+        self.transform = transform
+        self.required = required
+
+
+def compile_mappings(mappings):
+    """
+    Compiles the given mapping table into an extractor function.
+    :param mappings: list of FieldMapping. Document fields are added in the order of the mappings.
+    :return: function (node, solr_doc=None) -> solr_doc that adds the mapped fields of the node to the given (or a new)
+    document.
+    """
+    specs = tuple((mapping.source, mapping.target, mapping.transform, mapping.required) for mapping in mappings)
+
+    def extract(node, solr_doc=None):
+        if solr_doc is None:
+            solr_doc = dict()
+        for source, target, transform, required in specs:
+            if required:
+                value = node[source]
+            elif source in node:
+                value = node[source]
+            else:
+                continue
+            solr_doc[target] = value if transform is None else transform(value)
+        return solr_doc
+
+    return extract
+
+
+ID_FIELDS = [
+    FieldMapping("iri", "id", required=True),
+    FieldMapping("iri", required=True),
+    FieldMapping("curie", required=True)
+]
+
+CLASS_FIELDS = ID_FIELDS + [
+    FieldMapping("label", required=True),
+    FieldMapping("short_form"),
+    FieldMapping("comment"),
+    FieldMapping("tags", transform=filter_tags),
+    FieldMapping("prefLabel"),
+    FieldMapping("label_rdfs"),
+    FieldMapping("has_exact_synonym", transform=axiom_values),
+    FieldMapping("hasOBONamespace"),
+    FieldMapping("definition", transform=first_axiom_value),
+    FieldMapping("versionInfo"),
+    FieldMapping("symbol", transform=first_non_null)
+]
+
+REFERENCE_FIELDS = ID_FIELDS + [
+    FieldMapping("label", required=True),
+    FieldMapping("creator"),
+    FieldMapping("exactMatch", transform=first_non_null),
+    FieldMapping("description"),
+    FieldMapping("abstract", transform=first_non_null),
+    FieldMapping("label_rdfs"),
+    FieldMapping("bibliographicCitation", transform=first_non_null),
+    FieldMapping("identifier"),
+    FieldMapping("date", transform=first_non_null)
+]
+
+TAXONOMY_ID_FIELDS = ID_FIELDS + [
+    FieldMapping("label", "accession_id", required=True),
+    FieldMapping("label", required=True)
+]
+
+TAXONOMY_FIELDS = [
+    FieldMapping("cell_types_count", transform=first_non_null),
+    FieldMapping("cell_subclasses_count", transform=first_non_null),
+    FieldMapping("cell_classes_count", transform=first_non_null),
+    FieldMapping("prefLabel", "species", transform=first_non_null),
+    FieldMapping("has_brain_region", "anatomic_region", transform=first_non_null),
+    FieldMapping("has_sex", "sex", transform=first_non_null),
+    FieldMapping("has_age", "age", transform=first_non_null),
+    FieldMapping("database_cross_reference", "primary_citation", transform=first_non_null),
+    FieldMapping("title", "header", transform=first_non_null),
+    FieldMapping("comment", "mainDescription", transform=first_non_null),
+    FieldMapping("provenance", "attribution", transform=first_non_null),
+    FieldMapping("description", "subDescription", transform=first_non_null),
+    FieldMapping("subject", "anatomy", transform=first_non_null),
+    FieldMapping("relation", "anatomy_image", transform=first_non_null)
+]
+
+DATASET_ID_FIELDS = ID_FIELDS + [
+    FieldMapping("label", required=True),
+    FieldMapping("comment", required=True)
+]
+
+DATASET_FIELDS = [
+    FieldMapping("nuclei_count", transform=first_non_null),
+    FieldMapping("cell_count", transform=first_non_null),
+    FieldMapping("archivedAt", "download_link", transform=first_non_null),
+    FieldMapping("discussionUrl", "explore_link", transform=first_non_null),
+    FieldMapping("symbol", transform=first_non_null),
+    FieldMapping("prefLabel", "dataset", transform=first_non_null),
+    FieldMapping("assesses", "species", transform=first_non_null),
+    FieldMapping("position", "region", transform=first_non_null),
+    FieldMapping("headline", "dataset_number", transform=first_non_null)
+]
+
+extract_class_fields = compile_mappings(CLASS_FIELDS)
+extract_reference_fields = compile_mappings(REFERENCE_FIELDS)
+extract_taxonomy_id_fields = compile_mappings(TAXONOMY_ID_FIELDS)
+extract_taxonomy_fields = compile_mappings(TAXONOMY_FIELDS)
+extract_dataset_id_fields = compile_mappings(DATASET_ID_FIELDS)
+extract_dataset_fields = compile_mappings(DATASET_FIELDS)
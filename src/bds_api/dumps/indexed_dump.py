@@ -0,0 +1,234 @@
+"""
+Compressed, indexed dump format. Each document is a separately zlib compressed JSON record, so a single document can
+be decoded without reading the rest of the dump. A sidecar index file (dump path + '.idx') holds the record offsets and
+maps the 'id', 'curie' and 'accession_id' values of the documents to their records. The reader memory maps the dump
+and decodes only the requested documents:
+
+    python indexed_dump.py convert ../../../dumps/individuals_metadata_solr_20220302.json
+    python indexed_dump.py get ../../../dumps/individuals_metadata_solr_20220302.jsonz CS202002013_123
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import logging
+import argparse
+from bds_api.dumps.dump_metrics import get_metrics, SERIALISATION_STAGE
+
+log = logging.getLogger(__name__)
+
+INDEXED_FORMAT = "jsonz"
+
+INDEX_SUFFIX = ".idx"
+
+# suffix of the files being written, they replace the dump and its index when the writer is closed without an error
+TMP_SUFFIX = ".tmp"
+
+FORMAT_VERSION = 1
+
+MAGIC = b"BDSZ\x01\n"
+
+# document fields that can be used to look up documents, in lookup order
+KEY_FIELDS = ["id", "curie", "accession_id"]
+
+COMPRESSION_LEVEL = 6
+
+
+def get_index_path(path):
+    return path + INDEX_SUFFIX
+
+
+class IndexedDumpWriter(object):
+    """
+    Writes documents as compressed records and writes the sidecar index on close. An existing dump is only replaced if
+    the writer is closed without an error.
+    """
+
+    def __init__(self, path, envelope=None):
+        """
+        :param path: output file path
+        :param envelope: optional dict of fields stored in the index, such as the ontology metadata of the nested dumps
+        """
+        self.path = path
+        self.envelope = envelope
+        self.count = 0
+        self.offsets = list()
+        self.keys = {field: dict() for field in KEY_FIELDS}
+        self.file = open(path + TMP_SUFFIX, 'wb')
+        self.file.write(MAGIC)
+        self.position = len(MAGIC)
+
+    def write(self, doc):
+        start = time.perf_counter()
+        record = zlib.compress(json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+                               COMPRESSION_LEVEL)
+        self.file.write(record)
+        for field, keys in self.keys.items():
+            value = doc.get(field)
+            if isinstance(value, str) and value not in keys:
+                keys[value] = self.count
+        self.offsets.append((self.position, len(record)))
+        self.position += len(record)
+        self.count += 1
+        get_metrics().add_stage_time(SERIALISATION_STAGE, time.perf_counter() - start)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.close()
+        index = {"format_version": FORMAT_VERSION, "count": self.count, "envelope": self.envelope,
+                 "offsets": self.offsets, "keys": self.keys}
+        index_path = get_index_path(self.path)
+        with open(index_path + TMP_SUFFIX, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(self.path + TMP_SUFFIX, self.path)
+        os.replace(index_path + TMP_SUFFIX, index_path)
+        log.info("Writing data to file. Object count is : " + str(self.count))
+
+    def abort(self):
+        """
+        Discards the records written so far, an existing dump and its index are left untouched.
+        """
+        if self.file.closed:
+            return
+        self.file.close()
+        os.remove(self.path + TMP_SUFFIX)
+        log.warning("Dump aborted, discarded {} documents of {}".format(self.count, self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class IndexedDumpReader(object):
+    """
+    Random access reader of the indexed dumps. Dump file is memory mapped and only the requested documents are
+    decoded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(get_index_path(path), encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get("format_version") != FORMAT_VERSION:
+            raise ValueError("Unsupported indexed dump format: " + str(index.get("format_version")))
+        self.envelope = index["envelope"]
+        self.offsets = index["offsets"]
+        self.keys = index["keys"]
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mmap[:len(MAGIC)] != MAGIC:
+            self.mmap.close()
+            raise ValueError("File is not an indexed dump: " + path)
+
+    def get_record(self, record):
+        """
+        :param record: record number, in the order the documents were written
+        :return: decoded document
+        """
+        offset, length = self.offsets[record]
+        return json.loads(zlib.decompress(self.mmap[offset:offset + length]).decode("utf-8"))
+
+    def find_record(self, key, field=None):
+        """
+        :return: record number of the document with the given key or None
+        """
+        for key_field in ([field] if field else KEY_FIELDS):
+            record = self.keys[key_field].get(key)
+            if record is not None:
+                return record
+        return None
+
+    def get(self, key, field=None):
+        """
+        Looks up a document.
+        :param key: 'id', 'curie' or 'accession_id' value of the document
+        :param field: one of the KEY_FIELDS. If None, fields are tried in the KEY_FIELDS order.
+        :return: document or None
+        """
+        record = self.find_record(key, field)
+        return None if record is None else self.get_record(record)
+
+    def get_many(self, keys, field=None):
+        """
+        :return: dictionary of the found keys to their documents
+        """
+        documents = dict()
+        for key in keys:
+            doc = self.get(key, field)
+            if doc is not None:
+                documents[key] = doc
+        return documents
+
+    def __contains__(self, key):
+        return self.find_record(key) is not None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        for record in range(len(self.offsets)):
+            yield self.get_record(record)
+
+    def close(self):
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def convert_dump(source_path, target_path=None):
+    """
+    Converts a JSON or NDJSON dump to the indexed format.
+    :return: path of the indexed dump
+    """
+    # dump_io imports this module to open the indexed dumps
+    from bds_api.dumps.dump_io import iter_dump_documents
+
+    if target_path is None:
+        target_path = os.path.splitext(source_path)[0] + "." + INDEXED_FORMAT
+    with IndexedDumpWriter(target_path) as writer:
+        for doc in iter_dump_documents(source_path):
+            writer.write(doc)
+    return target_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts dumps to the indexed format and looks up their documents.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="Convert a JSON or NDJSON dump to the indexed format.")
+    convert_parser.add_argument("source", help="JSON or NDJSON dump file path.")
+    convert_parser.add_argument("target", nargs="?", help="Indexed dump file path. Defaults to the source path with "
+                                                          "the ." + INDEXED_FORMAT + " extension.")
+    get_parser = subparsers.add_parser("get", help="Print the documents with the given keys.")
+    get_parser.add_argument("dump", help="Indexed dump file path.")
+    get_parser.add_argument("keys", nargs="+", help="id, curie or accession_id of the documents.")
+    get_parser.add_argument("--field", choices=KEY_FIELDS, help="Look up the keys only in the given field.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.command == "convert":
+        log.info("Indexed dump written to " + convert_dump(args.source, args.target))
+    else:
+        with IndexedDumpReader(args.dump) as reader:
+            for key in args.keys:
+                doc = reader.get(key, args.field)
+                if doc is None:
+                    log.warning("Document not found: " + key)
+                else:
+                    sys.stdout.write(json.dumps(doc, ensure_ascii=False, indent=4) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,8 @@ NEO4J_CONF_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../
 def get_config():
     conf = configparser.ConfigParser()
     conf.read(NEO4J_CONF_PATH)
-    return conf['NEO4j']
+    return conf
 
 
-neo4j_config = get_config()
+neo4j_config = get_config()['NEO4j']
+query_cache_config = get_config()['QueryCache']
@@ -0,0 +1,55 @@
+import atexit
+import logging
+import threading
+from neo4j import GraphDatabase
+from bds_api.dumps.neo4j_config import neo4j_config
+
+log = logging.getLogger(__name__)
+
+_drivers = dict()
+_drivers_lock = threading.Lock()
+
+
+def get_driver(config=neo4j_config):
+    """
+    Returns the process-wide pooled Neo4j driver of the given configuration. Driver is created on first use and shared
+    by all queries until close_drivers is called.
+    """
+    key = (config["bolt_url"], config["user"])
+    with _drivers_lock:
+        driver = _drivers.get(key)
+        if driver is None:
+            driver = GraphDatabase.driver(config["bolt_url"], auth=(config["user"], config["password"]),
+                                          **get_pool_settings(config))
+            _drivers[key] = driver
+    return driver
+
+
+def get_pool_settings(config):
+    """
+    Reads the optional connection pool settings from the configuration.
+    """
+    settings = dict()
+    if "max_connection_pool_size" in config:
+        settings["max_connection_pool_size"] = config.getint("max_connection_pool_size")
+    if "max_connection_lifetime" in config:
+        settings["max_connection_lifetime"] = config.getfloat("max_connection_lifetime")
+    if "connection_acquisition_timeout" in config:
+        settings["connection_acquisition_timeout"] = config.getfloat("connection_acquisition_timeout")
+    return settings
+
+
+def close_drivers():
+    """
+    Shutdown hook that closes all pooled drivers. Safe to call multiple times.
+    """
+    with _drivers_lock:
+        for driver in _drivers.values():
+            try:
+                driver.close()
+            except Exception:
+                log.exception("Failed to close the Neo4j driver.")
+        _drivers.clear()
+
+
+atexit.register(close_drivers)
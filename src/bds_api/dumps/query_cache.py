@@ -0,0 +1,117 @@
+import os
+import gzip
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+
+log = logging.getLogger(__name__)
+
+CACHE_FILE_SUFFIX = ".json.gz"
+
+
+class QueryCache(object):
+    """
+    Persistent, size bounded cache of parsed query results. Cache keys combine the query class, the query parameters
+    and the ontology version, so a new ontology release never hits stale results. When the cache exceeds its size
+    limit, least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir, max_size_mb=512, version_provider=None):
+        """
+        :param cache_dir: cache folder
+        :param max_size_mb: max total size of the cache files in megabytes
+        :param version_provider: function that returns the version of the loaded ontology. Called once on first use.
+        """
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.version_provider = version_provider
+        self.version = None
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.total_size = sum(os.path.getsize(path) for path in self.list_entries())
+
+    @classmethod
+    def from_config(cls, config, version_provider=None):
+        return cls(config.get("cache_dir"), config.getfloat("max_size_mb", fallback=512),
+                   version_provider=version_provider)
+
+    def get_version(self):
+        with self.lock:
+            if self.version is None and self.version_provider is not None:
+                self.version = self.version_provider()
+                log.info("Query cache ontology version: " + str(self.version))
+        return self.version
+
+    def get_key(self, query, parameters):
+        key_data = [type(query).__name__, parameters, self.get_version()]
+        serialized = json.dumps(key_data, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_FILE_SUFFIX)
+
+    def list_entries(self):
+        return [os.path.join(self.cache_dir, file_name) for file_name in os.listdir(self.cache_dir)
+                if file_name.endswith(CACHE_FILE_SUFFIX)]
+
+    def get(self, key):
+        """
+        :return: cached result or None if the key is not cached
+        """
+        path = self.get_path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            log.warning("Ignoring corrupt query cache entry: " + path)
+            return None
+        try:
+            # mark as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, result):
+        try:
+            serialized = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        except TypeError:
+            log.warning("Query result is not JSON serializable, skipping cache.")
+            return
+        path = self.get_path(key)
+        # write to a temp file first so that concurrent readers never see a partial entry
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as f:
+            f.write(gzip.compress(serialized))
+        size = os.path.getsize(temp_path)
+        with self.lock:
+            if os.path.exists(path):
+                self.total_size -= os.path.getsize(path)
+            os.replace(temp_path, path)
+            self.total_size += size
+            if self.total_size > self.max_size:
+                self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits to 90% of its max size.
+        """
+        entries = sorted(self.list_entries(), key=os.path.getmtime)
+        target_size = self.max_size * 0.9
+        for path in entries:
+            if self.total_size <= target_size:
+                break
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.total_size -= size
+
+    def clear(self):
+        with self.lock:
+            for path in self.list_entries():
+                os.remove(path)
+            self.total_size = 0
+        log.info("Query cache cleared: " + self.cache_dir)
@@ -0,0 +1,156 @@
+"""
+Runs EXPLAIN and PROFILE on the dump queries against a (test) Neo4j database and reports the estimated rows, db hits,
+produced rows and execution time of each query. Reports can be compared against a baseline report to catch query plan
+regressions:
+
+    python query_plan_benchmark.py --output plan_report.json
+    python query_plan_benchmark.py --baseline plan_report.json --threshold 0.2
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+import configparser
+from bds_api.dumps.neo4j_config import neo4j_config
+from bds_api.dumps.neo4j_driver import get_driver, close_drivers
+from bds_api.dumps.bds_queries import IndividualDetailsQuery, IndividualDetailsBatchQuery, ListAllAllenIndividuals, \
+    ListAllTaxonomies, GetOntologyMetadata
+
+log = logging.getLogger(__name__)
+
+DEFAULT_REGRESSION_THRESHOLD = 0.1
+
+SAMPLE_QUERIES = [
+    ("IndividualDetailsQuery", IndividualDetailsQuery, {"accession": "0011628"}),
+    ("IndividualDetailsBatchQuery", IndividualDetailsBatchQuery,
+     {"accessions": ["0011628", "0011528", "0011588", "0011100", "0015100"]}),
+    ("ListAllAllenIndividuals", ListAllAllenIndividuals, {}),
+    ("ListAllTaxonomies", ListAllTaxonomies, {}),
+    ("GetOntologyMetadata", GetOntologyMetadata, {})
+]
+
+
+def get_plan_stats(plan):
+    """
+    Sums the db hits and rows of all operators of the given PROFILE plan and collects the operator types.
+    :param plan: plan dictionary of the neo4j result summary
+    :return: plan statistics dictionary
+    """
+    stats = {"db_hits": 0, "rows": 0, "operators": []}
+    pending = [plan]
+    while pending:
+        operator = pending.pop()
+        args = operator.get("args", {})
+        stats["db_hits"] += operator.get("dbHits", args.get("DbHits", 0))
+        stats["rows"] += operator.get("rows", args.get("Rows", 0))
+        stats["operators"].append(operator.get("operatorType"))
+        pending.extend(operator.get("children", []))
+    return stats
+
+
+def get_estimated_rows(plan):
+    """
+    Estimated rows of the root operator of the given EXPLAIN plan.
+    """
+    return plan.get("args", {}).get("EstimatedRows", 0)
+
+
+def run_summary(driver, query, parameters, database="neo4j"):
+    with driver.session(database=database) as session:
+        start = time.perf_counter()
+        summary = session.run(query, parameters).consume()
+        return summary, time.perf_counter() - start
+
+
+def benchmark_query(driver, query_text, parameters, repeat=3):
+    """
+    Runs EXPLAIN once and PROFILE for the given number of times on the given query.
+    :return: query benchmark report
+    """
+    explain_summary, _ = run_summary(driver, "EXPLAIN " + query_text, parameters)
+    profile_stats = None
+    timings = list()
+    for _ in range(repeat):
+        profile_summary, elapsed = run_summary(driver, "PROFILE " + query_text, parameters)
+        profile_stats = get_plan_stats(profile_summary.profile)
+        timings.append(elapsed)
+
+    return {"estimated_rows": get_estimated_rows(explain_summary.plan),
+            "db_hits": profile_stats["db_hits"],
+            "rows": profile_stats["rows"],
+            "operators": sorted(set(profile_stats["operators"])),
+            "min_time": min(timings),
+            "avg_time": sum(timings) / len(timings)}
+
+
+def benchmark(driver, repeat=3):
+    report = dict()
+    for name, query_class, parameters in SAMPLE_QUERIES:
+        # query drivers are lazy, so the query objects are only used for their Cypher text
+        query_text = query_class().get_query()
+        log.info("Benchmarking " + name)
+        report[name] = benchmark_query(driver, query_text, parameters, repeat)
+    return report
+
+
+def compare_reports(baseline, report, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """
+    Compares the db hits and rows of the report with the baseline report.
+    :return: list of regression messages, empty if there is no regression
+    """
+    regressions = list()
+    for name, current in report.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ["db_hits", "rows"]:
+            if current[metric] > previous[metric] * (1 + threshold):
+                regressions.append("{}: {} increased from {} to {}".format(name, metric, previous[metric],
+                                                                           current[metric]))
+    return regressions
+
+
+def get_connection_config(args):
+    config = configparser.ConfigParser()
+    config["NEO4j"] = {"bolt_url": args.bolt_url or neo4j_config.get("bolt_url"),
+                       "user": args.user or neo4j_config.get("user"),
+                       "password": args.password or neo4j_config.get("password")}
+    return config["NEO4j"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN/PROFILE benchmark of the dump queries.")
+    parser.add_argument("--bolt-url", help="bolt url of the test database. Defaults to neo4j_config.ini")
+    parser.add_argument("--user", help="database user. Defaults to neo4j_config.ini")
+    parser.add_argument("--password", help="database password. Defaults to neo4j_config.ini")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="number of PROFILE runs per query")
+    parser.add_argument("-o", "--output", help="json report output path")
+    parser.add_argument("-b", "--baseline", help="baseline json report to check regressions against")
+    parser.add_argument("-t", "--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="allowed relative increase of db hits and rows over the baseline")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        report = benchmark(get_driver(get_connection_config(args)), args.repeat)
+    finally:
+        close_drivers()
+
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_reports(json.load(f), report, args.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Record and replay of the parsed BDSQuery responses. A recorded fixture lets the dumps run without Neo4j, which makes
+offline, reproducible performance runs of the transform code possible:
+
+    python bds_dumps.py --record ../../../dumps/queries_fixture.json.gz
+    python bds_dumps.py --replay ../../../dumps/queries_fixture.json.gz --replay-latency recorded
+"""
+
+import copy
+import gzip
+import json
+import time
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+FIXTURE_FORMAT_VERSION = 1
+
+RECORDED_LATENCY = "recorded"
+
+
+def get_entry_key(query_name, parameters):
+    return query_name + ":" + json.dumps(parameters or {}, sort_keys=True, ensure_ascii=False)
+
+
+class QueryRecorder(object):
+    """
+    Collects the parsed responses of the executed queries and saves them as a gzipped JSON fixture. Batch query
+    responses are recorded per item, so that the fixture can be replayed with any batch size.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = dict()
+        self.lock = threading.Lock()
+
+    def record(self, query, parameters, result, seconds):
+        items = query.split_result(parameters, result)
+        with self.lock:
+            for item_parameters, item_result in items:
+                self.entries[get_entry_key(type(query).__name__, item_parameters)] = {
+                    "query": type(query).__name__,
+                    "parameters": item_parameters,
+                    "result": item_result,
+                    "seconds": round(seconds / len(items), 6)}
+
+    def save(self):
+        with self.lock:
+            fixture = {"format_version": FIXTURE_FORMAT_VERSION, "entries": list(self.entries.values())}
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, separators=(",", ":"))
+        log.info("Recorded {} query responses to {}".format(len(fixture["entries"]), self.path))
+
+
+class QueryReplayer(object):
+    """
+    Serves the query responses of a recorded fixture without a database connection.
+    """
+
+    def __init__(self, path, latency=None):
+        """
+        :param path: fixture file path
+        :param latency: simulated latency of each query. Either seconds, 'recorded' to sleep for the recorded query
+        time, or None for no latency.
+        """
+        self.path = path
+        self.latency = latency
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            fixture = json.load(f)
+        if fixture.get("format_version") != FIXTURE_FORMAT_VERSION:
+            raise ValueError("Unsupported query fixture format: " + str(fixture.get("format_version")))
+        self.entries = {get_entry_key(entry["query"], entry["parameters"]): entry for entry in fixture["entries"]}
+        log.info("Replaying {} query responses from {}".format(len(self.entries), path))
+
+    def get_entry(self, query_name, parameters):
+        entry = self.entries.get(get_entry_key(query_name, parameters))
+        if entry is None:
+            raise KeyError("No recorded response for {} with parameters {}".format(query_name, parameters))
+        return entry
+
+    def replay(self, query, parameters):
+        """
+        :return: copy of the recorded result of the query. Results of batch queries are merged from the recorded
+        items.
+        """
+        query_name = type(query).__name__
+        items = query.split_parameters(parameters)
+        if len(items) == 1 and items[0] == parameters:
+            entry = self.get_entry(query_name, parameters)
+            result = entry["result"]
+            seconds = entry["seconds"]
+        else:
+            result = dict()
+            seconds = 0
+            for item_parameters in items:
+                entry = self.get_entry(query_name, item_parameters)
+                result.update(entry["result"])
+                seconds += entry["seconds"]
+
+        if self.latency == RECORDED_LATENCY:
+            time.sleep(seconds)
+        elif self.latency:
+            time.sleep(self.latency)
+        return copy.deepcopy(result)
+
+
+def parse_latency(value):
+    """
+    Parses the --replay-latency argument: 'recorded' or seconds.
+    """
+    if value is None or value == RECORDED_LATENCY:
+        return value
+    return float(value)
@@ -0,0 +1,150 @@
+import json
+import time
+import logging
+import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from bds_api.dumps.dump_io import iter_dump_documents, batches
+from bds_api.dumps.dump_metrics import get_metrics, SOLR_UPLOAD_STAGE
+
+log = logging.getLogger(__name__)
+
+JSON_HEADERS = {"Content-type": "application/json"}
+
+# responses worth retrying, other error responses are raised immediately
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def get_update_url(config):
+    return "http://{}:{}/solr/{}/update".format(config["solr_host"], config["solr_port"], config["solr_collection"])
+
+
+class SolrBulkIndexer(object):
+    """
+    Streams documents to the Solr update handler in fixed size batches over a pooled HTTP session. Batches are posted
+    by concurrent workers and failed batches are retried with exponential backoff. Documents are committed either by
+    Solr through commitWithin or by a single commit after all batches are indexed.
+    """
+
+    def __init__(self, update_url, batch_size=1000, workers=4, commit_within=0, max_retries=3, backoff_factor=1.0,
+                 timeout=(10, 120)):
+        """
+        :param update_url: Solr update handler url, such as http://localhost:8993/solr/bdsdump/update
+        :param batch_size: documents per update request
+        :param workers: number of concurrent update requests
+        :param commit_within: milliseconds within which Solr commits the documents. If 0, a single commit is sent
+        after indexing.
+        :param max_retries: retries of a failed update request
+        :param backoff_factor: retries wait backoff_factor * 2 ^ retry seconds
+        :param timeout: (connect timeout, read timeout) in seconds
+        """
+        self.update_url = update_url
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.commit_within = commit_within
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Creates an indexer from the search_config.ini 'Indexer' section.
+        """
+        return cls(get_update_url(config),
+                   batch_size=config.getint("batch_size", fallback=1000),
+                   workers=config.getint("workers", fallback=4),
+                   commit_within=config.getint("commit_within", fallback=0),
+                   max_retries=config.getint("max_retries", fallback=3),
+                   backoff_factor=config.getfloat("backoff_factor", fallback=1.0),
+                   timeout=(config.getfloat("connect_timeout", fallback=10),
+                            config.getfloat("read_timeout", fallback=120)))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def post(self, payload, params=None):
+        """
+        Posts the given JSON payload to the update handler. Connection errors, timeouts and retryable responses are
+        retried with exponential backoff.
+        :param payload: JSON serializable update command or document list
+        :param params: request parameters
+        :return: Solr response
+        """
+        data = json.dumps(payload).encode("utf-8")
+        retry = 0
+        while True:
+            try:
+                response = self.session.post(self.update_url, data=data, params=params, headers=JSON_HEADERS,
+                                             timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                error = requests.HTTPError("Solr update failed with status {}: {}"
+                                           .format(response.status_code, response.text), response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if retry >= self.max_retries:
+                raise error
+            wait = self.backoff_factor * (2 ** retry)
+            retry += 1
+            log.warning("Solr update request failed ({}), retry {} in {}s.".format(error, retry, wait))
+            time.sleep(wait)
+
+    def get_update_params(self):
+        return {"commitWithin": self.commit_within} if self.commit_within else None
+
+    def index_batch(self, batch):
+        with get_metrics().time_stage(SOLR_UPLOAD_STAGE, len(batch)):
+            self.post(batch, self.get_update_params())
+        return len(batch)
+
+    def index_documents(self, documents, commit=True):
+        """
+        Indexes the given documents batch by batch with at most 2 * workers batches in flight.
+        :param documents: iterable of Solr documents or atomic updates
+        :param commit: if True and commitWithin is not used, commits once all batches are indexed
+        :return: number of indexed documents
+        """
+        indexed = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = deque()
+            for batch in batches(documents, self.batch_size):
+                if len(in_flight) >= 2 * self.workers:
+                    indexed += in_flight.popleft().result()
+                in_flight.append(executor.submit(self.index_batch, batch))
+            while in_flight:
+                indexed += in_flight.popleft().result()
+        log.info("Indexed {} documents to {}".format(indexed, self.update_url))
+
+        if commit and not self.commit_within:
+            self.commit()
+        return indexed
+
+    def index_dump(self, dump_path, commit=True):
+        """
+        Streams the documents of a JSON array or NDJSON dump file to Solr.
+        """
+        return self.index_documents(iter_dump_documents(dump_path), commit)
+
+    def delete(self, ids):
+        """
+        Deletes the documents with the given ids.
+        """
+        for batch in batches(ids, self.batch_size):
+            self.post({"delete": batch}, self.get_update_params())
+
+    def commit(self):
+        self.post({"commit": {}})
+        log.info("Committed " + self.update_url)
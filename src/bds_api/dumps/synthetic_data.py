@@ -0,0 +1,320 @@
+"""
+Generator of synthetic query results with the shapes of the ListAllAllenIndividuals, ListAllTaxonomies,
+GetOntologyMetadata and IndividualDetailsQuery results. Used to benchmark the dumps at scales beyond the real data.
+Individual details are generated lazily and deterministically (the same configuration always produces the same data),
+so large data sets are never held in memory.
+"""
+
+import json
+import bisect
+import random
+from bds_api.dumps.dump_metrics import get_metrics
+
+SPECIES = ["Mus musculus", "Homo sapiens", "Callithrix jacchus"]
+
+SPECIES_TAGS = {"Mus musculus": "Mus_musculus", "Homo sapiens": "Homo_sapiens",
+                "Callithrix jacchus": "Callithrix_jacchus"}
+
+CROSS_SPECIES_TAXON = "Euarchontoglires"
+
+CELL_TAGS = ["Neuron", "Glutamatergic_neuron", "GABAergic_neuron", "Astrocyte", "Oligodendrocyte", "Microglial_cell"]
+
+# cell type ranks of the dendrogram levels, deeper levels are cell types
+LEVEL_RANKS = ["None", "Class", "Subclass"]
+LEAF_RANK = "Cell Type"
+
+# ratio of the cell type level individuals that are intermediate dendrogram nodes without a class
+NO_CLASS_RATIO = 0.3
+
+ROOT_PARENT = {"iri": "http://purl.obolibrary.org/obo/CL_0000540", "curie": "CL:0000540", "label": "neuron",
+               "short_form": "CL_0000540"}
+
+GENERATE_STAGE = "generate"
+
+PCL_IRI = "http://purl.obolibrary.org/obo/PCL_"
+GENE_IRI = "https://identifiers.org/ncbigene/"
+
+
+def axiom(value):
+    return json.dumps({"annotations": {}, "value": value}, separators=(",", ":"))
+
+
+class SyntheticDataConfig(object):
+
+    def __init__(self, taxonomies=4, individuals_per_taxonomy=200, markers_per_class=4, hierarchy_depth=4,
+                 homology_links=1, genes_per_species=2000, datasets_per_taxonomy=2, references_per_taxonomy=2,
+                 seed=1):
+        """
+        :param taxonomies: number of taxonomies
+        :param individuals_per_taxonomy: number of cell set individuals of each taxonomy
+        :param markers_per_class: marker genes expressed by each class
+        :param hierarchy_depth: depth of the taxonomy dendrograms
+        :param homology_links: number of homologous classes (in other taxonomies) of each cell type
+        :param genes_per_species: size of the marker gene pool of each species
+        :param datasets_per_taxonomy: number of datasets of each taxonomy
+        :param references_per_taxonomy: number of references of each taxonomy
+        :param seed: random seed
+        """
+        self.taxonomies = taxonomies
+        self.individuals_per_taxonomy = individuals_per_taxonomy
+        self.markers_per_class = markers_per_class
+        self.hierarchy_depth = max(2, hierarchy_depth)
+        self.homology_links = homology_links
+        self.genes_per_species = genes_per_species
+        self.datasets_per_taxonomy = datasets_per_taxonomy
+        self.references_per_taxonomy = references_per_taxonomy
+        self.seed = seed
+
+    def scale(self, factor):
+        """
+        :return: copy of the configuration with factor times more individuals per taxonomy
+        """
+        config = SyntheticDataConfig(**vars(self))
+        config.individuals_per_taxonomy = self.individuals_per_taxonomy * factor
+        return config
+
+
+class SyntheticDataGenerator(object):
+
+    def __init__(self, config=None):
+        self.config = config or SyntheticDataConfig()
+        count = self.config.individuals_per_taxonomy
+        # iri number block of each taxonomy. 'All cells' and class iris of a taxonomy share the same prefix.
+        self.block_size = 10 ** max(4, len(str(count * 2)) + 1)
+        self.taxonomy_ids = ["20300{:04d}".format(index + 1) for index in range(self.config.taxonomies)]
+        self.level_starts = self.get_level_starts()
+        # (taxonomy, index) -> (class metadata, individual metadata, markers) of the dendrogram nodes with children
+        self.ancestor_cache = dict()
+
+    def get_level_starts(self):
+        """
+        Individuals of a taxonomy are ordered by dendrogram level: index 0 is 'All cells', a few classes and subclasses
+        follow and the deepest level (cell types) takes the rest.
+        :return: first individual index of each level
+        """
+        count = self.config.individuals_per_taxonomy
+        starts = [0, 1]
+        for level in range(1, self.config.hierarchy_depth - 1):
+            size = max(1, count * 5 ** (level - 1) // 50)
+            starts.append(min(count - 1, starts[-1] + size))
+        return starts
+
+    def get_level(self, index):
+        return bisect.bisect_right(self.level_starts, index) - 1
+
+    def get_level_size(self, level):
+        end = self.level_starts[level + 1] if level + 1 < len(self.level_starts) \
+            else self.config.individuals_per_taxonomy
+        return max(0, end - self.level_starts[level])
+
+    def get_parent_index(self, index):
+        """
+        Parent is a random individual of the previous level, so the dendrogram is a tree.
+        """
+        level = self.get_level(index)
+        if level == 0:
+            return None
+        rnd = random.Random(self.config.seed * 1000003 + index)
+        return self.level_starts[level - 1] + rnd.randrange(self.get_level_size(level - 1))
+
+    def get_species(self, taxonomy):
+        return SPECIES[taxonomy % len(SPECIES)]
+
+    def get_taxonomy_label(self, taxonomy):
+        return "CCN" + self.taxonomy_ids[taxonomy]
+
+    def get_accession(self, taxonomy, index):
+        return "CS" + self.taxonomy_ids[taxonomy] + "_" + str(index)
+
+    def get_number(self, taxonomy, index, individual=False):
+        base = (taxonomy + 1) * self.block_size * 2
+        return base + (self.block_size if individual else 0) + index
+
+    def has_class(self, taxonomy, index):
+        if self.get_level(index) < 3:
+            return True
+        return random.Random(self.config.seed * 7 + taxonomy * 1000003 + index).random() >= NO_CLASS_RATIO
+
+    def get_name(self, taxonomy, index):
+        if index == 0:
+            return "All cells"
+        return "{} {}_{}".format(["All", "Class", "Subclass", "Type"][min(3, self.get_level(index))],
+                                 self.taxonomy_ids[taxonomy][-2:], index)
+
+    def get_class(self, taxonomy, index):
+        number = self.get_number(taxonomy, index)
+        species = self.get_species(taxonomy)
+        name = self.get_name(taxonomy, index)
+        label = "{} cell ({})".format(name, species)
+        return {"iri": PCL_IRI + "{:07d}".format(number), "curie": "PCL:{:07d}".format(number), "label": label,
+                "short_form": "PCL_{:07d}".format(number), "prefLabel": [name], "label_rdfs": [label],
+                "has_exact_synonym": [axiom(name), axiom(name.replace(" ", "_"))],
+                "definition": [axiom("A {} of {}. The reference data for this cell type is {}.".format(
+                    name, species, self.get_accession(taxonomy, index)))],
+                "symbol": [name + " (" + species.split(" ")[0] + ")"],
+                "has_nsforest_marker": [marker["class_metadata"]["label"]
+                                        for marker in self.get_markers(taxonomy, index)[:2]]}
+
+    def get_individual(self, taxonomy, index):
+        number = self.get_number(taxonomy, index, individual=True)
+        name = self.get_name(taxonomy, index)
+        level = self.get_level(index)
+        return {"iri": PCL_IRI + "{:07d}".format(number), "curie": "PCL:{:07d}".format(number),
+                "label": name, "prefLabel": [name], "cluster_id": [self.get_accession(taxonomy, index)],
+                "cell_type_rank": [LEVEL_RANKS[level] if level < len(LEVEL_RANKS) else LEAF_RANK],
+                "cell_set_color": ["#{:06X}".format((number * 2654435761) % 0xFFFFFF)],
+                "comment": ["In {} ({}), {} is a member of the dendrogram level {}.".format(
+                    self.get_species(taxonomy), self.get_taxonomy_label(taxonomy), name, level)],
+                "has_exact_synonym": [axiom(name)], "has_related_synonym": [axiom(name + " alias")],
+                "tags": ["Individual", "Cell_cluster"]}
+
+    def get_markers(self, taxonomy, index):
+        species = self.get_species(taxonomy)
+        rnd = random.Random(self.config.seed * 31 + taxonomy * 1000003 + index)
+        genes = rnd.sample(range(self.config.genes_per_species), min(self.config.markers_per_class,
+                                                                      self.config.genes_per_species))
+        species_offset = SPECIES.index(species) * 10000000
+        return [{"relation": {"label": "expresses"},
+                 "class_metadata": {"iri": GENE_IRI + str(species_offset + gene),
+                                    "curie": "ncbigene:" + str(species_offset + gene),
+                                    "label": "Gene{} ({})".format(gene, species.split(" ")[0][:4])}}
+                for gene in genes]
+
+    def get_ancestors(self, index):
+        ancestors = list()
+        parent = self.get_parent_index(index)
+        while parent is not None:
+            ancestors.append(parent)
+            parent = self.get_parent_index(parent)
+        return ancestors
+
+    def get_reference(self, taxonomy, reference):
+        iri = "https://doi.org/10.1101/{}.{}".format(self.taxonomy_ids[taxonomy], reference)
+        return {"iri": iri, "curie": "doi:" + iri[16:], "label": "Reference {} of {}".format(
+            reference, self.get_taxonomy_label(taxonomy)), "creator": ["Author A", "Author B"],
+                "abstract": [None, "Abstract of the reference."], "date": [None, "2021-01-01"]}
+
+    def get_region(self, taxonomy):
+        return {"curie": "UBERON:{:07d}".format(1000 + taxonomy), "label": "brain region " + str(taxonomy)}
+
+    def list_all_allen_individuals(self):
+        """
+        :return: ListAllAllenIndividuals result
+        """
+        return ["PCL:{:07d}".format(self.get_number(taxonomy, index, individual=True))
+                for taxonomy in range(self.config.taxonomies)
+                for index in range(self.config.individuals_per_taxonomy)]
+
+    def list_all_taxonomies(self):
+        """
+        :return: ListAllTaxonomies result
+        """
+        taxonomies = dict()
+        for taxonomy, taxonomy_id in enumerate(self.taxonomy_ids):
+            number = self.get_number(taxonomy, self.block_size - 1)
+            iri = PCL_IRI + "{:07d}".format(number)
+            label = self.get_taxonomy_label(taxonomy)
+            taxonomies[taxonomy_id] = {
+                "taxonomy": {"iri": iri, "curie": "PCL:{:07d}".format(number), "label": label,
+                             "prefLabel": [self.get_species(taxonomy)],
+                             "cell_types_count": [self.get_level_size(len(self.level_starts) - 1)],
+                             "cell_subclasses_count": [self.get_level_size(2) if len(self.level_starts) > 2 else 0],
+                             "cell_classes_count": [self.get_level_size(1)],
+                             "has_brain_region": [self.get_region(taxonomy)["curie"]],
+                             "title": ["Synthetic taxonomy " + label], "comment": ["Synthetic benchmark data."]},
+                "datasets": [{"dataset_metadata": {"iri": "{}_dataset_{}".format(iri, dataset),
+                                                   "curie": "PCL:{:07d}_{}".format(number, dataset),
+                                                   "label": "Dataset {} of {}".format(dataset, label),
+                                                   "comment": ["Synthetic dataset."],
+                                                   "cell_count": [1000 * (dataset + 1)],
+                                                   "prefLabel": ["Dataset " + str(dataset)],
+                                                   "assesses": [self.get_species(taxonomy)]}}
+                             for dataset in range(self.config.datasets_per_taxonomy)],
+                "references": [{"class_metadata": self.get_reference(taxonomy, reference)}
+                               for reference in range(self.config.references_per_taxonomy)]}
+        return taxonomies
+
+    def get_ontology_metadata(self):
+        """
+        :return: GetOntologyMetadata result
+        """
+        return {"name": "pcl", "version": "synthetic-{}x{}".format(self.config.taxonomies,
+                                                                   self.config.individuals_per_taxonomy)}
+
+    def get_species_mapping(self):
+        return {taxonomy_id: self.get_species(taxonomy) for taxonomy, taxonomy_id in enumerate(self.taxonomy_ids)}
+
+    def get_ancestor(self, taxonomy, index):
+        """
+        Metadata of an ancestor node. Ancestors are shared by many individuals, so they are generated once.
+        """
+        ancestor = self.ancestor_cache.get((taxonomy, index))
+        if ancestor is None:
+            ancestor = (self.get_class(taxonomy, index) if self.has_class(taxonomy, index) else None,
+                        self.get_individual(taxonomy, index), self.get_markers(taxonomy, index))
+            self.ancestor_cache[(taxonomy, index)] = ancestor
+        return ancestor
+
+    def get_individual_details(self, taxonomy, index):
+        """
+        :return: IndividualDetailsQuery result of the individual
+        """
+        ancestors = self.get_ancestors(index)
+        parent = ancestors[0] if ancestors else None
+        has_class = self.has_class(taxonomy, index)
+        class_metadata = self.get_class(taxonomy, index) if has_class else None
+        species = self.get_species(taxonomy)
+        cell_tag = CELL_TAGS[(taxonomy + index) % len(CELL_TAGS)]
+
+        if parent is None:
+            parents = [{"relation": {"label": "subClassOf"}, "class_metadata": ROOT_PARENT}]
+        elif self.get_level(index) == 1:
+            parents = [{"relation": {"label": "subClassOf"}, "class_metadata": ROOT_PARENT}]
+        else:
+            parents = [{"relation": {"label": "subClassOf"}, "class_metadata": self.get_ancestor(taxonomy, parent)[0]}]
+
+        parent_markers = list()
+        for ancestor in ancestors:
+            parent_markers.extend(self.get_ancestor(taxonomy, ancestor)[2])
+
+        homologous_to = list()
+        if self.get_level(index) >= 2 and self.config.taxonomies > 1:
+            for link in range(self.config.homology_links):
+                other = (taxonomy + link + 1) % self.config.taxonomies
+                if other != taxonomy and self.has_class(other, index):
+                    homologous_to.append({"class_metadata": self.get_class(other, index)})
+
+        return {"class_metadata": [{"tags": ["Class", cell_tag, SPECIES_TAGS[species]] if has_class else None,
+                                    "class_metadata": class_metadata}],
+                "indv_metadata": self.get_individual(taxonomy, index),
+                "parents": parents if has_class else [{"relation": None, "class_metadata": None}],
+                "markers": self.get_markers(taxonomy, index) if has_class else
+                [{"relation": None, "class_metadata": None}],
+                "parent_markers": parent_markers or [{"relation": None, "class_metadata": None}],
+                "references": [{"relation": {"label": "source"},
+                                "class_metadata": self.get_reference(taxonomy, index % max(
+                                    1, self.config.references_per_taxonomy))}]
+                if has_class and self.config.references_per_taxonomy else
+                [{"relation": None, "class_metadata": None}],
+                "taxonomy": [{"taxon": {"label": species} if has_class else None,
+                              "parent_taxon": {"label": CROSS_SPECIES_TAXON}}] if has_class else
+                [{"taxon": None, "parent_taxon": None}],
+                "region": [{"soma_location": self.get_region(taxonomy), "parent_soma_location": None}],
+                "homologous_to": homologous_to or [{"class_metadata": None}],
+                "parent_clusters": [{"indv_metadata": self.get_ancestor(taxonomy, ancestor)[1],
+                                     "class_metadata": self.get_ancestor(taxonomy, ancestor)[0]}
+                                    for ancestor in ancestors if self.get_level(ancestor) > 0] or
+                [{"indv_metadata": None, "class_metadata": None}]}
+
+    def iter_individual_results(self):
+        """
+        Generates the individual details in the order of list_all_allen_individuals.
+        :return: generator of (individual curie, individual details) tuples
+        """
+        metrics = get_metrics()
+        for taxonomy in range(self.config.taxonomies):
+            for index in range(self.config.individuals_per_taxonomy):
+                with metrics.time_stage(GENERATE_STAGE):
+                    curie = "PCL:{:07d}".format(self.get_number(taxonomy, index, individual=True))
+                    details = self.get_individual_details(taxonomy, index)
+                yield curie, details
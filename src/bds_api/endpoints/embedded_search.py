@@ -0,0 +1,379 @@
+"""
+Embedded search backend. Loads a Solr dump file into an in-memory inverted index and answers the search, autocomplete
+and document access requests with Solr compatible responses, so that the service can run without a Solr server.
+
+Queries follow the edismax AND semantics: each clause of the query should match at least one of the weighted fields of
+the profile. A clause scores the max boost * idf of its matching fields and matching domain boosting iris add their
+boost to the document score. Text fields are tokenized on the non-word characters, '*_autosuggest_e' fields match the
+clauses that are prefixes of the whole field value like their edge n-gram Solr field type.
+"""
+
+import re
+import math
+import time
+import bisect
+import fnmatch
+import logging
+import functools
+import itertools
+import threading
+from bds_api.dumps.dump_io import iter_dump_documents
+from bds_api.endpoints.search_config import backend_config
+from bds_api.endpoints.request_templates import get_profile, PROFILES
+
+log = logging.getLogger(__name__)
+
+SOLR_BACKEND = "solr"
+EMBEDDED_BACKEND = "embedded"
+SEARCH_BACKENDS = [SOLR_BACKEND, EMBEDDED_BACKEND]
+
+EDGE_FIELD_SUFFIX = "_autosuggest_e"
+# max edge n-gram size of the autosuggest field type, see scripts/solr_post_config.sh
+MAX_EDGE_GRAM_SIZE = 35
+
+KEY_FIELDS = ["id", "curie", "accession_id"]
+
+HIGHLIGHT_PRE = "<b>"
+HIGHLIGHT_POST = "</b>"
+
+token_pattern = re.compile(r"\w+")
+
+
+def tokenize(value):
+    return token_pattern.findall(str(value).lower())
+
+
+def get_values(doc, field):
+    values = doc.get(field)
+    if values is None:
+        return []
+    return values if isinstance(values, list) else [values]
+
+
+def to_solr_doc(doc):
+    """
+    Solr collection is schemaless, so all fields other than the 'id' are multivalued.
+    """
+    return {name: value if name == "id" or isinstance(value, list) else [value] for name, value in doc.items()}
+
+
+@functools.lru_cache(maxsize=4096)
+def is_response_field(response_fields, name):
+    """
+    :param response_fields: field names and wildcard patterns of the search profile
+    """
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in response_fields if pattern != "score")
+
+
+def get_idf(doc_count, doc_frequency):
+    return math.log(1 + (doc_count - doc_frequency + 0.5) / (doc_frequency + 0.5))
+
+
+class TextFieldIndex(object):
+    """
+    Inverted index of the tokens of a text field.
+    """
+
+    def __init__(self, docs, field):
+        postings = dict()
+        for doc_index, doc in enumerate(docs):
+            for value in get_values(doc, field):
+                for token in tokenize(value):
+                    postings.setdefault(token, set()).add(doc_index)
+        self.postings = {token: frozenset(doc_indexes) for token, doc_indexes in postings.items()}
+        self.doc_count = len(docs)
+
+    def match(self, clause):
+        """
+        :return: documents that have all tokens of the clause and the idf sum of the tokens. None if the clause has
+        no tokens.
+        """
+        tokens = tokenize(clause)
+        if not tokens:
+            return None
+        matches = None
+        idf = 0.0
+        for token in tokens:
+            doc_indexes = self.postings.get(token, frozenset())
+            matches = doc_indexes if matches is None else matches & doc_indexes
+            if not matches:
+                return frozenset(), 0.0
+            idf += get_idf(self.doc_count, len(doc_indexes))
+        return matches, idf
+
+
+class EdgeFieldIndex(object):
+    """
+    Sorted lower case values of the source field of an autosuggest field, clauses are matched as value prefixes.
+    """
+
+    def __init__(self, docs, field):
+        source_field = field[:-len(EDGE_FIELD_SUFFIX)]
+        entries = sorted((str(value).lower(), doc_index) for doc_index, doc in enumerate(docs)
+                         for value in get_values(doc, source_field))
+        self.values = [value for value, _ in entries]
+        self.doc_indexes = [doc_index for _, doc_index in entries]
+        self.doc_count = len(docs)
+
+    def match(self, clause):
+        prefix = clause.lower()
+        if len(prefix) > MAX_EDGE_GRAM_SIZE:
+            return frozenset(), 0.0
+        start = bisect.bisect_left(self.values, prefix)
+        end = bisect.bisect_left(self.values, prefix + "\U0010ffff", start)
+        matches = frozenset(self.doc_indexes[start:end])
+        return matches, get_idf(self.doc_count, len(matches)) if matches else 0.0
+
+
+class EmbeddedIndex(object):
+    """
+    In-memory index of the documents of a Solr dump. Field indexes are built on first use, so the fields added to the
+    configuration profiles are indexed without reloading the dump.
+    """
+
+    def __init__(self, docs):
+        self.docs = [to_solr_doc(doc) for doc in docs]
+        self.lock = threading.Lock()
+        self.field_indexes = dict()
+        self.keys = {field: dict() for field in KEY_FIELDS}
+        for doc_index, doc in enumerate(self.docs):
+            for field in KEY_FIELDS:
+                for value in get_values(doc, field):
+                    self.keys[field].setdefault(value, list()).append(doc_index)
+
+    @classmethod
+    def from_dump(cls, path):
+        """
+        Loads a JSON, NDJSON or indexed Solr dump file.
+        """
+        start = time.perf_counter()
+        index = cls(iter_dump_documents(path))
+        log.info("Loaded {} documents of {} in {:.2f}s.".format(len(index.docs), path, time.perf_counter() - start))
+        return index
+
+    def get_field_index(self, field):
+        field_index = self.field_indexes.get(field)
+        if field_index is None:
+            with self.lock:
+                field_index = self.field_indexes.get(field)
+                if field_index is None:
+                    index_type = EdgeFieldIndex if field.endswith(EDGE_FIELD_SUFFIX) else TextFieldIndex
+                    field_index = index_type(self.docs, field)
+                    self.field_indexes[field] = field_index
+        return field_index
+
+    def warm(self, profiles):
+        """
+        Builds the field indexes of the given search profiles.
+        """
+        for profile in profiles:
+            for field, _ in profile.field_weights:
+                self.get_field_index(field)
+
+    def get_value_index(self, field):
+        """
+        :return: dictionary of the exact values of the field to their documents
+        """
+        key = ("values", field)
+        value_index = self.field_indexes.get(key)
+        if value_index is None:
+            with self.lock:
+                value_index = self.field_indexes.get(key)
+                if value_index is None:
+                    value_index = dict()
+                    for doc_index, doc in enumerate(self.docs):
+                        for value in get_values(doc, field):
+                            value_index.setdefault(value, set()).add(doc_index)
+                    value_index = {value: frozenset(doc_indexes) for value, doc_indexes in value_index.items()}
+                    self.field_indexes[key] = value_index
+        return value_index
+
+    def get_iri_prefix_docs(self, iri_prefix):
+        key = ("iri_prefix", iri_prefix)
+        doc_indexes = self.field_indexes.get(key)
+        if doc_indexes is None:
+            doc_indexes = frozenset(doc_index for doc_index, doc in enumerate(self.docs)
+                                    if any(str(iri).startswith(iri_prefix) for iri in get_values(doc, "iri")))
+            with self.lock:
+                self.field_indexes[key] = doc_indexes
+        return doc_indexes
+
+    def filter_docs(self, field, values):
+        """
+        :return: documents that have any of the given values in the field
+        """
+        value_index = self.get_value_index(field)
+        return frozenset().union(*(value_index.get(value, frozenset()) for value in values))
+
+    def match_clause(self, field_weights, clause):
+        """
+        Scores the documents matching the clause in any of the weighted fields with their best field score.
+        :return: list of (score, documents) groups. None if the clause has no terms in any field.
+        """
+        field_matches = list()
+        for field, boost in field_weights:
+            result = self.get_field_index(field).match(clause)
+            if result is not None:
+                doc_indexes, idf = result
+                field_matches.append((boost * idf, doc_indexes))
+        if not field_matches:
+            return None
+
+        groups = list()
+        scored = frozenset()
+        for score, doc_indexes in sorted(field_matches, key=lambda field_match: -field_match[0]):
+            doc_indexes = doc_indexes - scored
+            if doc_indexes:
+                groups.append((score, doc_indexes))
+                scored = scored | doc_indexes
+        return groups
+
+    def search(self, profile, query, species=(), taxonomies=(), ranks=(), rows=None):
+        """
+        Searches the documents like the Solr edismax query of the profile. Documents are scored in groups of equal
+        scores, so the cost of a search depends on the number of the fields rather than the number of the matches.
+        :param profile: parsed search profile
+        :param query: search terms
+        :param species: species names, documents of any of them are returned
+        :param taxonomies: taxonomy ids, documents of any of them are returned
+        :param ranks: Cell Type ranks, documents of any of them are returned
+        :param rows: max number of results. Defaults to the result_limit of the profile.
+        :return: Solr search response
+        """
+        start = time.perf_counter()
+        clauses = [clause for clause in query.split(" ") if clause]
+        if clauses == ["*"]:
+            groups = [(1.0, frozenset(range(len(self.docs))))]
+            clauses = list()
+        else:
+            groups = None
+            for clause in clauses:
+                clause_groups = self.match_clause(profile.field_weights, clause)
+                if clause_groups is None:
+                    continue
+                if groups is None:
+                    groups = clause_groups
+                else:
+                    groups = [(score + clause_score, doc_indexes & clause_doc_indexes)
+                              for score, doc_indexes in groups for clause_score, clause_doc_indexes in clause_groups
+                              if not doc_indexes.isdisjoint(clause_doc_indexes)]
+                if not groups:
+                    break
+            groups = groups or list()
+
+        for field, values in [("species", species), ("taxonomy_id", taxonomies), ("rank", ranks)]:
+            if values and groups:
+                filter_doc_indexes = self.filter_docs(field, values)
+                groups = [(score, doc_indexes & filter_doc_indexes) for score, doc_indexes in groups
+                          if not doc_indexes.isdisjoint(filter_doc_indexes)]
+        for iri_prefix, boost in profile.domain_boosting:
+            boosted = self.get_iri_prefix_docs(iri_prefix)
+            groups = [group for score, doc_indexes in groups
+                      for group in [(score + boost, doc_indexes & boosted), (score, doc_indexes - boosted)] if group[1]]
+
+        # highest scores first, equal scores in the dump order
+        groups.sort(key=lambda group: -group[0])
+        rows = rows or profile.result_limit
+        top = list()
+        for score, score_groups in itertools.groupby(groups, key=lambda group: group[0]):
+            if len(top) >= rows:
+                break
+            doc_indexes = frozenset().union(*(doc_indexes for _, doc_indexes in score_groups))
+            top.extend((doc_index, score) for doc_index in sorted(doc_indexes)[:rows - len(top)])
+
+        docs = [self.select_fields(self.docs[doc_index], profile.response_fields, score) for doc_index, score in top]
+        data = self.create_response(docs, sum(len(doc_indexes) for _, doc_indexes in groups), start)
+        if "score" in profile.response_fields:
+            data["response"]["maxScore"] = top[0][1] if top else 0.0
+        data["highlighting"] = {self.docs[doc_index]["id"]: self.highlight(self.docs[doc_index],
+                                                                            profile.highlight_fields, clauses)
+                                for doc_index, _ in top}
+        return data
+
+    def find(self, field_values, rows):
+        """
+        Looks up documents by their key fields.
+        :param field_values: list of (field, value) tuples, field is one of the KEY_FIELDS
+        :param rows: max number of results
+        :return: Solr response of the found documents
+        """
+        start = time.perf_counter()
+        doc_indexes = dict()
+        for field, value in field_values:
+            for doc_index in self.keys[field].get(value, []):
+                doc_indexes.setdefault(doc_index)
+        docs = [self.docs[doc_index] for doc_index in doc_indexes]
+        return self.create_response(docs[:rows], len(docs), start)
+
+    def list_taxonomies(self, rows):
+        """
+        :return: Solr response of the taxonomy documents
+        """
+        start = time.perf_counter()
+        docs = [doc for doc in self.docs if "taxonomy" in get_values(doc, "type")]
+        return self.create_response(docs[:rows], len(docs), start)
+
+    @staticmethod
+    def create_response(docs, num_found, start):
+        return {"responseHeader": {"status": 0, "QTime": int((time.perf_counter() - start) * 1000)},
+                "response": {"numFound": num_found, "start": 0, "docs": docs}}
+
+    @staticmethod
+    def select_fields(doc, response_fields, score):
+        selected = {name: value for name, value in doc.items() if is_response_field(response_fields, name)}
+        if "score" in response_fields:
+            selected["score"] = score
+        return selected
+
+    @staticmethod
+    def highlight(doc, highlight_fields, clauses):
+        """
+        Highlights the matching values like the Solr highlighter with a single snippet per field.
+        """
+        prefixes = [clause.lower() for clause in clauses]
+        tokens = set(token for clause in clauses for token in tokenize(clause))
+        highlighting = dict()
+        for field in highlight_fields:
+            if field.endswith(EDGE_FIELD_SUFFIX):
+                snippets = [HIGHLIGHT_PRE + str(value) + HIGHLIGHT_POST
+                            for value in get_values(doc, field[:-len(EDGE_FIELD_SUFFIX)])
+                            if any(str(value).lower().startswith(prefix) for prefix in prefixes)]
+            else:
+                snippets = list()
+                for value in get_values(doc, field):
+                    snippet = token_pattern.sub(lambda m: HIGHLIGHT_PRE + m.group(0) + HIGHLIGHT_POST
+                                                if m.group(0).lower() in tokens else m.group(0), str(value))
+                    if snippet != str(value):
+                        snippets.append(snippet)
+            if snippets:
+                highlighting[field] = snippets[:1]
+        return highlighting
+
+
+search_backend = backend_config.get("search_backend", SOLR_BACKEND).strip().lower()
+if search_backend not in SEARCH_BACKENDS:
+    raise ValueError("Unsupported search backend '{}', should be one of {}.".format(search_backend, SEARCH_BACKENDS))
+
+embedded_index = None
+embedded_index_lock = threading.Lock()
+
+
+def get_search_backend():
+    return search_backend
+
+
+def get_embedded_index():
+    """
+    Loads the dump file configured in the 'Backend' section on first use.
+    """
+    global embedded_index
+    if embedded_index is None:
+        with embedded_index_lock:
+            if embedded_index is None:
+                dump_path = backend_config.get("dump_path", "").strip()
+                if not dump_path:
+                    raise ValueError("Embedded search backend requires a dump_path (EMBEDDED_DUMP_PATH).")
+                index = EmbeddedIndex.from_dump(dump_path)
+                index.warm([get_profile(profile) for profile in PROFILES])
+                embedded_index = index
+    return embedded_index
@@ -0,0 +1,204 @@
+"""
+Solr request templates compiled from the search_config.ini profiles. List valued configurations are parsed, the domain
+boosting iris are escaped and the static part of the request url is built once per profile, so that requests only
+merge in their query, filters and row count. Templates are recompiled when the configuration file changes.
+
+Parsed profiles are kept along with the templates for the embedded search backend, which doesn't use request urls.
+"""
+
+import os
+import ast
+import time
+import logging
+import threading
+from collections import namedtuple
+from bds_api.endpoints import search_config as search_config_module
+
+log = logging.getLogger(__name__)
+
+SEARCH_PROFILE = "Search"
+AUTOCOMPLETE_PROFILE = "Autocomplete"
+PROFILES = [SEARCH_PROFILE, AUTOCOMPLETE_PROFILE]
+
+# seconds between two configuration file modification checks, used when the configuration doesn't specify it
+DEFAULT_RELOAD_INTERVAL = 5
+
+solr_escape_rules = {'+':r'\+','-':r'\-','&':r'\&','|':r'\|','!':r'\!','(':r'\(',')':r'\)','{':r'\{','}':r'\}',
+                     '[':r'\[',']':r'\]','~':r'\~','*':r'\*','?':r'\?',':':r'\:','"':r'\"',';':r'\;','/':r'\/'}
+
+
+def escaped_seq(term):
+    """
+    Yield the next string based on the next character (either this char or escaped version)
+    """
+    for char in term:
+        if char in solr_escape_rules.keys():
+            yield solr_escape_rules[char]
+        else:
+            yield char
+
+
+def escape_solr_arg(term):
+    """
+    Apply escaping to the passed in query terms escaping special characters like : , etc
+    """
+    term = term.replace('\\', r'\\')  # escape \ first
+    return "".join([nextStr for nextStr in escaped_seq(term)])
+
+
+def get_list_value(config, name):
+    """
+    Reads list type configuration. By default all configuration values are string, this function parses value to list.
+    """
+    parsed = ast.literal_eval(config[name])
+    return [item.strip() for item in parsed]
+
+
+class RequestTemplate(namedtuple("RequestTemplate", ["collection_url", "search_url", "static_params",
+                                                     "result_limit"])):
+    """
+    Immutable compiled Solr request of a configuration profile.
+    """
+
+    __slots__ = ()
+
+    def render(self, query, filters=(), rows=None):
+        """
+        :param query: edismax query string
+        :param filters: filter queries (fq) of the request
+        :param rows: max number of results. Defaults to the result_limit of the profile.
+        :return: Solr request url
+        """
+        request_url = self.search_url + "&q=(" + query + ")" + self.static_params
+        for filter_query in filters:
+            request_url += "&fq=" + filter_query
+        return request_url + "&rows=" + (str(rows) if rows else self.result_limit)
+
+
+class SearchProfile(namedtuple("SearchProfile", ["response_fields", "field_weights", "domain_boosting",
+                                                 "highlight_fields", "result_limit"])):
+    """
+    Immutable parsed configuration profile. Weights are (name, boost) tuples.
+    """
+
+    __slots__ = ()
+
+
+def parse_boost(value):
+    """
+    Splits a 'name^boost' configuration value. Boost is 1.0 if not specified.
+    """
+    name, separator, boost = value.rpartition("^")
+    if not separator:
+        return value, 1.0
+    return name, float(boost)
+
+
+def compile_profile(config):
+    """
+    Parses a configuration section into a search profile.
+    """
+    return SearchProfile(tuple(get_list_value(config, "response_fields")),
+                         tuple(parse_boost(field) for field in get_list_value(config, "field_weights")),
+                         tuple(parse_boost(iri) for iri in get_list_value(config, "domain_boosting")),
+                         tuple(get_list_value(config, "highlight_fields")),
+                         int(config["result_limit"]))
+
+
+def get_collection_url(config):
+    return "http://{host}:{port}/solr/{collection}/query".format(host=config["solr_host"], port=config["solr_port"],
+                                                                  collection=config["solr_collection"])
+
+
+def compile_template(config):
+    """
+    Compiles a configuration section into a request template.
+    """
+    collection_url = get_collection_url(config)
+    static_params = "&fl=" + ",".join(get_list_value(config, "response_fields"))
+    static_params += "&qf=" + " ".join(get_list_value(config, "field_weights")) + " "
+    for domain_boosting in get_list_value(config, "domain_boosting"):
+        static_params += "&bq=iri:" + escape_solr_arg(domain_boosting)
+    static_params += "&hl=true"
+    static_params += "&hl.simple.pre=<b>"
+    static_params += "&hl.simple.post=</b>"
+    static_params += "&hl.fl=" + ",".join(get_list_value(config, "highlight_fields"))
+    return RequestTemplate(collection_url, collection_url + "?defType=edismax", static_params,
+                           config["result_limit"].strip())
+
+
+class TemplateRegistry(object):
+    """
+    Compiled request templates of all profiles. The configuration file modification time is checked at most once per
+    reload interval and the templates are recompiled when it changes.
+    """
+
+    def __init__(self, config_path=None):
+        self.config_path = config_path or search_config_module.SEARCH_CONF_PATH
+        self.lock = threading.Lock()
+        self.templates = dict()
+        self.profiles = dict()
+        self.reload_interval = DEFAULT_RELOAD_INTERVAL
+        self.config_mtime = None
+        self.next_check = 0
+        self.reload()
+
+    def get_mtime(self):
+        try:
+            return os.stat(self.config_path).st_mtime
+        except OSError:
+            return None
+
+    def reload(self):
+        """
+        Recompiles the templates from the configuration file. Templates are replaced at once, so concurrent requests
+        see either the old or the new templates.
+        """
+        with self.lock:
+            mtime = self.get_mtime()
+            conf = search_config_module.get_config(self.config_path)
+            templates = {profile: compile_template(conf[profile]) for profile in PROFILES}
+            self.profiles = {profile: compile_profile(conf[profile]) for profile in PROFILES}
+            self.templates = templates
+            self.reload_interval = conf["DEFAULT"].getfloat("config_reload_interval", DEFAULT_RELOAD_INTERVAL)
+            self.config_mtime = mtime
+            self.next_check = time.monotonic() + self.reload_interval
+        log.info("Compiled Solr request templates from " + self.config_path)
+
+    def check_reload(self):
+        if self.reload_interval <= 0 or time.monotonic() < self.next_check:
+            return
+        self.next_check = time.monotonic() + self.reload_interval
+        if self.get_mtime() != self.config_mtime:
+            try:
+                self.reload()
+            except Exception:
+                # keep serving with the last valid templates
+                log.exception("Solr request templates couldn't be reloaded from " + self.config_path)
+
+    def get_template(self, profile):
+        self.check_reload()
+        return self.templates[profile]
+
+    def get_profile(self, profile):
+        self.check_reload()
+        return self.profiles[profile]
+
+
+templates = TemplateRegistry()
+
+
+def get_template(profile):
+    """
+    :param profile: configuration section name, one of the PROFILES
+    :return: compiled request template of the profile
+    """
+    return templates.get_template(profile)
+
+
+def get_profile(profile):
+    """
+    :param profile: configuration section name, one of the PROFILES
+    :return: parsed search profile
+    """
+    return templates.get_profile(profile)
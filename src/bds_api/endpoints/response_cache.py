@@ -0,0 +1,130 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from bds_api.endpoints.search_config import response_cache_config
+from bds_api.endpoints.request_templates import get_template, SEARCH_PROFILE
+from bds_api.endpoints.solr_client import get_solr_client
+
+log = logging.getLogger(__name__)
+
+
+class ResponseCache(object):
+    """
+    In-process, size bounded LRU cache of the Solr responses. Entries expire after the TTL, and the whole cache is
+    invalidated when the version of the ontology in the Solr collection changes.
+    """
+
+    def __init__(self, max_size=10000, ttl=300, version_check_interval=60, version_provider=None, enabled=True):
+        """
+        :param max_size: max number of cached responses
+        :param ttl: seconds a response is served from the cache
+        :param version_check_interval: seconds between two ontology version checks
+        :param version_provider: function that returns the version of the ontology in the Solr collection
+        :param enabled: if False, nothing is cached
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self.version_provider = version_provider
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.version = None
+        self.next_version_check = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_config(cls, config, version_provider=None):
+        """
+        Creates a cache from the search_config.ini 'Cache' section.
+        """
+        return cls(max_size=config.getint("max_size", fallback=10000),
+                   ttl=config.getfloat("ttl", fallback=300),
+                   version_check_interval=config.getfloat("version_check_interval", fallback=60),
+                   version_provider=version_provider,
+                   enabled=config.getboolean("enabled", fallback=True))
+
+    def check_version(self):
+        """
+        Clears the cache if the ontology version changed. Version is checked at most once per check interval, by a
+        single request thread.
+        """
+        if self.version_provider is None:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if now < self.next_version_check:
+                return
+            self.next_version_check = now + self.version_check_interval
+        try:
+            version = self.version_provider()
+        except Exception as e:
+            # keep serving the cached responses while Solr is not available
+            log.warning("Ontology version couldn't be checked: " + str(e))
+            return
+        with self.lock:
+            if version != self.version:
+                if self.version is not None:
+                    log.info("Ontology version changed from {} to {}, clearing the response cache."
+                             .format(self.version, version))
+                    self.invalidations += 1
+                    self.entries.clear()
+                self.version = version
+
+    def get(self, key):
+        """
+        :return: cached response or None
+        """
+        if not self.enabled:
+            return None
+        self.check_version()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self.entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses,
+                    "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                    "invalidations": self.invalidations, "ontology_version": self.version}
+
+
+def get_ontology_version():
+    """
+    Reads the version of the ontology document of the Solr collection.
+    """
+    request_url = get_template(SEARCH_PROFILE).collection_url + "?q=id:\"ontology\"&fl=version"
+    docs = get_solr_client().get(request_url).json()["response"]["docs"]
+    return docs[0].get("version") if docs else None
+
+
+response_cache = ResponseCache.from_config(response_cache_config, get_ontology_version)
+
+
+def get_response_cache():
+    return response_cache
@@ -4,24 +4,38 @@ import configparser
 SEARCH_CONF_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../config/search_config.ini")
 
 
-def get_config():
+def get_config(config_path=SEARCH_CONF_PATH):
     conf = configparser.ConfigParser()
-    conf.read(SEARCH_CONF_PATH)
+    conf.read(config_path)
 
     if "SOLR_HOST" in os.environ:
         conf['Search']["solr_host"] = os.getenv('SOLR_HOST', conf['Search']["solr_host"])
         conf['Autocomplete']["solr_host"] = os.getenv('SOLR_HOST', conf['Autocomplete']["solr_host"])
+        conf['Indexer']["solr_host"] = os.environ['SOLR_HOST']
 
     if "SOLR_PORT" in os.environ:
         conf['Search']["solr_port"] = os.environ['SOLR_PORT']
         conf['Autocomplete']["solr_port"] = os.environ['SOLR_PORT']
+        conf['Indexer']["solr_port"] = os.environ['SOLR_PORT']
 
     if "SOLR_COLLECTION" in os.environ:
         conf['Search']["solr_collection"] = os.environ['SOLR_COLLECTION']
         conf['Autocomplete']["solr_collection"] = os.environ['SOLR_COLLECTION']
+        conf['Indexer']["solr_collection"] = os.environ['SOLR_COLLECTION']
+
+    if "SEARCH_BACKEND" in os.environ:
+        conf['Backend']["search_backend"] = os.environ['SEARCH_BACKEND']
+
+    if "EMBEDDED_DUMP_PATH" in os.environ:
+        conf['Backend']["dump_path"] = os.environ['EMBEDDED_DUMP_PATH']
 
     return conf
 
 
 search_config = get_config()['Search']
 autocomplete_config = get_config()['Autocomplete']
+indexer_config = get_config()['Indexer']
+solr_client_config = get_config()['SolrClient']
+response_cache_config = get_config()['Cache']
+batch_config = get_config()['Batch']
+backend_config = get_config()['Backend']
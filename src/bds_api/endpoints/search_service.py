@@ -1,11 +1,20 @@
+import os
+import json
 import flask
-import requests
-import ast
 import logging
+import threading
+from http import HTTPStatus
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from flask import request
-from flask_restx import Resource
+from flask_restx import Resource, fields
 from bds_api.restplus import api
-from bds_api.endpoints.search_config import search_config, autocomplete_config
+from bds_api.endpoints.request_templates import get_template, get_profile, escape_solr_arg, SEARCH_PROFILE, \
+    AUTOCOMPLETE_PROFILE
+from bds_api.endpoints.search_config import search_config, batch_config
+from bds_api.endpoints.solr_client import get_solr_client, SolrResponse, JSON_CONTENT_TYPE
+from bds_api.endpoints.response_cache import get_response_cache
+from bds_api.endpoints.embedded_search import get_search_backend, get_embedded_index, EMBEDDED_BACKEND
 from bds_api.exception.api_exception import BDSApiException
 from bds_api.endpoints.parser import search_arguments, get_arguments
 from bds_api.utils.taxonomy_config_utils import species_mapping
@@ -14,11 +23,41 @@ ns = api.namespace('api', description='Brain Data Standards Ontologies API')
 
 log = logging.getLogger(__name__)
 
-solr_escape_rules = {'+':r'\+','-':r'\-','&':r'\&','|':r'\|','!':r'\!','(':r'\(',')':r'\)','{':r'\{','}':r'\}',
-                     '[':r'\[',']':r'\]','~':r'\~','*':r'\*','?':r'\?',':':r'\:','"':r'\"',';':r'\;','/':r'\/'}
-
 ranks = ["Cell Type", "Subclass", "Class", "None"]
 
+# if true, Solr response bodies are returned without decoding and encoding them again
+response_passthrough = search_config.getboolean("response_passthrough", fallback=True)
+
+search_arguments_names = ["query", "species", "taxonomy", "rank", "limit"]
+max_batch_searches = batch_config.getint("max_searches", fallback=50)
+max_batch_concurrency = batch_config.getint("max_concurrency", fallback=8)
+max_get_identifiers = batch_config.getint("max_get_identifiers", fallback=100)
+
+batch_executor = None
+batch_executor_pid = None
+batch_executor_lock = threading.Lock()
+
+
+class SearchArguments(namedtuple("SearchArguments", ["query", "species", "taxonomy", "ranks", "rows"])):
+    """
+    Parsed search request arguments. Species are quoted NCBITaxon labels and taxonomy is the raw filter value.
+    """
+
+    __slots__ = ()
+
+
+search_spec_model = ns.model('SearchSpec', {
+    'query': fields.String(required=True, description='search terms'),
+    'species': fields.String(description='comma separated species'),
+    'taxonomy': fields.String(description='taxonomy identifier'),
+    'rank': fields.String(description='comma separated Cell Type ranks'),
+    'limit': fields.Integer(description='max query results limit')
+})
+
+batch_search_model = ns.model('BatchSearch', {
+    'searches': fields.List(fields.Nested(search_spec_model), required=True)
+})
+
 
 @ns.route('/search', methods=['GET'])
 class SearchEndpoint(Resource):
@@ -67,10 +106,40 @@ class SearchEndpoint(Resource):
         Return: list of related Solr documents
 
         """
-        request_url = generate_request(search_config)
-        log.info("Request: " + request_url)
-        solr_response = requests.get(request_url)
-        response = flask.jsonify(solr_response.json())
+        return create_response(execute_search(SEARCH_PROFILE, "search", parse_search_arguments()))
+
+
+@ns.route('/search/batch', methods=['POST'])
+class BatchSearchEndpoint(Resource):
+
+    @api.expect(batch_search_model)
+    def post(self):
+        """
+        Batch search service wrapper for Solr.
+
+        Runs multiple searches in a single request. Each search has the same 'query', 'species', 'taxonomy', 'rank'
+        and 'limit' parameters as the search service. Searches are sent to Solr concurrently, max number of searches
+        per request is configured in the [configuration](https://github.com/obophenotype/brain_data_standards_queries/blob/main/src/config/search_config.ini) file.
+
+        ```
+        {"searches": [{"query": "L5/6 NP", "species": "mouse"}, {"query": "Lamp5 Lhx6", "rank": "Cell Type", "limit": 10}]}
+        ```
+
+        Return: list of the search results in the order of the searches. Results of the successful searches have the
+        Solr response as 'result', failed searches have the error 'message' and its 'status' code.
+
+        ```
+        {"results": [{"status": 200, "result": {"response": {...}}}, {"status": 400, "message": "Error: unrecognised rank: 'Type'"}]}
+        ```
+        """
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get("searches"), list) or not body["searches"]:
+            raise BDSApiException("Error: request body should have a non-empty 'searches' list.")
+        if len(body["searches"]) > max_batch_searches:
+            raise BDSApiException("Error: max {} searches are allowed in a batch search.".format(max_batch_searches))
+
+        log.info("Request: batch of {} searches.".format(len(body["searches"])))
+        response = flask.Response(run_batch_search(body["searches"]), content_type=JSON_CONTENT_TYPE)
         add_cors_headers(response)
         return response
 
@@ -122,12 +191,7 @@ class AutocompleteEndpoint(Resource):
         Return: list of related Solr documents
 
         """
-        request_url = generate_request(autocomplete_config)
-        log.info("Request: " + request_url)
-        solr_response = requests.get(request_url)
-        response = flask.jsonify(solr_response.json())
-        add_cors_headers(response)
-        return response
+        return create_response(execute_search(AUTOCOMPLETE_PROFILE, "autocomplete", parse_search_arguments()))
 
 
 @ns.route('/taxonomies', methods=['GET'])
@@ -139,16 +203,14 @@ class TaxonomiesEndpoint(Resource):
 
         Returns the metadata of all registered taxonomies.
         """
-        request_url = "http://{host}:{port}/solr/{collection}/query?q=type:\"taxonomy\""\
-            .format(host=search_config["solr_host"], port=search_config["solr_port"],
-                    collection=search_config["solr_collection"])
-        request_url += "&rows=" + search_config["result_limit"].strip()
-
+        template = get_template(SEARCH_PROFILE)
         log.info("Request: Listing all taxonomies.")
-        solr_response = requests.get(request_url)
-        response = flask.jsonify(solr_response.json())
-        add_cors_headers(response)
-        return response
+        if get_search_backend() == EMBEDDED_BACKEND:
+            return create_response(encode_data(get_embedded_index().list_taxonomies(int(template.result_limit))))
+
+        request_url = template.collection_url + "?q=type:\"taxonomy\""
+        request_url += "&rows=" + template.result_limit
+        return query_solr("taxonomies", request_url)
 
 
 @ns.route('/get', methods=['GET'])
@@ -159,7 +221,7 @@ class GetEndpoint(Resource):
         """
         Direct document access.
 
-        Returns a single document specified by the given identifier.
+        Returns the documents specified by the given identifiers.
 
         * identifier (mandatory): Document identifier. Identifier can be 'id' or 'curie' or 'accession_id' of the solr document.
 
@@ -168,30 +230,252 @@ class GetEndpoint(Resource):
         ?identifier="PCL:0011189"
         ?identifier=CS202002013_189
         ```
+
+        Multiple identifiers can be given by repeating the parameter or as a comma separated list. Identifier types can be mixed.
+
+        ```
+        ?identifier="PCL:0011189"&identifier=CS202002013_190
+        ?identifier="PCL:0011189",CS202002013_190,"http://purl.obolibrary.org/obo/PCL_0011191"
+        ```
+
+        Return: Solr response of a single identifier. For multiple identifiers, 'docs' map of the identifiers to
+        their documents and 'missing' list of the identifiers that are not found.
         """
-        if 'identifier' in request.args and request.args['identifier']:
-            identifier = str(request.args['identifier']).replace("\"", "").strip()
-        else:
+        identifiers = parse_identifiers()
+        if not identifiers:
             raise BDSApiException("Error: identifier string is empty. Please specify an identifier.")
+        if len(identifiers) > max_get_identifiers:
+            raise BDSApiException("Error: max {} identifiers are allowed.".format(max_get_identifiers))
 
-        if identifier.startswith("http:"):
-            search_field = "id"
-        elif ":" in identifier:
-            search_field = "curie"
-        else:
-            search_field = "accession_id"
+        template = get_template(SEARCH_PROFILE)
+        transform = None if len(identifiers) == 1 else lambda data: map_identifiers(identifiers, data)
+        rows = max(int(template.result_limit), len(identifiers))
+        if get_search_backend() == EMBEDDED_BACKEND:
+            log.info("Request: identifiers " + ", ".join(identifiers))
+            data = get_embedded_index().find([(get_identifier_field(identifier), identifier)
+                                              for identifier in identifiers], rows)
+            return create_response(encode_data(data), transform)
 
-        request_url = "http://{host}:{port}/solr/{collection}/query?q="\
-            .format(host=search_config["solr_host"], port=search_config["solr_port"],
-                    collection=search_config["solr_collection"])
-        request_url += search_field + ":\"" + identifier + "\""
-        request_url += "&rows=" + search_config["result_limit"].strip()
+        request_url = template.collection_url + "?q=" + create_identifiers_query(identifiers)
+        request_url += "&rows=" + str(rows)
 
         log.info("Request: " + request_url)
-        solr_response = requests.get(request_url)
-        response = flask.jsonify(solr_response.json())
-        add_cors_headers(response)
-        return response
+        return query_solr("get", request_url, transform)
+
+
+def query_solr(endpoint, request_url, transform=None):
+    """
+    Sends the request to Solr unless its response is in the response cache. Solr response body is returned as is,
+    without decoding, unless a transform is given or the passthrough is disabled in the configuration.
+    :param endpoint: name of the endpoint, part of the cache key
+    :param request_url: Solr request url. Urls are built from normalised arguments, so equivalent requests share the
+    same url.
+    :param transform: optional function that transforms the decoded Solr response to the endpoint response
+    """
+    return create_response(fetch_solr(endpoint, request_url), transform)
+
+
+def create_response(solr_response, transform=None):
+    """
+    Creates the endpoint response of an undecoded Solr response.
+    :param solr_response: SolrResponse
+    :param transform: optional function that transforms the decoded Solr response to the endpoint response. Only
+    applied to the successful responses, Solr errors are raised with their status code.
+    """
+    if transform is None and response_passthrough:
+        response = flask.Response(solr_response.content, status=solr_response.status_code,
+                                  content_type=solr_response.content_type)
+    else:
+        if not HTTPStatus.OK <= solr_response.status_code < HTTPStatus.MULTIPLE_CHOICES:
+            raise BDSApiException(get_solr_error_message(solr_response), solr_response.status_code)
+        data = json.loads(solr_response.content)
+        response = flask.jsonify(transform(data) if transform else data)
+        response.status_code = solr_response.status_code
+    add_cors_headers(response)
+    return response
+
+
+def parse_identifiers():
+    """
+    Lists the unique identifiers of the repeated and comma separated 'identifier' parameters, in the request order.
+    """
+    identifiers = list()
+    for identifier_arg in request.args.getlist('identifier'):
+        for identifier in str(identifier_arg).split(","):
+            identifier = identifier.replace("\"", "").strip()
+            if identifier and identifier not in identifiers:
+                identifiers.append(identifier)
+    return identifiers
+
+
+def get_identifier_field(identifier):
+    """
+    Solr document field of the given identifier: 'id' for IRIs, 'curie' for CURIEs and 'accession_id' otherwise.
+    """
+    if identifier.startswith("http:"):
+        return "id"
+    elif ":" in identifier:
+        return "curie"
+    else:
+        return "accession_id"
+
+
+def create_identifiers_query(identifiers):
+    """
+    Groups the identifiers by their field into a single query. Identifiers are sorted, so the same set of identifiers
+    generates the same query.
+    """
+    field_identifiers = dict()
+    for identifier in identifiers:
+        field_identifiers.setdefault(get_identifier_field(identifier), set()).add(identifier)
+    return " OR ".join(field + ":(" + " OR ".join("\"" + escape_solr_arg(identifier) + "\""
+                                                  for identifier in sorted(values)) + ")"
+                       for field, values in sorted(field_identifiers.items()))
+
+
+def map_identifiers(identifiers, data):
+    """
+    Maps the requested identifiers to their documents in the Solr response.
+    :return: 'docs' map of the identifiers to their documents and 'missing' list of the identifiers without documents
+    """
+    requested = {(get_identifier_field(identifier), identifier): identifier for identifier in identifiers}
+    docs = dict()
+    for doc in data["response"]["docs"]:
+        for field in ["id", "curie", "accession_id"]:
+            values = doc.get(field, [])
+            for value in values if isinstance(values, list) else [values]:
+                identifier = requested.get((field, value))
+                if identifier is not None and identifier not in docs:
+                    docs[identifier] = doc
+    return {"docs": docs, "missing": [identifier for identifier in identifiers if identifier not in docs]}
+
+
+def execute_search(profile, endpoint, search_args):
+    """
+    Runs the search on the configured search backend.
+    :param profile: configuration profile of the search, one of the PROFILES
+    :param endpoint: name of the endpoint, part of the cache key
+    :param search_args: SearchArguments
+    :return: SolrResponse
+    """
+    if get_search_backend() == EMBEDDED_BACKEND:
+        log.info("Request: {} {}".format(endpoint, search_args))
+        data = get_embedded_index().search(get_profile(profile), search_args.query,
+                                           species=[species.strip("\"") for species in search_args.species],
+                                           taxonomies=parse_taxonomy_filter(search_args.taxonomy),
+                                           ranks=search_args.ranks, rows=search_args.rows)
+        return encode_data(data)
+
+    request_url = render_request(get_template(profile), search_args)
+    log.info("Request: " + request_url)
+    return fetch_solr(endpoint, request_url)
+
+
+def encode_data(data):
+    """
+    Encodes the response of the embedded search backend like a Solr response.
+    """
+    return SolrResponse(json.dumps(data).encode("utf-8"), HTTPStatus.OK.value, JSON_CONTENT_TYPE)
+
+
+def fetch_solr(endpoint, request_url):
+    """
+    Returns the undecoded Solr response of the request from the response cache, or from Solr on a cache miss.
+    Successful responses are cached.
+    :return: SolrResponse
+    """
+    cache = get_response_cache()
+    key = (endpoint, request_url)
+    solr_response = cache.get(key)
+    if solr_response is None:
+        response = get_solr_client().get(request_url)
+        solr_response = SolrResponse(response.content, response.status_code, response.headers.get("Content-Type"))
+        if response.ok:
+            cache.put(key, solr_response)
+    return solr_response
+
+
+def get_batch_executor():
+    """
+    Thread pool of the batch search Solr requests. Threads are not inherited by the forked worker processes, so each
+    process creates its own pool.
+    """
+    global batch_executor, batch_executor_pid
+    with batch_executor_lock:
+        if batch_executor is None or batch_executor_pid != os.getpid():
+            batch_executor = ThreadPoolExecutor(max_workers=max_batch_concurrency,
+                                                thread_name_prefix="batch_search")
+            batch_executor_pid = os.getpid()
+        return batch_executor
+
+
+def run_batch_search(searches):
+    """
+    Sends the searches to Solr concurrently and merges their undecoded responses into the batch response body.
+    :param searches: list of search parameter dicts
+    :return: batch response body
+    """
+    executor = get_batch_executor()
+    items = list()
+    for search in searches:
+        try:
+            search_args = parse_search_arguments(parse_search_spec(search))
+            items.append(executor.submit(execute_search, SEARCH_PROFILE, "search", search_args))
+        except (BDSApiException, ValueError) as e:
+            items.append(e)
+
+    results = list()
+    for item in items:
+        if isinstance(item, Exception):
+            results.append(encode_batch_error(item))
+            continue
+        try:
+            solr_response = item.result()
+        except Exception as e:
+            results.append(encode_batch_error(e))
+            continue
+        if solr_response.status_code == HTTPStatus.OK:
+            results.append(b'{"status":200,"result":' + solr_response.content + b'}')
+        else:
+            results.append(encode_batch_error(
+                BDSApiException(get_solr_error_message(solr_response), solr_response.status_code)))
+    return b'{"results":[' + b','.join(results) + b']}'
+
+
+def parse_search_spec(search):
+    """
+    Validates a search of the batch search and converts its values to request argument strings.
+    """
+    if not isinstance(search, dict):
+        raise BDSApiException("Error: search should be an object of search parameters.")
+    unknown = [name for name in search if name not in search_arguments_names]
+    if unknown:
+        raise BDSApiException("Error: unrecognised search parameters: " + ", ".join(sorted(unknown)))
+
+    args = dict()
+    for name, value in search.items():
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (str, int)):
+            raise BDSApiException("Error: search parameter '" + name + "' should be a string.")
+        args[name] = str(value)
+    return args
+
+
+def encode_batch_error(error):
+    if isinstance(error, BDSApiException):
+        status_code, message = int(error.status_code), error.message
+    else:
+        log.exception("Batch search failed.", exc_info=error)
+        status_code, message = HTTPStatus.INTERNAL_SERVER_ERROR.value, "An unhandled exception occurred."
+    return json.dumps({"status": status_code, "message": message}).encode("utf-8")
+
+
+def get_solr_error_message(solr_response):
+    try:
+        return "Error: " + json.loads(solr_response.content)["error"]["msg"]
+    except (ValueError, KeyError, TypeError):
+        return "Error: Solr request failed."
 
 
 def add_cors_headers(response):
@@ -202,42 +486,67 @@ def add_cors_headers(response):
     headers['Access-Control-Allow-Origin'] = '*'
 
 
-def generate_request(config):
-    if 'query' in request.args and request.args['query']:
-        query = request.args['query']
+def generate_request(template, args=None):
+    """
+    Merges the query, filters and limit of the request into the compiled request template of the endpoint.
+    :param template: compiled request template of the endpoint
+    :param args: search arguments, arguments of the current request if not given
+    """
+    return render_request(template, parse_search_arguments(args))
+
+
+def parse_search_arguments(args=None):
+    """
+    Parses and validates the search arguments.
+    :param args: search arguments, arguments of the current request if not given
+    :return: SearchArguments
+    """
+    if args is None:
+        args = request.args
+    if 'query' in args and args['query'].strip():
+        query = args['query'].strip()
     else:
         raise BDSApiException("Error: query string is empty. Please specify a search term.")
-    request_url = "http://{host}:{port}/solr/{collection}/query?defType=edismax".format(host=config["solr_host"],
-                                                                                       port=config["solr_port"],
-                                                                                       collection=config[
-                                                                                           "solr_collection"])
-    request_url += "&q=(" + create_intersection_string(query) + ")"
-    request_url += "&fl=" + ",".join(get_list_value(config, "response_fields"))
-    request_url += "&qf=" + " ".join(get_list_value(config, "field_weights")) + " "
-    for domain_boosting in get_list_value(config, "domain_boosting"):
-        request_url += "&bq=iri:" + escape_solr_arg(domain_boosting)
-    request_url += "&hl=true"
-    request_url += "&hl.simple.pre=<b>"
-    request_url += "&hl.simple.post=</b>"
-    request_url += "&hl.fl=" + ",".join(get_list_value(config, "highlight_fields"))
-
-    if 'species' in request.args and request.args['species']:
-        request_url += "&fq=species: (" + " OR ".join(list(parse_species_filter())) + ")"
-    if 'taxonomy' in request.args and request.args['taxonomy']:
-        request_url += "&fq=taxonomy_id:" + request.args['taxonomy']
-    if 'rank' in request.args and request.args['rank']:
-        request_url += "&fq=rank: (" + " OR ".join(list(parse_rank_filter())) + ")"
-    if 'limit' in request.args and request.args['limit']:
-        request_url += "&rows=" + request.args['limit']
-    else:
-        request_url += "&rows=" + config["result_limit"].strip()
 
-    print(request_url)
-    return request_url
+    species = sorted(parse_species_filter(args['species'])) if 'species' in args and args['species'] else []
+    taxonomy = args['taxonomy'].strip() if 'taxonomy' in args and args['taxonomy'] else None
+    ranks = sorted(parse_rank_filter(args['rank'])) if 'rank' in args and args['rank'] else []
+    rows = None
+    if 'limit' in args and args['limit']:
+        # reqparse types are not enforced by api.expect
+        try:
+            rows = int(args['limit'])
+        except ValueError:
+            raise BDSApiException("Error: search parameter 'limit' should be an integer.", HTTPStatus.BAD_REQUEST)
+    return SearchArguments(query, species, taxonomy, ranks, rows)
+
+
+def render_request(template, search_args):
+    """
+    Renders the Solr request url of the search.
+    """
+    filters = list()
+    if search_args.species:
+        filters.append("species: (" + " OR ".join(search_args.species) + ")")
+    if search_args.taxonomy:
+        filters.append("taxonomy_id:" + search_args.taxonomy)
+    if search_args.ranks:
+        filters.append("rank: (" + " OR ".join(search_args.ranks) + ")")
+
+    return template.render(create_intersection_string(search_args.query), filters, search_args.rows)
+
+
+def parse_taxonomy_filter(taxonomy_arg):
+    """
+    Lists the taxonomy ids of a taxonomy filter like 'CCN202002013' or '(CCN202002013 OR CCN201912131)'.
+    """
+    if not taxonomy_arg:
+        return []
+    return [taxonomy.strip() for taxonomy in taxonomy_arg.strip("()").split(" OR ") if taxonomy.strip()]
 
 
-def parse_rank_filter():
-    rank_list = request.args['rank'].split(",")
+def parse_rank_filter(rank_arg):
+    rank_list = rank_arg.split(",")
     rank_decode = set()
     for rank in rank_list:
         if rank.strip().lower() not in (term.lower() for term in ranks):
@@ -249,12 +558,12 @@ def parse_rank_filter():
     return rank_decode
 
 
-def parse_species_filter():
+def parse_species_filter(species_arg):
     """
     Parses species filter parameters and generates list of NCBITaxon IDs. Species can be specified by their simple
     name or by their NCBITaxon ID. When more than one species are provided, results that meet any of the species (OR the given species) are returned.
     """
-    species_list = request.args['species'].split(",")
+    species_list = species_arg.split(",")
     species_decode = set()
     for species in species_list:
         species_lower = str(species).strip().lower()
@@ -269,35 +578,8 @@ def parse_species_filter():
     return species_decode
 
 
-def escaped_seq(term):
-    """
-    Yield the next string based on the next character (either this char or escaped version)
-    """
-    for char in term:
-        if char in solr_escape_rules.keys():
-            yield solr_escape_rules[char]
-        else:
-            yield char
-
-
-def escape_solr_arg(term):
-    """
-    Apply escaping to the passed in query terms escaping special characters like : , etc
-    """
-    term = term.replace('\\', r'\\')  # escape \ first
-    return "".join([nextStr for nextStr in escaped_seq(term)])
-
-
 def create_intersection_string(query):
     tokens = query.split(" ")
     if len(tokens) > 1:
         tokens.append(" ")
     return " AND ".join(tokens)
-
-
-def get_list_value(config, name):
-    """
-    Reads list type configuration. By default all configuration values are string, this function parses value to list.
-    """
-    parsed = ast.literal_eval(config[name])
-    return [item.strip() for item in parsed]
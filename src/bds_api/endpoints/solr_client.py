@@ -0,0 +1,100 @@
+import os
+import logging
+import threading
+import requests
+from http import HTTPStatus
+from collections import namedtuple
+from requests.adapters import HTTPAdapter
+from bds_api.endpoints.search_config import solr_client_config
+from bds_api.exception.api_exception import BDSApiException
+
+log = logging.getLogger(__name__)
+
+JSON_CONTENT_TYPE = "application/json"
+
+
+class SolrResponse(namedtuple("SolrResponse", ["content", "status_code", "content_type"])):
+    """
+    Undecoded Solr response body, status code and JSON content type.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, content, status_code, content_type=None):
+        if not content_type or "json" not in content_type:
+            content_type = JSON_CONTENT_TYPE
+        return super().__new__(cls, content, status_code, content_type)
+
+
+class SolrClient(object):
+    """
+    Shared HTTP client of the Solr requests. Connections are kept alive in a sized pool and reused by all requests of
+    the process. Requests that time out or can't connect fail with a BDSApiException instead of blocking the worker.
+    """
+
+    def __init__(self, pool_size=20, connect_timeout=3, read_timeout=30, pool_block=False):
+        """
+        :param pool_size: max number of kept alive connections to Solr
+        :param connect_timeout: seconds to wait for the connection to Solr
+        :param read_timeout: seconds to wait for the Solr response
+        :param pool_block: if True, requests wait for a free pooled connection instead of opening an extra one
+        """
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_block = pool_block
+        self.lock = threading.Lock()
+        self.session = None
+        self.pid = None
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Creates a client from the search_config.ini 'SolrClient' section.
+        """
+        return cls(pool_size=config.getint("pool_size", fallback=20),
+                   connect_timeout=config.getfloat("connect_timeout", fallback=3),
+                   read_timeout=config.getfloat("read_timeout", fallback=30),
+                   pool_block=config.getboolean("pool_block", fallback=False))
+
+    def get_session(self):
+        """
+        Session of the current process. Pooled connections are not shared with forked worker processes.
+        """
+        if self.session is None or self.pid != os.getpid():
+            with self.lock:
+                if self.session is None or self.pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                                          pool_block=self.pool_block)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self.session = session
+                    self.pid = os.getpid()
+        return self.session
+
+    def get(self, url):
+        """
+        Sends a GET request to Solr.
+        :return: Solr response
+        """
+        try:
+            return self.get_session().get(url, timeout=self.timeout)
+        except requests.exceptions.Timeout:
+            log.warning("Solr request timed out: " + url)
+            raise BDSApiException("Error: Solr request timed out.", HTTPStatus.GATEWAY_TIMEOUT)
+        except requests.exceptions.ConnectionError:
+            log.warning("Solr connection failed: " + url)
+            raise BDSApiException("Error: Solr is not available.", HTTPStatus.BAD_GATEWAY)
+
+    def close(self):
+        with self.lock:
+            if self.session is not None:
+                self.session.close()
+            self.session = None
+
+
+solr_client = SolrClient.from_config(solr_client_config)
+
+
+def get_solr_client():
+    return solr_client
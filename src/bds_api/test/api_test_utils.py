@@ -0,0 +1,76 @@
+"""
+Shared scaffolding of the endpoint tests: a test app serving the search service namespace and a fake Solr client.
+"""
+
+import json
+from unittest import mock
+from flask import Flask, Blueprint
+from flask_restx import Api
+from bds_api.endpoints.search_service import ns as api_namespace
+from bds_api.endpoints.response_cache import ResponseCache
+from bds_api.endpoints import search_service
+from bds_api.exception.api_exception import BDSApiException
+from bds_api.restplus import handle_bad_request
+
+
+def create_test_app(blueprint_name):
+    """
+    Creates a Flask app with a separate api instance of the search service namespace, the shared api instance is
+    registered by the search service tests.
+    :param blueprint_name: unique name of the api blueprint
+    :return: Flask app
+    """
+    app = Flask(__name__)
+    blueprint = Blueprint(blueprint_name, __name__, url_prefix='/bds')
+    api = Api(blueprint)
+    api.add_namespace(api_namespace)
+    api.errorhandler(BDSApiException)(handle_bad_request)
+    app.register_blueprint(blueprint)
+    return app
+
+
+class StubResponse(object):
+    """
+    Solr response of the fake Solr client.
+    """
+
+    def __init__(self, data, status_code=200):
+        """
+        :param data: response json object, or the raw response content bytes
+        :param status_code: HTTP status code
+        """
+        self.content = data if isinstance(data, bytes) else json.dumps(data).encode("utf-8")
+        self.ok = status_code == 200
+        self.status_code = status_code
+        self.headers = {"Content-Type": "application/json;charset=utf-8"}
+
+
+class FakeSolrClientMixin(object):
+    """
+    TestCase mixin that replaces the Solr client of the search service by a fake one and the response cache by an
+    empty one. Tests can override create_solr_client and get_patches to customise the fakes.
+    """
+
+    def create_solr_client(self):
+        return mock.Mock()
+
+    def get_patches(self):
+        """
+        :return: additional patches of the test case, started and stopped with the Solr client patches
+        """
+        return []
+
+    def setUp(self):
+        super().setUp()
+        self.solr_client = self.create_solr_client()
+        self.response_cache = ResponseCache()
+        self.patches = [mock.patch.object(search_service, "get_response_cache", return_value=self.response_cache),
+                        mock.patch.object(search_service, "get_solr_client", return_value=self.solr_client)]
+        self.patches.extend(self.get_patches())
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        super().tearDown()
@@ -0,0 +1,119 @@
+import json
+import time
+import unittest
+import threading
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from bds_api.endpoints import search_service
+from bds_api.exception.api_exception import BDSApiException
+from bds_api.test.api_test_utils import create_test_app, StubResponse, FakeSolrClientMixin
+
+app = create_test_app('bds_batch')
+
+
+class StubSolrClient(object):
+    """
+    Returns the query of the request as the Solr response and records the max number of concurrent requests.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.urls = list()
+
+    def get(self, url):
+        with self.lock:
+            self.urls.append(url)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            query = url.split("&q=")[1].split("&")[0]
+            if "timeout" in query:
+                raise BDSApiException("Error: Solr request timed out.", 504)
+            if "syntax" in query:
+                return StubResponse({"error": {"msg": "org.apache.solr.search.SyntaxError", "code": 400}}, 400)
+            return StubResponse({"response": {"numFound": 0, "docs": [], "query": query}})
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class BatchSearchTest(FakeSolrClientMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.executor.shutdown()
+
+    def create_solr_client(self):
+        return StubSolrClient()
+
+    def get_patches(self):
+        return [mock.patch.object(search_service, "get_batch_executor", return_value=self.executor)]
+
+    def batch_search(self, body):
+        return self.app.post("/bds/api/search/batch", data=json.dumps(body), content_type="application/json")
+
+    def test_results_in_order(self):
+        self.solr_client.delay = 0.05
+        searches = [{"query": "Lamp5 " + str(i)} for i in range(6)]
+        response = self.batch_search({"searches": searches})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("*", response.headers["Access-Control-Allow-Origin"])
+
+        results = json.loads(response.get_data())["results"]
+        self.assertEqual(6, len(results))
+        for i, result in enumerate(results):
+            self.assertEqual(200, result["status"])
+            self.assertEqual("(Lamp5 AND " + str(i) + " AND  )", result["result"]["response"]["query"])
+        # fan-out is bounded by the executor
+        self.assertEqual(2, self.solr_client.max_active)
+
+    def test_same_arguments_as_search(self):
+        self.batch_search({"searches": [{"query": "L5/6 NP", "species": "mouse,human", "taxonomy": "CCN202002013",
+                                         "rank": "Class", "limit": 4}]})
+        with app.test_request_context("/?query=L5/6%20NP&species=mouse,human&taxonomy=CCN202002013&rank=Class"
+                                      "&limit=4"):
+            request_url = search_service.generate_request(search_service.get_template(search_service.SEARCH_PROFILE))
+        self.assertEqual([request_url], self.solr_client.urls)
+
+    def test_item_errors(self):
+        response = self.batch_search({"searches": [{"query": "Lamp5"},
+                                                   {"query": "Lamp5", "rank": "Type"},
+                                                   {"query": "Lamp5", "limit": "ten"},
+                                                   {"query": "Lamp5", "color": "red"},
+                                                   {"query": " "},
+                                                   "Lamp5",
+                                                   {"query": "timeout"},
+                                                   {"query": "syntax"}]})
+        self.assertEqual(200, response.status_code)
+        results = json.loads(response.get_data())["results"]
+        self.assertEqual([200, 400, 400, 400, 400, 400, 504, 400], [result["status"] for result in results])
+        self.assertEqual("Error: unrecognised rank: 'Type'", results[1]["message"])
+        self.assertEqual("Error: unrecognised search parameters: color", results[3]["message"])
+        self.assertEqual("Error: Solr request timed out.", results[6]["message"])
+        self.assertEqual("Error: org.apache.solr.search.SyntaxError", results[7]["message"])
+        self.assertEqual(3, len(self.solr_client.urls))
+
+    def test_invalid_batch(self):
+        for body in [{}, {"searches": []}, {"searches": "Lamp5"}, [{"query": "Lamp5"}]]:
+            response = self.batch_search(body)
+            self.assertEqual(400, response.status_code)
+
+        with mock.patch.object(search_service, "max_batch_searches", 2):
+            response = self.batch_search({"searches": [{"query": "Lamp5"}] * 3})
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("Error: max 2 searches are allowed in a batch search.",
+                         json.loads(response.get_data())["message"])
+        self.assertEqual(0, len(self.solr_client.urls))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import time
+import random
+import tempfile
+import unittest
+import configparser
+from unittest import mock
+from bds_api.dumps import bds_dumps, bds_queries
+from bds_api.dumps.bds_queries import IndividualDetailsBatchQuery, ListAllAllenIndividuals, ListAllTaxonomies, \
+    GetOntologyMetadata
+from bds_api.dumps.synthetic_data import SyntheticDataConfig, SyntheticDataGenerator
+
+
+class PublishSolrDumpTest(unittest.TestCase):
+
+    def setUp(self):
+        self.patches = {name: mock.patch.object(bds_dumps, name)
+                        for name in ["write_delta_dump", "update_solr", "update_solr_delta"]}
+        self.mocks = {name: patch.start() for name, patch in self.patches.items()}
+
+    def tearDown(self):
+        for patch in self.patches.values():
+            patch.stop()
+
+    def test_index_delta(self):
+        self.mocks["write_delta_dump"].return_value = "solr_delta.json"
+        bds_dumps.publish_solr_dump("solr.json", delta=True, index=True)
+        self.mocks["update_solr_delta"].assert_called_once_with("solr_delta.json")
+        self.mocks["update_solr"].assert_not_called()
+
+    def test_no_previous_dump(self):
+        self.mocks["write_delta_dump"].return_value = None
+        with self.assertLogs(bds_dumps.log, "INFO") as logs:
+            bds_dumps.publish_solr_dump("solr.json", delta=True, index=True)
+        # first run indexes the whole dump
+        self.mocks["update_solr"].assert_called_once_with("solr.json")
+        self.mocks["update_solr_delta"].assert_not_called()
+        self.assertIn("INFO:{}:No delta to index, indexing the whole dump: solr.json".format(bds_dumps.log.name),
+                      logs.output)
+
+    def test_delta_without_index(self):
+        self.mocks["write_delta_dump"].return_value = None
+        bds_dumps.publish_solr_dump("solr.json", delta=True)
+        self.mocks["update_solr"].assert_not_called()
+
+        bds_dumps.publish_solr_dump("solr.json", index=True)
+        self.mocks["write_delta_dump"].assert_called_once_with("solr.json")
+        self.mocks["update_solr"].assert_called_once_with("solr.json")
+
+
+
+class ExecuteQueriesTest(unittest.TestCase):
+    """
+    Concurrent (--workers) query runs against stubbed database responses.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.generator = SyntheticDataGenerator(SyntheticDataConfig(taxonomies=2, individuals_per_taxonomy=50))
+        self.details = dict(self.generator.iter_individual_results())
+        self.failing_accession = None
+        self.random = random.Random(1)
+
+        config = configparser.ConfigParser()
+        config.read_dict({"NEO4j": {"batch_size": "7"}})
+        self.patches = [
+            mock.patch.object(bds_queries, "neo4j_config", config["NEO4j"]),
+            mock.patch.object(bds_dumps, "get_species_mapping", self.generator.get_species_mapping),
+            mock.patch.object(ListAllAllenIndividuals, "run_query",
+                              lambda query, *args, **kwargs: self.generator.list_all_allen_individuals()),
+            mock.patch.object(ListAllTaxonomies, "run_query",
+                              lambda query, *args, **kwargs: self.generator.list_all_taxonomies()),
+            mock.patch.object(GetOntologyMetadata, "run_query",
+                              lambda query, *args, **kwargs: self.generator.get_ontology_metadata()),
+            mock.patch.object(IndividualDetailsBatchQuery, "run_query", self.run_individual_details_query)]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp_dir.cleanup()
+
+    def run_individual_details_query(self, parameters=None, **kwparameters):
+        # random latency, so that concurrent batches complete out of order
+        time.sleep(self.random.random() / 200)
+        if self.failing_accession in parameters["accessions"]:
+            raise RuntimeError("Batch failed: " + self.failing_accession)
+        return {"PCL:" + accession: self.details["PCL:" + accession] for accession in parameters["accessions"]}
+
+    def dump(self, workers):
+        dump_path = os.path.join(self.tmp_dir.name, "solr_{}.json".format(workers))
+        with mock.patch.object(bds_dumps, "SOLR_JSON_PATH", dump_path):
+            bds_dumps.individuals_metadata_solr_dump(workers)
+        with open(dump_path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_execute_queries(self):
+        queries = [ListAllAllenIndividuals(), ListAllTaxonomies(), GetOntologyMetadata()]
+        self.assertEqual(bds_dumps.execute_queries(queries), bds_dumps.execute_queries(queries, workers=4))
+
+    def test_identical_dumps(self):
+        serial_dump = self.dump(1)
+        self.assertIn(self.generator.list_all_allen_individuals()[-1], serial_dump)
+        self.assertEqual(serial_dump, self.dump(4))
+
+    def test_failing_batch(self):
+        individuals = self.generator.list_all_allen_individuals()
+        self.failing_accession = individuals[60].replace("PCL:", "")
+        for workers in [1, 4]:
+            results = list()
+            with self.assertRaisesRegex(RuntimeError, "Batch failed: " + self.failing_accession):
+                for item in IndividualDetailsBatchQuery().execute_in_batches(individuals, workers):
+                    results.append(item)
+            # batches before the failing one are all yielded in order, none after it
+            self.assertEqual([(individual, self.details[individual]) for individual in individuals[:56]], results)
+
+            with self.assertRaises(RuntimeError):
+                self.dump(workers)
+
+
+if __name__ == '__main__':
+    unittest.main()
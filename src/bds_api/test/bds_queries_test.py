@@ -1,6 +1,24 @@
+import os
 import unittest
 import json
-from bds_api.dumps.bds_queries import IndividualDetailsQuery, ListAllAllenIndividuals, GetOntologyMetadata, ListAllTaxonomies
+from unittest import mock
+from bds_api.dumps.bds_queries import IndividualDetailsQuery, ListAllAllenIndividuals, GetOntologyMetadata, ListAllTaxonomies, \
+    IndividualDetailsBatchQuery, set_query_replayer
+from bds_api.dumps.query_replay import QueryReplayer
+from bds_api.dumps import neo4j_driver
+from bds_api.dumps.neo4j_driver import close_drivers
+
+# recorded query responses (see bds_dumps.py --record) to run the tests without Neo4j
+QUERY_FIXTURE = os.environ.get("BDS_QUERY_FIXTURE")
+
+
+def setUpModule():
+    if QUERY_FIXTURE:
+        set_query_replayer(QueryReplayer(QUERY_FIXTURE))
+
+
+def tearDownModule():
+    set_query_replayer(None)
 
 
 class QueriesTest(unittest.TestCase):
@@ -18,6 +36,14 @@ class QueriesTest(unittest.TestCase):
         self.assertTrue(result["references"])
         self.assertEqual(2, len(result["references"]))
 
+    def test_individual_details_batch_query(self):
+        individuals = ["PCL:0011628", "PCL:0011528", "PCL:0011588"]
+        results = list(IndividualDetailsBatchQuery(batch_size=2).execute_in_batches(individuals))
+
+        self.assertEqual(individuals, [individual for individual, result in results])
+        single_result = IndividualDetailsQuery().execute_query({"accession": "0011628"})
+        self.assertEqual(single_result, results[0][1])
+
     def test_list_all_indv_query(self):
         result = ListAllAllenIndividuals().execute_query()
         print(json.dumps(result))
@@ -50,6 +76,20 @@ class QueriesTest(unittest.TestCase):
         self.assertTrue('comment' in first_mouse_dataset)
         self.assertTrue(first_mouse_dataset['comment'])
 
+    @unittest.skipIf(QUERY_FIXTURE, "Replayed queries don't use the driver.")
+    def test_shared_driver(self):
+        first_query = ListAllAllenIndividuals()
+        second_query = GetOntologyMetadata()
+        self.assertIs(first_query.driver, second_query.driver)
+
+        first_query.execute_query()
+        self.assertTrue(GetOntologyMetadata().execute_query())
+
+        driver = second_query.driver
+        close_drivers()
+        self.assertIsNot(driver, second_query.driver)
+        self.assertIs(second_query.driver, GetOntologyMetadata().driver)
+
     def test_get_ontology_metadata(self):
         result = GetOntologyMetadata().execute_query()
 
@@ -60,5 +100,24 @@ class QueriesTest(unittest.TestCase):
         self.assertTrue("version" in result)
 
 
+class DriverTest(unittest.TestCase):
+
+    def tearDown(self):
+        close_drivers()
+
+    @mock.patch.object(neo4j_driver, "GraphDatabase")
+    def test_reused_query_after_close(self, graph_database):
+        graph_database.driver.side_effect = lambda *args, **kwargs: mock.Mock()
+        close_drivers()
+        query = GetOntologyMetadata()
+        driver = query.driver
+        self.assertIs(driver, ListAllTaxonomies().driver)
+
+        close_drivers()
+        driver.close.assert_called_once_with()
+        self.assertIsNot(driver, query.driver)
+        self.assertIs(query.driver, ListAllTaxonomies().driver)
+
+
 if __name__ == '__main__':
     unittest.main()
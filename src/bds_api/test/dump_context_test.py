@@ -0,0 +1,45 @@
+import unittest
+from bds_api.dumps.dump_context import DumpContext
+
+
+class DumpContextTest(unittest.TestCase):
+
+    def setUp(self):
+        all_datasets = {"202002013": {"taxonomy": {"label": "CCN202002013"}, "has_brain_region": ["UBERON:0001384"]},
+                        "1908210": {"taxonomy": {"label": "CS1908210"}}}
+        self.context = DumpContext(all_datasets, {"202002013": "Mus musculus", "1908210": "Homo sapiens"})
+
+    def test_taxonomy_resolution(self):
+        # indexes are built before the first lookup
+        self.assertEqual({"CS202002013": "202002013", "CS1908210": "1908210"}, self.context.taxonomy_ids)
+        self.assertEqual("202002013", self.context.get_taxonomy_id("CS202002013_189"))
+        self.assertEqual("202002013", self.context.get_taxonomy_id("CS202002013_1"))
+        self.assertEqual("1908210", self.context.get_taxonomy_id("CS1908210_42"))
+        self.assertEqual({"taxonomy": {"label": "CS1908210"}}, self.context.get_taxonomy("CS1908210_42"))
+        self.assertEqual("Mus musculus", self.context.get_species("CS202002013_7"))
+
+        with self.assertRaises(KeyError):
+            self.context.get_taxonomy_id("CS201912131_1")
+        # accession ids are resolved by their prefix only
+        with self.assertRaises(KeyError):
+            self.context.get_taxonomy_id("CS2020020130_1")
+
+    def test_brain_regions(self):
+        self.assertEqual(["UBERON:0001384"], self.context.get_brain_regions("CS202002013_7"))
+        self.assertEqual([], self.context.get_brain_regions("CS1908210_42"))
+        with self.assertRaises(KeyError):
+            self.context.get_brain_regions("CS201912131_1")
+
+    def test_all_cells_resolution(self):
+        self.context.add_all_cells("http://purl.obolibrary.org/obo/PCL_0011100")
+        self.context.add_all_cells("http://purl.obolibrary.org/obo/PCL_0015100")
+
+        self.assertEqual("http://purl.obolibrary.org/obo/PCL_0011100",
+                         self.context.get_all_cells_of("http://purl.obolibrary.org/obo/PCL_0011623"))
+        self.assertEqual("http://purl.obolibrary.org/obo/PCL_0015100",
+                         self.context.get_all_cells_of("http://purl.obolibrary.org/obo/PCL_0015648"))
+        self.assertIsNone(self.context.get_all_cells_of("http://purl.obolibrary.org/obo/PCL_0019648"))
+
+
+if __name__ == '__main__':
+    unittest.main()
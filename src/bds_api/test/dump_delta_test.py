@@ -0,0 +1,61 @@
+import unittest
+import json
+import os
+import tempfile
+from bds_api.dumps.dump_delta import compute_delta, find_previous_dump, fingerprint, write_delta_dump
+
+
+class DumpDeltaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.previous_path = self.write_dump("individuals_metadata_solr_20220215.json", [
+            {"id": "unchanged", "label": "a", "parents": ["p1", "p2"]},
+            {"id": "changed", "label": "b", "comment": "removed field"},
+            {"id": "deleted", "label": "c"}])
+        self.current_path = self.write_dump("individuals_metadata_solr_20220302.json", [
+            {"id": "unchanged", "label": "a", "parents": ["p2", "p1"]},
+            {"id": "changed", "label": "b2"},
+            {"id": "added", "label": "d"}])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_dump(self, file_name, docs):
+        path = os.path.join(self.tmp_dir.name, file_name)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(docs, f, indent=4)
+        return path
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint({"id": "x", "tags": ["a", "b"]}), fingerprint({"tags": ["b", "a"], "id": "x"}))
+        self.assertNotEqual(fingerprint({"id": "x", "tags": ["a"]}), fingerprint({"id": "x", "tags": ["a", "b"]}))
+
+    def test_find_previous_dump(self):
+        self.write_dump("individuals_metadata_solr_delta_20220301.json", {})
+        self.assertEqual(self.previous_path, find_previous_dump(self.current_path))
+        # newer dumps are never the previous dump, such as when an older date is dumped again
+        self.assertIsNone(find_previous_dump(self.previous_path))
+        # other formats of the same date are the same run
+        self.write_dump("individuals_metadata_solr_20220302.ndjson", {})
+        self.assertEqual(self.previous_path, find_previous_dump(self.current_path))
+
+    def test_compute_delta(self):
+        delta = compute_delta(self.previous_path, self.current_path)
+
+        self.assertEqual([{"id": "added", "label": "d"}], delta["added"])
+        self.assertEqual([{"id": "changed", "label": {"set": "b2"}, "comment": {"set": None}}], delta["updated"])
+        self.assertEqual(["deleted"], delta["deleted"])
+
+    def test_write_delta_dump(self):
+        delta_path = write_delta_dump(self.current_path)
+
+        self.assertTrue(delta_path.endswith("individuals_metadata_solr_delta_20220302.json"))
+        with open(delta_path, encoding='utf-8') as f:
+            delta = json.load(f)
+        self.assertEqual("individuals_metadata_solr_20220215.json", delta["previous"])
+        self.assertEqual(1, len(delta["updated"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import json
+import os
+import tempfile
+from bds_api.dumps.dump_io import open_writer, get_dump_path, StreamingDocumentStore, JSON_FORMAT, \
+    NDJSON_FORMAT, TMP_SUFFIX
+
+
+class DumpWritersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.docs = [{"id": "iri_1", "iri": "iri_1", "label": "doc 1", "parents": ["iri_2"]},
+                     {"id": "iri_2", "iri": "iri_2", "label": "doc 2", "count": 2, "tags": []}]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_json_array_writer(self):
+        path = os.path.join(self.tmp_dir.name, "dump.json")
+        with open_writer(path) as writer:
+            for doc in self.docs:
+                writer.write(doc)
+
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(json.dumps(self.docs, indent=4), f.read())
+
+    def test_json_envelope_writer(self):
+        path = os.path.join(self.tmp_dir.name, "dump.json")
+        ontology = {"name": "BDS", "version": ["2022-03-02"]}
+        with open_writer(path, envelope={"ontology": ontology}, array_key="entities") as writer:
+            for doc in self.docs:
+                writer.write(doc)
+
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(json.dumps({"ontology": ontology, "entities": self.docs}, indent=4), f.read())
+
+    def test_ndjson_writer(self):
+        path = get_dump_path(os.path.join(self.tmp_dir.name, "dump.json"), NDJSON_FORMAT)
+        self.assertTrue(path.endswith("dump.ndjson"))
+        with open_writer(path, NDJSON_FORMAT) as writer:
+            for doc in self.docs:
+                writer.write(doc)
+
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(self.docs, [json.loads(line) for line in f])
+
+    def test_failed_writes(self):
+        for dump_format in [JSON_FORMAT, NDJSON_FORMAT]:
+            path = get_dump_path(os.path.join(self.tmp_dir.name, "dump.json"), dump_format)
+            with open_writer(path, dump_format) as writer:
+                writer.write(self.docs[0])
+            with open(path, encoding='utf-8') as f:
+                previous_dump = f.read()
+
+            with self.assertRaises(ValueError):
+                with open_writer(path, dump_format) as writer:
+                    writer.write(self.docs[1])
+                    raise ValueError("Neo4j query failed")
+            # existing dump is kept and no partial dump is left behind
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(previous_dump, f.read())
+            self.assertFalse(os.path.exists(path + TMP_SUFFIX))
+
+
+class StreamingDocumentStoreTest(unittest.TestCase):
+
+    def test_deferred_documents(self):
+        written = list()
+        writer = type("ListWriter", (), {"write": lambda self, doc: written.append(doc)})()
+        store = StreamingDocumentStore(writer)
+
+        store["parent"] = {"iri": "parent", "label": "shared"}
+        store["marker"] = {"iri": "marker"}
+        self.assertTrue("parent" in store)
+        self.assertEqual([], written)
+
+        # final document replaces the deferred shared entity
+        store.write({"iri": "parent", "label": "individual"})
+        store["parent"] = {"iri": "parent", "label": "late shared"}
+        self.assertEqual([{"iri": "parent", "label": "individual"}], written)
+
+        store.flush()
+        self.assertEqual(["parent", "marker"], [doc["iri"] for doc in written])
+        self.assertEqual(2, len(store))
+
+
+if __name__ == '__main__':
+    unittest.main()
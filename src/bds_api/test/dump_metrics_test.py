@@ -0,0 +1,74 @@
+import os
+import json
+import unittest
+import tempfile
+import tracemalloc
+from unittest import mock
+from bds_api.dumps import dump_metrics
+from bds_api.dumps.dump_metrics import DumpMetrics, LatencyHistogram, FETCH_STAGE
+
+
+class DumpMetricsTest(unittest.TestCase):
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram()
+        for latency_ms in [0.5, 3, 3, 8, 40, 2000, 20000]:
+            histogram.add(latency_ms / 1000)
+        stats = histogram.to_dict()
+
+        self.assertEqual(7, stats["count"])
+        self.assertEqual(8, stats["p50_ms"])
+        self.assertEqual(20000, stats["max_ms"])
+        self.assertEqual(1, stats["buckets_ms"]["<=1"])
+        self.assertEqual(2, stats["buckets_ms"]["<=5"])
+        self.assertEqual(1, stats["buckets_ms"]["<=2500"])
+        self.assertEqual(1, stats["buckets_ms"][">10000"])
+
+    def test_summary(self):
+        metrics = DumpMetrics()
+        with metrics.stage_block("solr_dump"):
+            with metrics.time_stage(FETCH_STAGE, 100):
+                pass
+            metrics.add_stage_time(FETCH_STAGE, 1.0, 100)
+            metrics.record_query("IndividualDetailsBatchQuery", 0.2)
+            metrics.count_documents(150)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = os.path.join(tmp_dir, "metrics.json")
+            summary = metrics.log_summary(output_path)
+            with open(output_path) as f:
+                self.assertEqual(json.loads(json.dumps(summary)), json.load(f))
+
+        self.assertEqual(150, summary["documents"])
+        self.assertEqual(200, summary["stages"][FETCH_STAGE]["items"])
+        self.assertEqual(2, summary["stages"][FETCH_STAGE]["calls"])
+        self.assertEqual(1, summary["queries"]["IndividualDetailsBatchQuery"]["count"])
+        self.assertIn("solr_dump", summary["blocks"])
+
+
+    def test_trace_memory(self):
+        class TracemallocWithoutResetPeak(object):
+            # tracemalloc module of Python 3.8
+            def __getattr__(self, name):
+                if name == "reset_peak":
+                    raise AttributeError(name)
+                return getattr(tracemalloc, name)
+
+        was_tracing = tracemalloc.is_tracing()
+        try:
+            for module in [tracemalloc, TracemallocWithoutResetPeak()]:
+                with mock.patch.object(dump_metrics, "tracemalloc", module):
+                    metrics = DumpMetrics(trace_memory=True)
+                    with metrics.stage_block("solr_dump"):
+                        documents = [{"id": str(index)} for index in range(1000)]
+                stats = metrics.get_summary()["blocks"]["solr_dump"]["tracemalloc"]
+                self.assertTrue(stats["peak_mb"] > 0)
+                self.assertTrue(stats["top_allocations"])
+                del documents
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+import os
+import json
+import unittest
+import tempfile
+import threading
+import configparser
+from unittest import mock
+from bds_api.dumps import bds_dumps, bds_queries, dump_pipeline
+from bds_api.dumps.bds_queries import IndividualDetailsBatchQuery, ListAllAllenIndividuals, ListAllTaxonomies, \
+    GetOntologyMetadata, set_query_recorder, set_query_replayer
+from bds_api.dumps.dump_io import iter_dump_documents, NDJSON_FORMAT, TMP_SUFFIX
+from bds_api.dumps.dump_pipeline import DumpPipeline, FileSink, SolrSink, create_sink
+from bds_api.dumps.query_replay import QueryRecorder, QueryReplayer
+from bds_api.dumps.synthetic_data import SyntheticDataConfig, SyntheticDataGenerator
+
+# max seconds of a pipeline run, a longer run is considered hanging
+RUN_TIMEOUT = 30
+
+
+class CollectingSink(object):
+
+    def __init__(self, fail_at=None):
+        self.documents = list()
+        self.fail_at = fail_at
+
+    def consume(self, documents, envelope=None):
+        for doc in documents:
+            if len(self.documents) == self.fail_at:
+                raise ValueError("Sink failed")
+            self.documents.append(doc)
+
+
+class DumpPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.docs = [{"id": "PCL_" + str(index), "iri": "PCL_" + str(index)} for index in range(50)]
+        self.dump_path = os.path.join(self.tmp_dir.name, "individuals_metadata_solr_20220302.json")
+        with open(self.dump_path, "w") as f:
+            json.dump(self.docs, f, indent=4)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_from_dump(self):
+        output_path = os.path.join(self.tmp_dir.name, "copy.json")
+        collecting_sink = CollectingSink()
+        DumpPipeline([collecting_sink, FileSink(output_path)], queue_size=3).run_from_dump(self.dump_path)
+
+        self.assertEqual(self.docs, collecting_sink.documents)
+        with open(self.dump_path) as original, open(output_path) as copy:
+            self.assertEqual(original.read(), copy.read())
+
+    def test_failing_sink(self):
+        collecting_sink = CollectingSink()
+        pipeline = DumpPipeline([collecting_sink, CollectingSink(fail_at=10)], queue_size=3)
+
+        with self.assertRaises(ValueError):
+            pipeline.run_from_dump(self.dump_path)
+        # other stages are aborted instead of blocking on the failed sink
+        self.assertTrue(len(collecting_sink.documents) < len(self.docs))
+
+
+class ReplayedDumpPipelineTest(unittest.TestCase):
+    """
+    Full fetch, transform and sink runs over the replayed query responses of synthetic data.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        generator = SyntheticDataGenerator(SyntheticDataConfig(taxonomies=2, individuals_per_taxonomy=40))
+        self.individuals = generator.list_all_allen_individuals()
+        self.record_fixture(generator, os.path.join(self.tmp_dir.name, "queries_fixture.json.gz"))
+
+        self.indexed = list()
+        indexer = mock.MagicMock()
+        indexer.__enter__.return_value = indexer
+        indexer.index_documents.side_effect = self.indexed.extend
+        self.patches = [mock.patch.object(bds_dumps, "get_species_mapping", generator.get_species_mapping),
+                        mock.patch.object(dump_pipeline.SolrBulkIndexer, "from_config", return_value=indexer)]
+        for patch in self.patches:
+            patch.start()
+
+        # documents of the serial dump script
+        reference_path = os.path.join(self.tmp_dir.name, "reference.json")
+        with mock.patch.object(bds_dumps, "SOLR_JSON_PATH", reference_path):
+            bds_dumps.individuals_metadata_solr_dump(dump_format=NDJSON_FORMAT)
+        self.reference_docs = list(iter_dump_documents(os.path.join(self.tmp_dir.name, "reference.ndjson")))
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        set_query_replayer(None)
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def record_fixture(generator, fixture_path):
+        details = dict(generator.iter_individual_results())
+        recorder = QueryRecorder(fixture_path)
+        set_query_recorder(recorder)
+        try:
+            with mock.patch.object(ListAllAllenIndividuals, "run_query",
+                                   lambda query, *args, **kwargs: generator.list_all_allen_individuals()), \
+                    mock.patch.object(ListAllTaxonomies, "run_query",
+                                      lambda query, *args, **kwargs: generator.list_all_taxonomies()), \
+                    mock.patch.object(GetOntologyMetadata, "run_query",
+                                      lambda query, *args, **kwargs: generator.get_ontology_metadata()), \
+                    mock.patch.object(IndividualDetailsBatchQuery, "run_query",
+                                      lambda query, parameters, **kwargs: {
+                                          "PCL:" + accession: details["PCL:" + accession]
+                                          for accession in parameters["accessions"]}):
+                individuals = ListAllAllenIndividuals().execute_query()
+                ListAllTaxonomies().execute_query()
+                GetOntologyMetadata().execute_query()
+                list(IndividualDetailsBatchQuery().execute_in_batches(individuals))
+        finally:
+            set_query_recorder(None)
+        recorder.save()
+        set_query_replayer(QueryReplayer(fixture_path))
+
+    def run_pipeline(self, pipeline):
+        """
+        Runs the Solr dump of the pipeline in a separate thread, fails if it does not complete in RUN_TIMEOUT.
+        :return: error of the run or None
+        """
+        errors = list()
+
+        def run_dump():
+            try:
+                pipeline.run_solr_dump()
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run_dump, daemon=True)
+        thread.start()
+        thread.join(RUN_TIMEOUT)
+        self.assertFalse(thread.is_alive(), "Dump pipeline is hanging")
+        return errors[0] if errors else None
+
+    def test_sinks(self):
+        dump_path = os.path.join(self.tmp_dir.name, "individuals_metadata_solr.json")
+        sinks = [create_sink(name, dump_path=dump_path) for name in ["ndjson", "jsonz", "solr"]]
+        self.assertIsInstance(sinks[2], SolrSink)
+        self.assertIsNone(self.run_pipeline(DumpPipeline(sinks, workers=2, queue_size=5)))
+
+        self.assertTrue(len(self.reference_docs) > 80)
+        self.assertEqual(self.reference_docs, list(iter_dump_documents(sinks[0].path)))
+        self.assertEqual(self.reference_docs, list(iter_dump_documents(sinks[1].path)))
+        self.assertEqual(self.reference_docs, self.indexed)
+
+    def test_failing_fetch(self):
+        execute_batch = IndividualDetailsBatchQuery.execute_batch
+        failing_individual = self.individuals[50]
+
+        def fail_batch(query, batch):
+            if failing_individual in batch:
+                raise RuntimeError("Fetch failed")
+            return execute_batch(query, batch)
+
+        config = configparser.ConfigParser()
+        config.read_dict({"NEO4j": {"batch_size": "5"}})
+        collecting_sink = CollectingSink()
+        file_sink = create_sink("ndjson", dump_path=os.path.join(self.tmp_dir.name, "individuals_metadata_solr.json"))
+        with mock.patch.object(bds_queries, "neo4j_config", config["NEO4j"]), \
+                mock.patch.object(IndividualDetailsBatchQuery, "execute_batch", fail_batch):
+            error = self.run_pipeline(DumpPipeline([collecting_sink, file_sink], queue_size=2))
+        self.assertEqual("Fetch failed", str(error))
+        self.assertTrue(len(collecting_sink.documents) < len(self.reference_docs))
+        # aborted file sink leaves no partial dump behind
+        self.assertFalse(os.path.exists(file_sink.path))
+        self.assertFalse(os.path.exists(file_sink.path + TMP_SUFFIX))
+
+    def test_failing_transform(self):
+        def fail_transform(all_data, individual_results, *args, **kwargs):
+            for index, item in enumerate(individual_results):
+                if index == 3:
+                    raise RuntimeError("Transform failed")
+
+        collecting_sink = CollectingSink()
+        pipeline = DumpPipeline([collecting_sink, CollectingSink()], queue_size=2)
+        # fetch stage is blocked on the full fetch queue and the sinks on the empty queues when the transform fails
+        with mock.patch.object(dump_pipeline, "populate_solr_documents", fail_transform):
+            error = self.run_pipeline(pipeline)
+        self.assertEqual("Transform failed", str(error))
+        self.assertEqual([], collecting_sink.documents)
+        self.assertTrue(pipeline.abort_event.is_set())
+
+    def test_failing_sink(self):
+        collecting_sink = CollectingSink()
+        pipeline = DumpPipeline([collecting_sink, CollectingSink(fail_at=10)], queue_size=2)
+        error = self.run_pipeline(pipeline)
+        self.assertEqual("Sink failed", str(error))
+        self.assertTrue(len(collecting_sink.documents) < len(self.reference_docs))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+from bds_api.endpoints.embedded_search import EmbeddedIndex, EMBEDDED_BACKEND
+from bds_api.endpoints.request_templates import get_profile, SEARCH_PROFILE, AUTOCOMPLETE_PROFILE
+from bds_api.endpoints import search_service
+from bds_api.test.api_test_utils import create_test_app, FakeSolrClientMixin
+
+app = create_test_app('bds_embedded')
+
+DOCS = [{"id": "ontology", "iri": "ontology", "label": "BDS", "version": ["1"]},
+        {"id": "http://purl.obolibrary.org/obo/CL_0000001", "iri": "http://purl.obolibrary.org/obo/CL_0000001",
+         "curie": "CL:0000001", "label": "Lamp5 neuron"},
+        {"id": "http://purl.obolibrary.org/obo/PCL_0011008", "iri": "http://purl.obolibrary.org/obo/PCL_0011008",
+         "curie": "PCL:0011008", "label": "Lamp5 Lhx6 MOp (Mouse)", "prefLabel": ["Lamp5 Lhx6"],
+         "marker_labels": ["Lamp5", "Lhx6"], "accession_id": "CS202002013_8", "species": "Mus musculus",
+         "taxonomy_id": "CCN202002013", "rank": ["Cell Type"]},
+        {"id": "http://purl.obolibrary.org/obo/PCL_0012008", "iri": "http://purl.obolibrary.org/obo/PCL_0012008",
+         "curie": "PCL:0012008", "label": "Lamp5 Lhx6 MTG (Human)", "prefLabel": ["Lamp5 Lhx6"],
+         "marker_labels": ["Lamp5", "Lhx6"], "accession_id": "CS201912131_8", "species": "Homo sapiens",
+         "taxonomy_id": "CCN201912131", "rank": ["Subclass"]},
+        {"id": "http://purl.obolibrary.org/obo/PCL_0011000", "iri": "http://purl.obolibrary.org/obo/PCL_0011000",
+         "curie": "PCL:0011000", "accession_id": "CCN202002013", "label": "CCN202002013", "type": "taxonomy",
+         "species": "Mus musculus", "cell_types_count": 40}]
+
+
+class EmbeddedIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = EmbeddedIndex(DOCS)
+        self.search_profile = get_profile(SEARCH_PROFILE)
+        self.autocomplete_profile = get_profile(AUTOCOMPLETE_PROFILE)
+
+    def search(self, query, profile=None, **kwargs):
+        return self.index.search(profile or self.search_profile, query, **kwargs)
+
+    def curies(self, data):
+        return [doc["curie"][0] for doc in data["response"]["docs"]]
+
+    def test_and_semantics(self):
+        data = self.search("Lamp5 Lhx6")
+        self.assertEqual(2, data["response"]["numFound"])
+        self.assertEqual(["PCL:0011008", "PCL:0012008"], self.curies(data))
+
+        data = self.search("Lamp5")
+        self.assertEqual(["PCL:0011008", "PCL:0012008", "CL:0000001"], self.curies(data))
+        # PCL domain boosting is higher than the CL domain boosting
+        scores = [doc["score"] for doc in data["response"]["docs"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(scores[0], data["response"]["maxScore"])
+
+        self.assertEqual(0, self.search("Lamp5 Sst")["response"]["numFound"])
+
+    def test_prefix(self):
+        data = self.search("lamp5 lh", self.autocomplete_profile)
+        self.assertEqual(["http://purl.obolibrary.org/obo/PCL_0011008", "http://purl.obolibrary.org/obo/PCL_0012008"],
+                         [doc["id"] for doc in data["response"]["docs"]])
+        self.assertEqual(["<b>Lamp5 Lhx6 MOp (Mouse)</b>"],
+                         data["highlighting"]["http://purl.obolibrary.org/obo/PCL_0011008"]["label_autosuggest_e"])
+
+        # only value prefixes match
+        self.assertEqual(0, self.search("hx6", self.autocomplete_profile)["response"]["numFound"])
+        self.assertEqual(["CS202002013_8"], [doc["accession_id"][0] for doc in
+                                             self.search("cs2020", self.autocomplete_profile)["response"]["docs"]])
+
+    def test_filters(self):
+        self.assertEqual(["PCL:0011008"], self.curies(self.search("Lamp5", species=["Mus musculus"])))
+        self.assertEqual(["PCL:0011008", "PCL:0012008"],
+                         self.curies(self.search("Lamp5", species=["Mus musculus", "Homo sapiens"])))
+        self.assertEqual(["PCL:0012008"], self.curies(self.search("Lamp5", taxonomies=["CCN201912131"])))
+        self.assertEqual(["PCL:0011008"], self.curies(self.search("Lamp5", ranks=["Cell Type"])))
+        self.assertEqual([], self.curies(self.search("Lamp5", species=["Mus musculus"], ranks=["Subclass"])))
+
+    def test_rows_and_match_all(self):
+        data = self.search("*", rows=2)
+        self.assertEqual(len(DOCS), data["response"]["numFound"])
+        self.assertEqual(2, len(data["response"]["docs"]))
+        self.assertEqual(["PCL:0011008", "PCL:0012008"], self.curies(self.search("*", ranks=["Cell Type", "Subclass"])))
+
+    def test_response_shape(self):
+        data = self.search("Lamp5 Lhx6", species=["Mus musculus"])
+        self.assertEqual(0, data["responseHeader"]["status"])
+        doc = data["response"]["docs"][0]
+        # fields other than the id are multivalued like in the schemaless Solr collection
+        self.assertEqual("http://purl.obolibrary.org/obo/PCL_0011008", doc["id"])
+        self.assertEqual(["Lamp5 Lhx6 MOp (Mouse)"], doc["label"])
+        self.assertEqual(["Mus musculus"], doc["species"])
+        self.assertIn("score", doc)
+        self.assertEqual(["<b>Lamp5</b> <b>Lhx6</b> MOp (Mouse)"],
+                         data["highlighting"][doc["id"]]["label"])
+
+        doc = self.search("Lamp5 Lhx6", self.autocomplete_profile)["response"]["docs"][0]
+        self.assertEqual(["id", "iri", "label", "prefLabel", "marker_labels", "accession_id", "species", "taxonomy_id",
+                          "score"], list(doc))
+
+    def test_find(self):
+        data = self.index.find([("curie", "PCL:0011008"), ("accession_id", "CS201912131_8"),
+                                ("id", "http://purl.obolibrary.org/obo/PCL_0011008"), ("curie", "PCL:0000000")], 10)
+        self.assertEqual(2, data["response"]["numFound"])
+        self.assertEqual(["PCL:0011008", "PCL:0012008"], self.curies(data))
+
+        data = self.index.list_taxonomies(10)
+        self.assertEqual(["PCL:0011000"], self.curies(data))
+        self.assertEqual([40], data["response"]["docs"][0]["cell_types_count"])
+
+    def test_from_dump(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dump_path = os.path.join(tmp_dir, "individuals_metadata_solr.json")
+            with open(dump_path, "w", encoding="utf-8") as f:
+                json.dump(DOCS, f, indent=4)
+            index = EmbeddedIndex.from_dump(dump_path)
+        self.assertEqual(len(DOCS), len(index.docs))
+        self.assertEqual(["PCL:0011008"], self.curies(index.search(self.search_profile, "Lamp5 MOp")))
+
+
+class EmbeddedEndpointsTest(FakeSolrClientMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.app = app.test_client()
+
+    def tearDown(self):
+        super().tearDown()
+        self.solr_client.get.assert_not_called()
+
+    def get_patches(self):
+        return [mock.patch.object(search_service, "get_search_backend", return_value=EMBEDDED_BACKEND),
+                mock.patch.object(search_service, "get_embedded_index", return_value=EmbeddedIndex(DOCS))]
+
+    def get_json(self, url):
+        response = self.app.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("*", response.headers["Access-Control-Allow-Origin"])
+        return json.loads(response.get_data())
+
+    def test_search(self):
+        data = self.get_json("/bds/api/search?query=Lamp5%20Lhx6&species=mouse&rank=Cell%20Type"
+                             "&taxonomy=(CCN202002013%20OR%20CCN201912131)")
+        self.assertEqual([["PCL:0011008"]], [doc["curie"] for doc in data["response"]["docs"]])
+
+        data = self.get_json("/bds/api/autocomplete?query=lamp&limit=1")
+        self.assertEqual(3, data["response"]["numFound"])
+        self.assertEqual(1, len(data["response"]["docs"]))
+
+        response = self.app.get("/bds/api/search?query=Lamp5&rank=Type")
+        self.assertEqual(400, response.status_code)
+
+    def test_batch_search(self):
+        response = self.app.post("/bds/api/search/batch", content_type="application/json",
+                                 data=json.dumps({"searches": [{"query": "Lamp5", "species": "human"},
+                                                               {"query": "Lamp5", "rank": "Type"}]}))
+        results = json.loads(response.get_data())["results"]
+        self.assertEqual([200, 400], [result["status"] for result in results])
+        self.assertEqual(["PCL:0012008"], results[0]["result"]["response"]["docs"][0]["curie"])
+
+    def test_get_and_taxonomies(self):
+        data = self.get_json("/bds/api/get?identifier=\"PCL:0011008\"")
+        self.assertEqual([["PCL:0011008"]], [doc["curie"] for doc in data["response"]["docs"]])
+
+        data = self.get_json("/bds/api/get?identifier=PCL:0011008,CS201912131_8,PCL:0000000")
+        self.assertEqual(["CS201912131_8", "PCL:0011008"], sorted(data["docs"]))
+        self.assertEqual(["PCL:0000000"], data["missing"])
+
+        data = self.get_json("/bds/api/taxonomies")
+        self.assertEqual(["CCN202002013"], [doc["accession_id"][0] for doc in data["response"]["docs"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
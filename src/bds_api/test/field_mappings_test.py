@@ -0,0 +1,38 @@
+import unittest
+from bds_api.dumps.field_mappings import parse_axiom_value, extract_class_fields, extract_dataset_fields, \
+    compile_mappings, FieldMapping
+
+
+class FieldMappingsTest(unittest.TestCase):
+
+    def test_parse_axiom_value(self):
+        self.assertEqual("L4 IT VISp Rspo1", parse_axiom_value('{"annotations":{},"value":"L4 IT VISp Rspo1"}'))
+        self.assertEqual('has "fanning-out" morphology',
+                         parse_axiom_value('{"annotations":{},"value":"has \\"fanning-out\\" morphology"}'))
+        self.assertEqual("L4 IT VISp Rspo1", parse_axiom_value({"annotations": {}, "value": "L4 IT VISp Rspo1"}))
+        self.assertEqual("plain value", parse_axiom_value("plain value"))
+
+    def test_extract_class_fields(self):
+        node = {"iri": "http://purl.obolibrary.org/obo/PCL_0011628", "curie": "PCL:0011628", "label": "L4 IT",
+                "tags": ["Class", "Cell"], "symbol": [None, "", "Rspo1"],
+                "has_exact_synonym": ['{"annotations":{},"value":"syn1"}', '{"annotations":{},"value":"syn2"}'],
+                "definition": ['{"annotations":{},"value":"A neuron."}'], "unmapped": "x"}
+        self.assertEqual({"id": "http://purl.obolibrary.org/obo/PCL_0011628",
+                          "iri": "http://purl.obolibrary.org/obo/PCL_0011628", "curie": "PCL:0011628",
+                          "label": "L4 IT", "tags": ["Cell"], "has_exact_synonym": ["syn1", "syn2"],
+                          "definition": "A neuron.", "symbol": "Rspo1"}, extract_class_fields(node))
+
+        with self.assertRaises(KeyError):
+            extract_class_fields({"iri": "http://purl.obolibrary.org/obo/PCL_0011628"})
+
+    def test_extract_into_document(self):
+        solr_doc = {"id": "ds"}
+        self.assertIs(solr_doc, extract_dataset_fields({"prefLabel": [None, "ds1"], "cell_count": [12]}, solr_doc))
+        self.assertEqual(["id", "cell_count", "dataset"], list(solr_doc))
+
+        extract = compile_mappings([FieldMapping("a", "b", transform=len)])
+        self.assertEqual({"b": 3}, extract({"a": "abc"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import unittest
+from unittest import mock
+from bds_api.endpoints.request_templates import get_template, SEARCH_PROFILE
+from bds_api.endpoints import search_service
+from bds_api.test.api_test_utils import create_test_app, StubResponse, FakeSolrClientMixin
+
+app = create_test_app('bds_get')
+
+DOCS = [{"id": "http://purl.obolibrary.org/obo/PCL_0011189", "curie": ["PCL:0011189"],
+         "accession_id": ["CS202002013_189"]},
+        {"id": "http://purl.obolibrary.org/obo/PCL_0011190", "curie": ["PCL:0011190"],
+         "accession_id": ["CS202002013_190"]}]
+
+
+class GetIdentifiersTest(FakeSolrClientMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.app = app.test_client()
+        self.solr_client.get.return_value = StubResponse({"response": {"numFound": 2, "docs": DOCS}})
+        self.collection_url = get_template(SEARCH_PROFILE).collection_url
+
+    def test_single_identifier(self):
+        response = self.app.get("/bds/api/get?identifier=\"PCL:0011189\"")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(DOCS, json.loads(response.get_data())["response"]["docs"])
+        self.solr_client.get.assert_called_once_with(self.collection_url + "?q=curie:(\"PCL\\:0011189\")&rows=300")
+
+    def test_single_identifier_escaped(self):
+        self.app.get("/bds/api/get?identifier=http://purl.obolibrary.org/obo/PCL_0011189")
+        self.solr_client.get.assert_called_once_with(
+            self.collection_url + "?q=id:(\"http\\:\\/\\/purl.obolibrary.org\\/obo\\/PCL_0011189\")&rows=300")
+
+    def test_multiple_identifiers(self):
+        response = self.app.get("/bds/api/get?identifier=\"PCL:0011189\",CS202002013_190"
+                                "&identifier=http://purl.obolibrary.org/obo/PCL_0011189&identifier=PCL:0000001"
+                                "&identifier=PCL:0011189")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("*", response.headers["Access-Control-Allow-Origin"])
+        self.assertEqual({"docs": {"PCL:0011189": DOCS[0], "CS202002013_190": DOCS[1],
+                                   "http://purl.obolibrary.org/obo/PCL_0011189": DOCS[0]},
+                          "missing": ["PCL:0000001"]}, json.loads(response.get_data()))
+        self.solr_client.get.assert_called_once_with(
+            self.collection_url + "?q=accession_id:(\"CS202002013_190\") OR curie:(\"PCL\\:0000001\" OR "
+                                  "\"PCL\\:0011189\") OR id:(\"http\\:\\/\\/purl.obolibrary.org\\/obo\\/PCL_0011189\")"
+                                  "&rows=300")
+
+        # same identifiers in different order share the cached Solr response
+        response = self.app.get("/bds/api/get?identifier=PCL:0000001,CS202002013_190,PCL:0011189,"
+                                "http://purl.obolibrary.org/obo/PCL_0011189")
+        self.assertEqual(["PCL:0000001"], json.loads(response.get_data())["missing"])
+        self.assertEqual(1, self.solr_client.get.call_count)
+
+    def test_invalid_identifiers(self):
+        response = self.app.get("/bds/api/get?identifier=\"\",")
+        self.assertEqual(400, response.status_code)
+
+        with mock.patch.object(search_service, "max_get_identifiers", 2):
+            response = self.app.get("/bds/api/get?identifier=PCL:0000001,PCL:0000002,PCL:0000003")
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("Error: max 2 identifiers are allowed.", json.loads(response.get_data())["message"])
+        self.solr_client.get.assert_not_called()
+
+
+    def test_escaped_identifiers(self):
+        self.app.get("/bds/api/get?identifier=PCL:0011189,PCL:00\\11(190)")
+        self.solr_client.get.assert_called_once_with(
+            self.collection_url + "?q=curie:(\"PCL\\:0011189\" OR \"PCL\\:00\\\\11\\(190\\)\")&rows=300")
+
+    def test_solr_errors(self):
+        self.solr_client.get.return_value = StubResponse({"error": {"msg": "undefined field curie", "code": 400}}, 400)
+        response = self.app.get("/bds/api/get?identifier=PCL:0011189,PCL:0011190")
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("Error: undefined field curie", json.loads(response.get_data())["message"])
+
+        self.solr_client.get.return_value = StubResponse(b"<html>Server Error</html>", 500)
+        response = self.app.get("/bds/api/get?identifier=PCL:0011189,PCL:0011190")
+        self.assertEqual(500, response.status_code)
+        self.assertEqual("Error: Solr request failed.", json.loads(response.get_data())["message"])
+
+
+if __name__ == '__main__':
+    unittest.main()
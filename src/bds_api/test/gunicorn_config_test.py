@@ -0,0 +1,39 @@
+import os
+import runpy
+import unittest
+from unittest import mock
+
+GUNICORN_CONF_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../../gunicorn.conf.py")
+
+
+class GunicornConfigTest(unittest.TestCase):
+
+    def load_config(self, environment):
+        with mock.patch.dict(os.environ, environment, clear=True), \
+                mock.patch("multiprocessing.cpu_count", return_value=2):
+            return runpy.run_path(GUNICORN_CONF_PATH)
+
+    def test_defaults(self):
+        config = self.load_config({})
+        self.assertEqual("bds_api.wsgi:app", config["wsgi_app"])
+        self.assertEqual("0.0.0.0:8080", config["bind"])
+        self.assertEqual(5, config["workers"])
+        self.assertEqual(4, config["threads"])
+        self.assertEqual("gthread", config["worker_class"])
+        self.assertTrue(config["preload_app"])
+
+    def test_environment(self):
+        config = self.load_config({"PORT": "9090", "WEB_CONCURRENCY": "3", "GUNICORN_WORKERS": "8",
+                                   "GUNICORN_THREADS": "16", "GUNICORN_MAX_REQUESTS": "1000"})
+        self.assertEqual("0.0.0.0:9090", config["bind"])
+        # WEB_CONCURRENCY takes precedence
+        self.assertEqual(3, config["workers"])
+        self.assertEqual(16, config["threads"])
+        self.assertEqual(100, config["max_requests_jitter"])
+
+        config = self.load_config({"GUNICORN_WORKERS": "8", "WEB_CONCURRENCY": " "})
+        self.assertEqual(8, config["workers"])
+
+
+if __name__ == '__main__':
+    unittest.main()
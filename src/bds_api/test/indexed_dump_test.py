@@ -0,0 +1,100 @@
+import unittest
+import json
+import os
+import tempfile
+from bds_api.dumps.dump_io import open_writer, get_dump_path, iter_dump_documents, INDEXED_FORMAT
+from bds_api.dumps.indexed_dump import IndexedDumpReader, convert_dump, get_index_path
+
+
+class IndexedDumpTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.docs = [{"id": "http://purl.obolibrary.org/obo/PCL_0011623",
+                      "iri": "http://purl.obolibrary.org/obo/PCL_0011623", "curie": "PCL:0011623", "label": "L5 ET",
+                      "accession_id": "CS202002013_123", "marker_labels": ["Fam84b (Mmus)"]},
+                     {"id": "https://identifiers.org/ncbigene/13176", "iri": "https://identifiers.org/ncbigene/13176",
+                      "curie": "ncbigene:13176", "label": "Dcn (Mmus)"},
+                     {"id": "ontology", "iri": "ontology", "label": "pcl", "version": "2022-03-02"}]
+        self.path = get_dump_path(os.path.join(self.tmp_dir.name, "dump.json"), INDEXED_FORMAT)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_dump(self, envelope=None):
+        with open_writer(self.path, INDEXED_FORMAT, envelope) as writer:
+            for doc in self.docs:
+                writer.write(doc)
+
+    def test_lookup(self):
+        self.assertTrue(self.path.endswith("dump.jsonz"))
+        self.write_dump()
+        self.assertTrue(os.path.exists(get_index_path(self.path)))
+
+        with IndexedDumpReader(self.path) as reader:
+            self.assertEqual(3, len(reader))
+            self.assertEqual(self.docs[0], reader.get("http://purl.obolibrary.org/obo/PCL_0011623"))
+            self.assertEqual(self.docs[0], reader.get("PCL:0011623"))
+            self.assertEqual(self.docs[0], reader.get("CS202002013_123"))
+            self.assertEqual(self.docs[1], reader.get("ncbigene:13176", "curie"))
+            self.assertEqual(self.docs[2], reader.get("ontology"))
+            self.assertIsNone(reader.get("ncbigene:13176", "id"))
+            self.assertIsNone(reader.get("PCL:0000000"))
+            self.assertIn("CS202002013_123", reader)
+            self.assertNotIn("CS202002013_124", reader)
+            self.assertEqual({"ontology": self.docs[2], "PCL:0011623": self.docs[0]},
+                             reader.get_many(["ontology", "PCL:0011623", "missing"]))
+            self.assertEqual(self.docs, list(reader))
+            self.assertIsNone(reader.envelope)
+
+    def test_envelope(self):
+        ontology = {"name": "BDS", "version": ["2022-03-02"]}
+        self.write_dump({"ontology": ontology})
+        with IndexedDumpReader(self.path) as reader:
+            self.assertEqual({"ontology": ontology}, reader.envelope)
+            self.assertEqual(self.docs, list(reader))
+
+    def test_iter_dump_documents(self):
+        self.write_dump()
+        self.assertEqual(self.docs, list(iter_dump_documents(self.path)))
+
+    def test_convert(self):
+        json_path = os.path.join(self.tmp_dir.name, "dump.json")
+        with open(json_path, "w", encoding='utf-8') as f:
+            json.dump(self.docs, f, indent=4)
+
+        self.assertEqual(self.path, convert_dump(json_path))
+        with IndexedDumpReader(self.path) as reader:
+            self.assertEqual(self.docs, list(reader))
+            self.assertEqual(self.docs[1], reader.get("https://identifiers.org/ncbigene/13176"))
+
+    def test_failed_write(self):
+        with self.assertRaises(ValueError):
+            with open_writer(self.path, INDEXED_FORMAT) as writer:
+                writer.write(self.docs[0])
+                raise ValueError("Neo4j query failed")
+        # partial dump is neither readable nor left behind
+        self.assertEqual([], os.listdir(self.tmp_dir.name))
+
+        self.write_dump()
+        with self.assertRaises(ValueError):
+            with open_writer(self.path, INDEXED_FORMAT) as writer:
+                writer.write(self.docs[0])
+                raise ValueError("Neo4j query failed")
+        # previous dump is kept
+        self.assertEqual(self.docs, list(iter_dump_documents(self.path)))
+        self.assertEqual(["dump.jsonz", "dump.jsonz.idx"], sorted(os.listdir(self.tmp_dir.name)))
+
+    def test_not_indexed_dump(self):
+        json_path = os.path.join(self.tmp_dir.name, "dump.json")
+        with open(json_path, "w", encoding='utf-8') as f:
+            json.dump(self.docs, f)
+        with open(get_index_path(json_path), "w", encoding='utf-8') as f:
+            json.dump({"format_version": 1, "envelope": None, "offsets": [], "keys": {}}, f)
+
+        with self.assertRaises(ValueError):
+            IndexedDumpReader(json_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import tempfile
+from unittest import mock
+from bds_api.dumps import bds_queries
+from bds_api.dumps.query_cache import QueryCache
+from bds_api.dumps.bds_queries import ListAllAllenIndividuals, ListAllTaxonomies, IndividualDetailsBatchQuery
+
+
+class QueryCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.version = ["2022-03-02"]
+        self.cache = QueryCache(self.tmp_dir.name, version_provider=lambda: self.version)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_cache_key(self):
+        # query constructors are not called, so no database connection is needed
+        individuals_query = ListAllAllenIndividuals.__new__(ListAllAllenIndividuals)
+        taxonomies_query = ListAllTaxonomies.__new__(ListAllTaxonomies)
+
+        key = self.cache.get_key(individuals_query, {"accession": "0011628"})
+        self.assertEqual(key, self.cache.get_key(individuals_query, {"accession": "0011628"}))
+        self.assertNotEqual(key, self.cache.get_key(individuals_query, {"accession": "0011629"}))
+        self.assertNotEqual(key, self.cache.get_key(taxonomies_query, {"accession": "0011628"}))
+
+        new_version_cache = QueryCache(self.tmp_dir.name, version_provider=lambda: ["2022-03-03"])
+        self.assertNotEqual(key, new_version_cache.get_key(individuals_query, {"accession": "0011628"}))
+
+    def test_get_put(self):
+        self.assertIsNone(self.cache.get("key"))
+        self.cache.put("key", {"PCL:0011628": {"markers": [{"class_metadata": None}]}})
+
+        self.assertEqual({"PCL:0011628": {"markers": [{"class_metadata": None}]}}, self.cache.get("key"))
+        # entries are persistent
+        self.assertEqual({"PCL:0011628": {"markers": [{"class_metadata": None}]}},
+                         QueryCache(self.tmp_dir.name).get("key"))
+
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(0, self.cache.total_size)
+
+    def test_eviction(self):
+        cache = QueryCache(self.tmp_dir.name, max_size_mb=0.001)
+        for index in range(100):
+            cache.put("key_" + str(index), ["PCL:" + str(index)] * 10)
+
+        self.assertTrue(cache.total_size <= cache.max_size)
+        self.assertIsNone(cache.get("key_0"))
+        self.assertEqual(["PCL:99"] * 10, cache.get("key_99"))
+
+    def test_batch_items_cached(self):
+        query = IndividualDetailsBatchQuery.__new__(IndividualDetailsBatchQuery)
+        query.run_query = mock.Mock(side_effect=lambda parameters, **kwargs: {
+            "PCL:" + accession: {"indv_metadata": {"curie": "PCL:" + accession}}
+            for accession in parameters["accessions"]})
+
+        with mock.patch.object(bds_queries, "query_cache", self.cache):
+            self.assertEqual(["PCL:1", "PCL:2"], sorted(query.execute_query({"accessions": ["1", "2"]})))
+            # different batch composition only queries the uncached accessions
+            result = query.execute_query({"accessions": ["2", "3"]})
+            self.assertEqual({"PCL:2": {"indv_metadata": {"curie": "PCL:2"}},
+                              "PCL:3": {"indv_metadata": {"curie": "PCL:3"}}}, result)
+            query.execute_query({"accessions": ["3", "1"]})
+
+        self.assertEqual([mock.call({"accessions": ["1", "2"]}), mock.call({"accessions": ["3"]})],
+                         query.run_query.call_args_list)
+
+
+if __name__ == '__main__':
+    unittest.main()
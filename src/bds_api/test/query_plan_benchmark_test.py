@@ -0,0 +1,29 @@
+import unittest
+from bds_api.dumps.query_plan_benchmark import get_plan_stats, compare_reports
+
+
+class QueryPlanBenchmarkTest(unittest.TestCase):
+
+    def test_plan_stats(self):
+        plan = {"operatorType": "ProduceResults", "dbHits": 0, "rows": 1,
+                "children": [{"operatorType": "EagerAggregation", "dbHits": 10, "rows": 4,
+                              "children": [{"operatorType": "NodeIndexSeek", "dbHits": 3, "rows": 1,
+                                            "children": []}]}]}
+        stats = get_plan_stats(plan)
+
+        self.assertEqual(13, stats["db_hits"])
+        self.assertEqual(6, stats["rows"])
+        self.assertEqual({"ProduceResults", "EagerAggregation", "NodeIndexSeek"}, set(stats["operators"]))
+
+    def test_compare_reports(self):
+        baseline = {"IndividualDetailsQuery": {"db_hits": 100, "rows": 10}}
+
+        self.assertEqual([], compare_reports(baseline, {"IndividualDetailsQuery": {"db_hits": 105, "rows": 10}}))
+        self.assertEqual([], compare_reports(baseline, {"ListAllTaxonomies": {"db_hits": 500, "rows": 10}}))
+        regressions = compare_reports(baseline, {"IndividualDetailsQuery": {"db_hits": 200, "rows": 10}})
+        self.assertEqual(1, len(regressions))
+        self.assertIn("db_hits", regressions[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import time
+import unittest
+import tempfile
+from unittest import mock
+from bds_api.dumps.bds_queries import IndividualDetailsBatchQuery, ListAllAllenIndividuals, set_query_recorder, \
+    set_query_replayer
+from bds_api.dumps.query_replay import QueryRecorder, QueryReplayer
+
+
+def run_individuals_query(self, parameters=None, **kwparameters):
+    return ["PCL:0011628", "PCL:0011528", "PCL:0011588"]
+
+
+def run_individual_details_query(self, parameters=None, **kwparameters):
+    return {"PCL:" + accession: {"indv_metadata": {"cluster_id": [accession]}}
+            for accession in parameters["accessions"] if accession != "0011588"}
+
+
+class QueryReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.fixture_path = os.path.join(self.tmp_dir.name, "queries_fixture.json.gz")
+        recorder = QueryRecorder(self.fixture_path)
+        set_query_recorder(recorder)
+        # database responses of the recorded run
+        try:
+            with mock.patch.object(ListAllAllenIndividuals, "run_query", run_individuals_query), \
+                    mock.patch.object(IndividualDetailsBatchQuery, "run_query", run_individual_details_query):
+                self.individuals = ListAllAllenIndividuals().execute_query()
+                self.details = list(IndividualDetailsBatchQuery(batch_size=2).execute_in_batches(self.individuals))
+        finally:
+            set_query_recorder(None)
+        recorder.save()
+
+    def tearDown(self):
+        set_query_replayer(None)
+        self.tmp_dir.cleanup()
+
+    def test_replay(self):
+        set_query_replayer(QueryReplayer(self.fixture_path))
+        # replay never runs the queries
+        self.assertEqual(self.individuals, ListAllAllenIndividuals().execute_query())
+
+        # batch results are replayed with any batch size
+        self.assertEqual(self.details, list(IndividualDetailsBatchQuery(batch_size=3).execute_in_batches(
+            self.individuals)))
+        self.assertEqual(self.details, list(IndividualDetailsBatchQuery(batch_size=1).execute_in_batches(
+            self.individuals, workers=2)))
+        self.assertEqual({}, self.details[2][1])
+
+        with self.assertRaises(KeyError):
+            IndividualDetailsBatchQuery().execute_query({"accessions": ["0000001"]})
+
+    def test_replay_latency(self):
+        set_query_replayer(QueryReplayer(self.fixture_path, latency=0.05))
+        start = time.perf_counter()
+        ListAllAllenIndividuals().execute_query()
+        self.assertTrue(time.perf_counter() - start >= 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from flask import Flask
+from bds_api.endpoints import request_templates
+from bds_api.endpoints.request_templates import TemplateRegistry, compile_template, get_template, SEARCH_PROFILE, \
+    AUTOCOMPLETE_PROFILE
+from bds_api.endpoints.search_config import search_config, SEARCH_CONF_PATH
+from bds_api.endpoints.search_service import generate_request
+
+SOLR_URL = "http://ec2-3-143-113-50.us-east-2.compute.amazonaws.com:8993/solr/bdsdump/query"
+
+
+class RequestTemplatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.tmp_dir.name, "search_config.ini")
+        shutil.copyfile(SEARCH_CONF_PATH, self.config_path)
+        self.app = Flask(__name__)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_compile(self):
+        template = compile_template(search_config)
+        self.assertEqual(SOLR_URL, template.collection_url)
+        self.assertEqual(SOLR_URL + "?defType=edismax", template.search_url)
+        self.assertEqual("300", template.result_limit)
+        self.assertTrue(template.static_params.startswith("&fl=*,score&qf=label^2.5 has_exact_synonym^2.5 "))
+        self.assertIn("&bq=iri:http\\:\\/\\/purl.obolibrary.org\\/obo\\/PCL_^20", template.static_params)
+        self.assertTrue(template.static_params.endswith(",accession_id_autosuggest_e,species_autosuggest_e"))
+
+        with self.assertRaises(AttributeError):
+            template.result_limit = "10"
+
+    def test_render(self):
+        template = compile_template(search_config)
+        self.assertEqual(template.search_url + "&q=(Lamp5 AND Lhx6 AND  )" + template.static_params + "&rows=300",
+                         template.render("Lamp5 AND Lhx6 AND  "))
+        self.assertEqual(template.search_url + "&q=(*)" + template.static_params +
+                         "&fq=taxonomy_id:CCN202002013&fq=rank: (Class)&rows=4",
+                         template.render("*", ["taxonomy_id:CCN202002013", "rank: (Class)"], 4))
+
+    def test_generate_request(self):
+        with self.app.test_request_context("/?query=L5/6%20NP&species=mouse&rank=Class&limit=4"):
+            request_url = generate_request(get_template(AUTOCOMPLETE_PROFILE))
+        self.assertTrue(request_url.startswith(SOLR_URL + "?defType=edismax&q=(L5/6 AND NP AND  )&fl=id,iri,"))
+        self.assertTrue(request_url.endswith("&fq=species: (\"Mus musculus\")&fq=rank: (Class)&rows=4"))
+
+    def test_hot_reload(self):
+        registry = TemplateRegistry(self.config_path)
+        self.assertEqual("300", registry.get_template(SEARCH_PROFILE).result_limit)
+
+        with open(self.config_path, encoding="utf-8") as f:
+            config = f.read()
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            f.write(config.replace("result_limit = 300", "result_limit = 50"))
+        os.utime(self.config_path, (0, 0))
+
+        # not reloaded until the reload interval passes
+        self.assertEqual("300", registry.get_template(SEARCH_PROFILE).result_limit)
+        registry.next_check = 0
+        self.assertEqual("50", registry.get_template(SEARCH_PROFILE).result_limit)
+        self.assertEqual("50", registry.get_template(AUTOCOMPLETE_PROFILE).result_limit)
+
+    def test_invalid_reload(self):
+        registry = TemplateRegistry(self.config_path)
+        template = registry.get_template(SEARCH_PROFILE)
+        with open(self.config_path, "a", encoding="utf-8") as f:
+            f.write("\n[Search]\nfield_weights = [\n")
+        os.utime(self.config_path, (0, 0))
+
+        registry.next_check = 0
+        with mock.patch.object(request_templates.log, "exception"):
+            self.assertIs(template, registry.get_template(SEARCH_PROFILE))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import json
+import unittest
+from unittest import mock
+from bds_api.endpoints.response_cache import ResponseCache
+from bds_api.endpoints import search_service
+from bds_api.test.api_test_utils import create_test_app, StubResponse, FakeSolrClientMixin
+
+app = create_test_app('bds_cache')
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.version = "2022-03-02"
+        self.now = 1000.0
+        self.time_patch = mock.patch("time.monotonic", side_effect=lambda: self.now)
+        self.time_patch.start()
+
+    def tearDown(self):
+        self.time_patch.stop()
+
+    def test_lru(self):
+        cache = ResponseCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(1, cache.get("a"))
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(1, cache.get("a"))
+        self.assertEqual(3, cache.get("c"))
+        self.assertEqual({"size": 2, "max_size": 2, "hits": 3, "misses": 1, "hit_ratio": 0.75, "invalidations": 0,
+                          "ontology_version": None}, cache.get_stats())
+
+    def test_ttl(self):
+        cache = ResponseCache(ttl=10)
+        cache.put("a", 1)
+        self.now += 9
+        self.assertEqual(1, cache.get("a"))
+        self.now += 2
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(0, cache.get_stats()["size"])
+
+    def test_version_invalidation(self):
+        version_provider = mock.Mock(side_effect=lambda: self.version)
+        cache = ResponseCache(version_check_interval=60, version_provider=version_provider)
+        cache.put("a", 1)
+        # first check only records the version
+        self.assertEqual(1, cache.get("a"))
+
+        self.version = "2022-04-01"
+        self.assertEqual(1, cache.get("a"))
+        self.assertEqual(1, version_provider.call_count)
+
+        self.now += 61
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(2, version_provider.call_count)
+        self.assertEqual(1, cache.get_stats()["invalidations"])
+        self.assertEqual("2022-04-01", cache.get_stats()["ontology_version"])
+
+        # cached responses are kept when the version can't be checked
+        cache.put("a", 1)
+        version_provider.side_effect = IOError("Solr is not available")
+        self.now += 61
+        self.assertEqual(1, cache.get("a"))
+
+    def test_disabled(self):
+        cache = ResponseCache(enabled=False)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+
+class CachedEndpointsTest(FakeSolrClientMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.app = app.test_client()
+        self.solr_client.get.return_value = StubResponse({"response": {"numFound": 0, "docs": []}})
+
+    def test_normalised_arguments(self):
+        response = self.app.get("/bds/api/autocomplete?query=Lamp5&species=mouse,human&rank=Class,Subclass")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({"response": {"numFound": 0, "docs": []}}, json.loads(response.get_data()))
+        self.assertEqual("*", response.headers["Access-Control-Allow-Origin"])
+
+        response = self.app.get("/bds/api/autocomplete?query=Lamp5%20&species=Homo%20sapiens,Mouse"
+                                "&rank=subclass,class")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, self.solr_client.get.call_count)
+
+        # different endpoint and different limit
+        self.app.get("/bds/api/search?query=Lamp5&species=mouse,human&rank=Class,Subclass")
+        self.app.get("/bds/api/autocomplete?query=Lamp5&species=mouse,human&rank=Class,Subclass&limit=5")
+        self.assertEqual(3, self.solr_client.get.call_count)
+        self.assertEqual({"hits": 1, "misses": 3}, {key: self.response_cache.get_stats()[key] for key in ["hits", "misses"]})
+
+    def test_get_and_taxonomies(self):
+        self.app.get("/bds/api/get?identifier=PCL:0011189")
+        self.app.get("/bds/api/get?identifier=\"PCL:0011189\"")
+        self.app.get("/bds/api/taxonomies")
+        self.app.get("/bds/api/taxonomies")
+        self.assertEqual(2, self.solr_client.get.call_count)
+
+    def test_invalid_limit(self):
+        for endpoint in ["search", "autocomplete"]:
+            response = self.app.get("/bds/api/" + endpoint + "?query=abc&limit=abc")
+            self.assertEqual(400, response.status_code)
+            self.assertEqual("Error: search parameter 'limit' should be an integer.",
+                             json.loads(response.get_data())["message"])
+        self.solr_client.get.assert_not_called()
+
+    def test_errors_not_cached(self):
+        self.solr_client.get.return_value = StubResponse({"error": {"code": 400}}, 400)
+        response = self.app.get("/bds/api/search?query=Lamp5")
+        self.assertEqual(400, response.status_code)
+        self.app.get("/bds/api/search?query=Lamp5")
+        self.assertEqual(2, self.solr_client.get.call_count)
+
+
+class PassthroughTest(FakeSolrClientMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.app = app.test_client()
+        self.solr_response = StubResponse({"response": {"numFound": 1, "docs": [{"id": "PCL:0011189"}]}})
+        self.solr_client.get.return_value = self.solr_response
+
+    def test_passthrough(self):
+        for _ in range(2):
+            response = self.app.get("/bds/api/search?query=Lamp5")
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(self.solr_response.content, response.get_data())
+            self.assertEqual("application/json;charset=utf-8", response.headers["Content-Type"])
+            self.assertEqual("*", response.headers["Access-Control-Allow-Origin"])
+        self.assertEqual(1, self.solr_client.get.call_count)
+
+    def test_transform(self):
+        with app.test_request_context():
+            response = search_service.query_solr("test", "http://localhost/solr/bdsdump/query?q=*",
+                                                 transform=lambda data: data["response"]["docs"])
+        self.assertEqual([{"id": "PCL:0011189"}], json.loads(response.get_data()))
+        self.assertEqual("*", response.headers["Access-Control-Allow-Origin"])
+
+    def test_passthrough_disabled(self):
+        with mock.patch.object(search_service, "response_passthrough", False):
+            response = self.app.get("/bds/api/search?query=Lamp5")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("application/json", response.headers["Content-Type"])
+        self.assertEqual(json.loads(self.solr_response.content), json.loads(response.get_data()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import time
+import socket
+import unittest
+import threading
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from bds_api.endpoints.solr_client import SolrClient
+from bds_api.exception.api_exception import BDSApiException
+
+
+class StubSolrHandler(BaseHTTPRequestHandler):
+    """
+    Keep-alive Solr stub. Records the client port of each request and delays the '/slow' responses.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.client_ports.append(self.client_address[1])
+        if self.path.startswith("/slow"):
+            time.sleep(0.5)
+        body = b'{"response":{"numFound":0,"docs":[]}}'
+        self.send_response(200)
+        self.send_header("Content-type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SolrClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("localhost", 0), StubSolrHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.client_ports = list()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://localhost:{}".format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        client = SolrClient(pool_size=2)
+        for _ in range(5):
+            response = client.get(self.url + "/solr/bdsdump/query?q=*")
+            self.assertEqual({"response": {"numFound": 0, "docs": []}}, response.json())
+        client.close()
+
+        self.assertEqual(5, len(self.server.client_ports))
+        # all requests are sent over the same connection
+        self.assertEqual(1, len(set(self.server.client_ports)))
+
+    def test_read_timeout(self):
+        client = SolrClient(read_timeout=0.1)
+        with self.assertRaises(BDSApiException) as context:
+            client.get(self.url + "/slow")
+        self.assertEqual(HTTPStatus.GATEWAY_TIMEOUT, context.exception.status_code)
+        self.assertEqual("Error: Solr request timed out.", context.exception.message)
+        client.close()
+
+    def test_connection_error(self):
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            port = sock.getsockname()[1]
+        client = SolrClient(connect_timeout=1)
+        with self.assertRaises(BDSApiException) as context:
+            client.get("http://localhost:{}/solr/bdsdump/query".format(port))
+        self.assertEqual(HTTPStatus.BAD_GATEWAY, context.exception.status_code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import json
+import unittest
+import requests
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from bds_api.dumps.solr_indexer import SolrBulkIndexer
+
+
+class StubSolrHandler(BaseHTTPRequestHandler):
+    """
+    Records the update requests. Fails the first 'failures' requests with 503.
+    """
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.attempts += 1
+            fail = server.attempts <= server.failures
+            if not fail:
+                server.requests.append((parse_qs(urlparse(self.path).query), body))
+        self.send_response(503 if fail else 200)
+        self.send_header("Content-type", "application/json")
+        self.end_headers()
+        self.wfile.write(b'{"responseHeader":{"status":0}}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SolrIndexerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(("localhost", 0), StubSolrHandler)
+        self.server.lock = threading.Lock()
+        self.server.attempts = 0
+        self.server.failures = 0
+        self.server.requests = list()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.update_url = "http://localhost:{}/solr/bdsdump/update".format(self.server.server_port)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def write_dump(self, count):
+        path = os.path.join(self.tmp_dir.name, "individuals_metadata_solr_20220302.json")
+        with open(path, "w") as f:
+            json.dump([{"id": "PCL_" + str(index)} for index in range(count)], f, indent=4)
+        return path
+
+    def test_index_dump(self):
+        with SolrBulkIndexer(self.update_url, batch_size=10, workers=3, backoff_factor=0) as indexer:
+            self.assertEqual(25, indexer.index_dump(self.write_dump(25)))
+
+        documents = [body for params, body in self.server.requests if isinstance(body, list)]
+        self.assertEqual([10, 10, 5], sorted([len(batch) for batch in documents], reverse=True))
+        self.assertEqual({"PCL_" + str(index) for index in range(25)},
+                         {doc["id"] for batch in documents for doc in batch})
+        # single final commit
+        self.assertEqual({"commit": {}}, self.server.requests[-1][1])
+
+    def test_commit_within(self):
+        with SolrBulkIndexer(self.update_url, batch_size=10, workers=2, commit_within=5000) as indexer:
+            indexer.index_dump(self.write_dump(15))
+
+        self.assertEqual(2, len(self.server.requests))
+        for params, body in self.server.requests:
+            self.assertEqual(["5000"], params["commitWithin"])
+            self.assertIsInstance(body, list)
+
+    def test_retry(self):
+        self.server.failures = 2
+        with SolrBulkIndexer(self.update_url, batch_size=10, workers=1, max_retries=2, backoff_factor=0) as indexer:
+            indexer.index_documents([{"id": "PCL_1"}], commit=False)
+        self.assertEqual([[{"id": "PCL_1"}]], [body for params, body in self.server.requests])
+
+        self.server.attempts = 0
+        self.server.failures = 10
+        with SolrBulkIndexer(self.update_url, max_retries=1, backoff_factor=0) as indexer:
+            with self.assertRaises(requests.HTTPError):
+                indexer.delete(["PCL_1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from unittest import mock
+from bds_api.dumps import bds_dumps
+from bds_api.dumps.synthetic_data import SyntheticDataConfig, SyntheticDataGenerator
+from bds_api.dumps.bds_dumps import populate_solr_documents
+
+
+class ListDocumentStore(dict):
+
+    def __init__(self):
+        super().__init__()
+        self.documents = list()
+
+    def write(self, doc):
+        self.documents.append(doc)
+
+
+class SyntheticDataTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config = SyntheticDataConfig(taxonomies=3, individuals_per_taxonomy=60, markers_per_class=3,
+                                          hierarchy_depth=4, homology_links=2)
+        self.generator = SyntheticDataGenerator(self.config)
+
+    def test_shapes(self):
+        individuals = self.generator.list_all_allen_individuals()
+        self.assertEqual(180, len(individuals))
+        self.assertEqual(180, len(set(individuals)))
+
+        taxonomies = self.generator.list_all_taxonomies()
+        self.assertEqual(3, len(taxonomies))
+        self.assertEqual(set(taxonomies.keys()), set(self.generator.get_species_mapping().keys()))
+        for taxonomy_id, taxonomy in taxonomies.items():
+            self.assertEqual("CCN" + taxonomy_id, taxonomy["taxonomy"]["label"])
+            self.assertEqual(2, len(taxonomy["datasets"]))
+
+        results = list(self.generator.iter_individual_results())
+        self.assertEqual(individuals, [individual for individual, result in results])
+        for individual, result in results:
+            self.assertEqual({"class_metadata", "indv_metadata", "parents", "markers", "parent_markers",
+                              "references", "taxonomy", "region", "homologous_to", "parent_clusters"},
+                             set(result.keys()))
+
+        ranks = [result["indv_metadata"]["cell_type_rank"][0] for individual, result in results[:60]]
+        self.assertEqual("None", ranks[0])
+        self.assertEqual("All cells", results[0][1]["class_metadata"][0]["class_metadata"]["prefLabel"][0])
+        self.assertEqual(1, ranks.count("Class"))
+        self.assertEqual(6, ranks.count("Subclass"))
+        self.assertEqual(52, ranks.count("Cell Type"))
+
+    def test_deterministic(self):
+        results = list(self.generator.iter_individual_results())
+        self.assertEqual(results, list(SyntheticDataGenerator(self.config).iter_individual_results()))
+
+        other_seed = SyntheticDataConfig(**dict(vars(self.config), seed=2))
+        self.assertNotEqual(results, list(SyntheticDataGenerator(other_seed).iter_individual_results()))
+
+    def test_scale(self):
+        scaled = self.config.scale(10)
+        self.assertEqual(600, scaled.individuals_per_taxonomy)
+        self.assertEqual(60, self.config.individuals_per_taxonomy)
+        self.assertEqual(1800, len(SyntheticDataGenerator(scaled).list_all_allen_individuals()))
+
+    def test_solr_dump(self):
+        all_data = ListDocumentStore()
+        populate_solr_documents(all_data, self.generator.iter_individual_results(),
+                                self.generator.list_all_taxonomies(), self.generator.get_ontology_metadata(),
+                                species_mapping=self.generator.get_species_mapping())
+
+        individual_docs = [doc for doc in all_data.documents + list(all_data.values()) if "individual" in doc]
+        self.assertEqual(180, len(individual_docs))
+        root_nodes = [doc for doc in individual_docs if doc["rank"] == ["Class"]]
+        self.assertEqual(3, len(root_nodes))
+        for root_node in root_nodes:
+            self.assertEqual(["All cells"], root_node["parent_labels"])
+        cell_types = [doc for doc in individual_docs if doc["rank"] == ["Cell Type"] and doc["markers"]]
+        self.assertTrue(cell_types)
+        for doc in cell_types:
+            self.assertEqual(3, len(doc["markers"]))
+            self.assertEqual(2, len(doc["nsforest_markers"]))
+            self.assertLessEqual(len(doc["homologous_to"]), 2)
+            self.assertEqual(1, len(doc["parent_clusters"]))
+
+    def test_parallel_solr_dump(self):
+        dumps = list()
+        # small chunks, so more chunks than the in flight limit are transformed by the pool
+        with mock.patch.object(bds_dumps, "TRANSFORM_CHUNK_SIZE", 10):
+            for processes in [1, 2]:
+                all_data = ListDocumentStore()
+                populate_solr_documents(all_data, self.generator.iter_individual_results(),
+                                        self.generator.list_all_taxonomies(), self.generator.get_ontology_metadata(),
+                                        processes=processes, species_mapping=self.generator.get_species_mapping())
+                dumps.append(all_data)
+
+        # same documents in the same order, for the streamed and the stored documents
+        self.assertEqual(dumps[0].documents, dumps[1].documents)
+        self.assertEqual(list(dumps[0].items()), list(dumps[1].items()))
+        self.assertTrue(dumps[0].documents)
+
+
+if __name__ == '__main__':
+    unittest.main()
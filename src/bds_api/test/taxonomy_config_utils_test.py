@@ -0,0 +1,93 @@
+import io
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+from bds_api.utils import taxonomy_config_utils
+from bds_api.utils.taxonomy_config_utils import read_taxonomy_details_yaml, get_species_mapping, get_cache_path
+
+REMOTE_YAML = b"""
+- Taxonomy_id: CCN202002013
+  Species_abbv: [Mouse]
+- Taxonomy_id: CS1908210
+  Species_abbv: [Human]
+"""
+
+UPDATED_YAML = b"""
+- Taxonomy_id: CCN202002013
+  Species_abbv: [Mouse]
+"""
+
+
+class TaxonomyConfigUtilsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.patches = [mock.patch.object(taxonomy_config_utils, "CACHE_DIR", self.tmp_dir.name),
+                        mock.patch.object(taxonomy_config_utils, "OFFLINE", False)]
+        for patch in self.patches:
+            patch.start()
+        read_taxonomy_details_yaml.cache_clear()
+        get_species_mapping.cache_clear()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        read_taxonomy_details_yaml.cache_clear()
+        get_species_mapping.cache_clear()
+        self.tmp_dir.cleanup()
+
+    def test_fetch_and_memoize(self):
+        with mock.patch("urllib.request.urlopen", return_value=io.BytesIO(REMOTE_YAML)) as urlopen:
+            self.assertEqual({"202002013": "Mus musculus", "1908210": "Homo sapiens"}, get_species_mapping())
+            self.assertEqual({"202002013": "Mus musculus", "1908210": "Homo sapiens"}, get_species_mapping())
+        self.assertEqual(1, urlopen.call_count)
+        self.assertIn("/pcl_migration/", urlopen.call_args[0][0])
+        self.assertTrue(os.path.exists(get_cache_path()))
+
+    def test_disk_cache(self):
+        with mock.patch("urllib.request.urlopen", return_value=io.BytesIO(REMOTE_YAML)):
+            read_taxonomy_details_yaml()
+        read_taxonomy_details_yaml.cache_clear()
+
+        with mock.patch("urllib.request.urlopen", side_effect=AssertionError("fresh cache is not used")):
+            self.assertEqual(2, len(read_taxonomy_details_yaml()))
+
+        # expired cache is refreshed
+        read_taxonomy_details_yaml.cache_clear()
+        expired = time.time() - taxonomy_config_utils.CACHE_TTL - 1
+        os.utime(get_cache_path(), (expired, expired))
+        with mock.patch("urllib.request.urlopen", return_value=io.BytesIO(UPDATED_YAML)) as urlopen:
+            self.assertEqual(1, len(read_taxonomy_details_yaml()))
+        self.assertEqual(1, urlopen.call_count)
+
+        # stale cache is used when the network is down
+        read_taxonomy_details_yaml.cache_clear()
+        os.utime(get_cache_path(), (expired, expired))
+        with mock.patch("urllib.request.urlopen", side_effect=OSError("network is unreachable")):
+            self.assertEqual(1, len(read_taxonomy_details_yaml()))
+
+    def test_version_pinning(self):
+        with mock.patch("urllib.request.urlopen", return_value=io.BytesIO(REMOTE_YAML)) as urlopen:
+            read_taxonomy_details_yaml("v2022-03-02")
+        self.assertIn("/v2022-03-02/", urlopen.call_args[0][0])
+        self.assertTrue(os.path.exists(get_cache_path("v2022-03-02")))
+        self.assertFalse(os.path.exists(get_cache_path()))
+
+    def test_bundled_fallback(self):
+        with mock.patch("urllib.request.urlopen", side_effect=OSError("network is unreachable")):
+            mapping = get_species_mapping()
+        self.assertEqual("Mus musculus", mapping["202002013"])
+        self.assertEqual("Homo sapiens", mapping["201912131"])
+        self.assertEqual("Callithrix jacchus", mapping["201912132"])
+        self.assertEqual("Homo sapiens", mapping["1908210"])
+
+    def test_offline(self):
+        with mock.patch.object(taxonomy_config_utils, "OFFLINE", True), \
+                mock.patch("urllib.request.urlopen", side_effect=AssertionError("offline")):
+            self.assertEqual(4, len(get_species_mapping()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,21 +1,93 @@
-import urllib
+import os
+import re
+import time
 import yaml
+import logging
+import functools
+import urllib
 from urllib import request
 
+log = logging.getLogger(__name__)
+
+# branch, tag or commit of the taxonomy details file, can be pinned with the TAXONOMY_DETAILS_REF environment variable
+TAXONOMY_DETAILS_REF = os.getenv("TAXONOMY_DETAILS_REF", "pcl_migration")
+
+TAXONOMY_DETAILS_YAML = "https://raw.githubusercontent.com/obophenotype/brain_data_standards_ontologies/{}/src/" \
+                        "dendrograms/taxonomy_details.yaml"
+
+# copy of the taxonomy details shipped with the package, used when the remote file and the disk cache are unavailable
+BUNDLED_TAXONOMY_DETAILS = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                        "../config/taxonomy_details.yaml")
 
-TAXONOMY_DETAILS_YAML = "https://raw.githubusercontent.com/obophenotype/brain_data_standards_ontologies/pcl_migration/src/dendrograms/taxonomy_details.yaml"
+CACHE_DIR = os.getenv("TAXONOMY_DETAILS_CACHE_DIR", "~/.cache/bds_api")
+
+# seconds a cached taxonomy details file is used before it is fetched again
+CACHE_TTL = int(os.getenv("TAXONOMY_DETAILS_TTL", str(24 * 60 * 60)))
+
+# if true, the remote file is never fetched
+OFFLINE = os.getenv("TAXONOMY_DETAILS_OFFLINE", "false").lower() == "true"
+
+FETCH_TIMEOUT = 10
 
 species_mapping = {"mouse": "Mus musculus",
                    "human": "Homo sapiens",
                    "marmoset": "Callithrix jacchus"}
 
 
-def read_taxonomy_details_yaml():
-    remote_config = urllib.request.urlopen(TAXONOMY_DETAILS_YAML)
-    config = yaml.full_load(remote_config)
-    return config
+def get_cache_path(ref=TAXONOMY_DETAILS_REF):
+    return os.path.join(os.path.expanduser(CACHE_DIR), "taxonomy_details_{}.yaml".format(re.sub(r"[^\w.-]", "_", ref)))
+
+
+def fetch_taxonomy_details(ref=TAXONOMY_DETAILS_REF):
+    """
+    Downloads the taxonomy details file of the given ref and stores it in the disk cache.
+    :return: content of the file
+    """
+    with urllib.request.urlopen(TAXONOMY_DETAILS_YAML.format(ref), timeout=FETCH_TIMEOUT) as remote_config:
+        content = remote_config.read()
+    yaml.safe_load(content)
+
+    cache_path = get_cache_path(ref)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path + ".tmp", "wb") as f:
+            f.write(content)
+        os.replace(cache_path + ".tmp", cache_path)
+    except OSError as e:
+        log.warning("Taxonomy details couldn't be cached: " + str(e))
+    return content
+
+
+@functools.lru_cache(maxsize=None)
+def read_taxonomy_details_yaml(ref=TAXONOMY_DETAILS_REF):
+    """
+    Loads the taxonomy details once per process. A disk cached copy younger than CACHE_TTL is used without network
+    access. Otherwise the remote file is fetched; if that fails, the stale cached copy or the bundled copy is used.
+    """
+    cache_path = get_cache_path(ref)
+    cache_age = time.time() - os.path.getmtime(cache_path) if os.path.exists(cache_path) else None
+    if cache_age is not None and (cache_age < CACHE_TTL or OFFLINE):
+        return load_yaml_file(cache_path)
+
+    if not OFFLINE:
+        try:
+            return yaml.safe_load(fetch_taxonomy_details(ref))
+        except Exception as e:
+            log.warning("Taxonomy details couldn't be fetched: " + str(e))
+
+    if cache_age is not None:
+        log.warning("Using the stale cached taxonomy details: " + cache_path)
+        return load_yaml_file(cache_path)
+    log.warning("Using the bundled taxonomy details: " + BUNDLED_TAXONOMY_DETAILS)
+    return load_yaml_file(BUNDLED_TAXONOMY_DETAILS)
+
+
+def load_yaml_file(path):
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f)
 
 
+@functools.lru_cache(maxsize=None)
 def get_species_mapping():
     species = dict()
     config = read_taxonomy_details_yaml()
@@ -0,0 +1,9 @@
+from bds_api.app import app, initialize_app
+from bds_api.endpoints.embedded_search import get_search_backend, get_embedded_index, EMBEDDED_BACKEND
+
+# WSGI entry point of the production server, see gunicorn.conf.py
+initialize_app(app)
+
+if get_search_backend() == EMBEDDED_BACKEND:
+    # load the dump before forking, so the workers share the index
+    get_embedded_index()